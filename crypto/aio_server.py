@@ -0,0 +1,106 @@
+# aio_server.py
+"""asyncio socket.io servers
+=========================
+The socket servers used to run Flask-SocketIO under `eventlet.monkey_patch()`.
+Their price sources, thread pools and sync Playwright ran on OS threads that
+eventlet doesn't schedule, so green and real threads contended with no
+predictable order. Every server now runs on one asyncio loop instead:
+
+  * `make_server(routes)` – a python-socketio `AsyncServer` mounted as ASGI,
+                            next to plain JSON GET routes (CORS open, as
+                            flask_cors was). Returns (sio, app).
+  * `serve(app, port)`    – uvicorn on the running loop, optionally stopping
+                            after `runtime_s` (the old shutdown_after thread).
+  * `background(coro)`    – a task that logs instead of vanishing if it dies.
+  * `query_arg(environ)`  – a connect-time query parameter (Flask's request.args).
+
+Socket handlers are `async def handler(sid, ...)`. Nothing that blocks
+belongs on the loop: Kalshi REST goes through kalshi_client.py and prices come
+from `PriceSource.stream`. `socket_load_test.py` measures tick → client latency.
+"""
+
+from __future__ import annotations
+import asyncio
+import inspect
+import json
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qs
+
+import socketio
+import uvicorn
+
+# crypto/websockets/ shadows the pip `websockets` package for anything run from
+# here, so uvicorn's auto pick breaks. wsproto comes with python-engineio.
+WS_IMPL = "wsproto"
+_tasks = set()   # strong refs, the loop only keeps weak ones
+
+
+class JsonRoutes:
+    """Minimal ASGI app: GET path -> handler() returning a body or (body, status)."""
+
+    def __init__(self, routes: Dict[str, Callable]):
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        headers = dict(scope.get('headers') or [])
+        origin = headers.get(b'origin')
+        cors = [(b'access-control-allow-origin', origin or b'*')]
+        if origin:
+            cors.append((b'access-control-allow-credentials', b'true'))
+
+        handler = self.routes.get(scope['path'])
+        if scope['method'] == 'OPTIONS':
+            status, body = 204, None
+        elif handler is None or scope['method'] != 'GET':
+            status, body = 404, {'error': 'not found'}
+        else:
+            result = handler()
+            if inspect.isawaitable(result):
+                result = await result
+            body, status = result if isinstance(result, tuple) else (result, 200)
+
+        payload = b'' if body is None else json.dumps(body, default=str).encode()
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(payload)).encode())] + cors})
+        await send({'type': 'http.response.body', 'body': payload})
+
+
+def make_server(routes: Optional[Dict[str, Callable]] = None):
+    sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+    app = socketio.ASGIApp(sio, other_asgi_app=JsonRoutes(routes or {}))
+    return sio, app
+
+
+def query_arg(environ: dict, name: str) -> Optional[str]:
+    values = parse_qs(environ.get('QUERY_STRING', '')).get(name)
+    return values[0] if values else None
+
+
+def background(coro, name: str = "task") -> asyncio.Task:
+    task = asyncio.create_task(coro, name=name)
+    _tasks.add(task)
+
+    def done(t: asyncio.Task):
+        _tasks.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            print(f"⛔ Background {name} stopped: {t.exception()!r}")
+
+    task.add_done_callback(done)
+    return task
+
+
+async def serve(app, host: str = "127.0.0.1", port: int = 5000, runtime_s: Optional[float] = None):
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, ws=WS_IMPL, lifespan="off",
+                                           log_level="warning"))
+
+    async def stop_after():
+        await asyncio.sleep(runtime_s)
+        print(f"\n🕒 Runtime limit of {runtime_s} seconds reached. Shutting down...")
+        server.should_exit = True
+
+    if runtime_s is not None:
+        background(stop_after(), "runtime limit")
+    await server.serve()
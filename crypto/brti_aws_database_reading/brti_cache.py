@@ -0,0 +1,153 @@
+"""
+Local Parquet cache of brti_prices for analysis.
+
+Instead of pulling the whole table over the SSH tunnel every session,
+`sync()` fetches only rows newer than the cache (via brti_db.fetch_prices) and
+appends them to one Parquet file per UTC day:
+
+    brti_cache/date=2025-07-01/part-0.parquet
+    brti_cache/date=2025-07-02/part-0.parquet
+
+`load(start, end)` then reads a range with partition and row-group predicate
+pushdown and returns a tz-aware, timestamp-indexed DataFrame:
+
+    from brti_cache import load
+    df = load("2025-07-01", "2025-07-08", refresh=True)   # sync, then read a week
+
+Rows younger than SYNC_OVERLAP_S at the last sync are re-fetched on the next
+one, so ticks the tracker commits a little late (batched writes) still land.
+"""
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from brti_db import connect, fetch_prices
+
+CACHE_DIR = Path(os.environ.get("BRTI_CACHE_DIR", Path(__file__).parent / "brti_cache"))
+TZ = "US/Eastern"
+SYNC_OVERLAP_S = 120     # re-fetch this much of the cached tail on every sync
+
+SCHEMA = pa.schema([("timestamp", pa.timestamp("us", tz="UTC")), ("price", pa.float64())])
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+
+def _day_path(day):
+    return CACHE_DIR / f"date={day}" / "part-0.parquet"
+
+
+def _cached_days():
+    if not CACHE_DIR.exists():
+        return []
+    return sorted(p.name[len("date="):] for p in CACHE_DIR.glob("date=*") if (p / "part-0.parquet").exists())
+
+
+def last_cached():
+    """Newest cached tick as a UTC pd.Timestamp (None for an empty cache)."""
+    days = _cached_days()
+    if not days:
+        return None
+    ts = pq.read_table(_day_path(days[-1]), columns=["timestamp"]).column("timestamp")
+    return pd.Timestamp(pc.max(ts).as_py()) if len(ts) else None
+
+
+def _write_day(day, ts, price, replace_from=None):
+    """Append ticks to a day's file, first dropping cached rows at or after `replace_from`."""
+    new = pa.table({"timestamp": pa.array(ts, type=pa.timestamp("us")).cast(SCHEMA.field("timestamp").type),
+                    "price": pa.array(price, type=pa.float64())}, schema=SCHEMA)
+    path = _day_path(day)
+    if path.exists():
+        old = pq.read_table(path, schema=SCHEMA)
+        if replace_from is not None:
+            old = old.filter(pc.less(old.column("timestamp"), pa.scalar(replace_from, type=SCHEMA.field("timestamp").type)))
+        new = pa.concat_tables([old, new])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    pq.write_table(new, tmp, row_group_size=10_000, compression="zstd")
+    os.replace(tmp, path)  # readers never see a half-written day
+
+
+def sync(conn=None, verbose=True):
+    """Fetch ticks newer than the cache, one UTC day per query. Returns the number of rows fetched."""
+    own = conn is None
+    conn = connect() if own else conn
+    start_time = time.perf_counter()
+    fetched = 0
+    try:
+        last = last_cached()
+        if last is None:
+            with conn.cursor() as cur:
+                cur.execute("SELECT min(timestamp) FROM brti_prices")
+                first = cur.fetchone()[0]
+            if first is None:
+                return 0
+            start = pd.Timestamp(first).tz_convert("UTC")
+        else:
+            start = last - timedelta(seconds=SYNC_OVERLAP_S)
+        end = pd.Timestamp.now(tz="UTC") + timedelta(seconds=1)
+
+        day = start.normalize()
+        while day < end:
+            lo = max(start, day)
+            hi = min(day + timedelta(days=1), end)
+            ts, price = fetch_prices(lo.to_pydatetime(), hi.to_pydatetime(), conn)
+            # rewrite the overlap even if nothing came back, the DB is the source of truth
+            if len(ts) or _day_path(day.date()).exists():
+                _write_day(day.date(), ts, price, replace_from=lo)
+            fetched += len(ts)
+            day += timedelta(days=1)
+    finally:
+        if own:
+            conn.close()
+    if verbose:
+        print(f"🔄 Synced {fetched:,} rows into {CACHE_DIR} ({time.perf_counter() - start_time:.2f}s)")
+    return fetched
+
+
+def _utc(t, tz):
+    t = pd.Timestamp(t)
+    return (t.tz_localize(tz) if t.tzinfo is None else t).tz_convert("UTC")
+
+
+def load(start=None, end=None, tz=TZ, refresh=False):
+    """
+    Cached ticks with start <= timestamp < end as a DataFrame with a `price`
+    column, indexed by timestamp in `tz`. Naive start / end are read in `tz`.
+    `refresh=True` syncs first.
+    """
+    if refresh:
+        sync()
+    if not _cached_days():
+        return pd.DataFrame({"price": pd.Series(dtype=np.float64)},
+                            index=pd.DatetimeIndex([], tz=tz, name="timestamp"))
+
+    ts_type = SCHEMA.field("timestamp").type
+    expr = None
+    if start is not None:
+        start = _utc(start, tz)
+        expr = (ds.field("date") >= str(start.date())) & (ds.field("timestamp") >= pa.scalar(start.to_pydatetime(), type=ts_type))
+    if end is not None:
+        end = _utc(end, tz)
+        e = (ds.field("date") <= str(end.date())) & (ds.field("timestamp") < pa.scalar(end.to_pydatetime(), type=ts_type))
+        expr = e if expr is None else expr & e
+
+    dataset = ds.dataset(CACHE_DIR, format="parquet", partitioning=PARTITIONING)
+    table = dataset.to_table(columns=["timestamp", "price"], filter=expr)
+    df = table.to_pandas().set_index("timestamp").sort_index()
+    df.index = df.index.tz_convert(tz)
+    return df
+
+
+if __name__ == "__main__":
+    sync()
+    t0 = time.perf_counter()
+    df = load(pd.Timestamp.now(tz=TZ) - timedelta(days=7))
+    print(f"Loaded {len(df):,} ticks from the last 7 days in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    print(df.tail())
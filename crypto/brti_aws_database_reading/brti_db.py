@@ -0,0 +1,108 @@
+"""
+Range queries against the EC2 brti database, straight into NumPy.
+
+brti_prices is partitioned by day (see brti_aws_setup/database_setup.sh), so
+a time-bounded query only scans the partitions it covers. Rows come back as
+a binary COPY stream that is decoded with one `np.frombuffer`, so there are no
+per-row Python objects and no `SELECT *` into pandas.
+
+    from brti_db import fetch_prices, fetch_ohlc
+    ts, price = fetch_prices("2025-07-01", "2025-07-02")
+    bars = fetch_ohlc("1m", "2025-07-01", "2025-07-02")
+
+Connects through the SSH tunnel from create_ssh_tunnel_to_ec2.ps1 by default.
+"""
+import io
+
+import numpy as np
+import psycopg2
+
+DB_HOST = "localhost"
+DB_PORT = 5433
+DB_NAME = "brti"
+DB_USER = "ubuntu"
+
+RESOLUTIONS = ("1s", "1m", "1h")
+OHLC_COLUMNS = ("bucket", "open", "high", "low", "close", "ticks", "realized_vol")
+
+COPY_HEADER = 19   # 11-byte signature, int32 flags, int32 header-extension length (0)
+COPY_TRAILER = 2   # int16 -1
+
+
+def connect(host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER):
+    return psycopg2.connect(host=host, port=port, dbname=dbname, user=user)
+
+
+def _copy_float8(sql, params, ncols, conn=None):
+    """
+    Run `sql` (every column cast to float8, none NULL) as a binary COPY and
+    return an (n, ncols) float64 array.
+    """
+    own = conn is None
+    conn = connect() if own else conn
+    try:
+        with conn.cursor() as cur:
+            query = cur.mogrify(sql, params).decode()
+            buf = io.BytesIO()
+            cur.copy_expert(f"COPY ({query}) TO STDOUT (FORMAT binary)", buf)
+    finally:
+        if own:
+            conn.close()
+
+    # each row: int16 field count, then (int32 length, float8 value) per column, big-endian
+    fields = [("n", ">i2")]
+    for i in range(ncols):
+        fields += [(f"len{i}", ">i4"), (f"v{i}", ">f8")]
+    row = np.dtype(fields)
+    body = buf.getbuffer()[COPY_HEADER:len(buf.getbuffer()) - COPY_TRAILER]
+    rows = np.frombuffer(body, dtype=row)
+    return np.column_stack([rows[f"v{i}"].astype(np.float64) for i in range(ncols)]) if len(rows) \
+        else np.empty((0, ncols))
+
+
+def _epoch_to_datetime64(seconds):
+    return (seconds * 1e6).round().astype("datetime64[us]")
+
+
+def fetch_prices(start, end, conn=None):
+    """
+    BRTI ticks with start <= timestamp < end as (timestamps, prices):
+    datetime64[us] in UTC and float64. `start` / `end` are anything Postgres
+    reads as a timestamptz (datetime, ISO string).
+    """
+    data = _copy_float8(
+        "SELECT extract(epoch FROM timestamp)::float8, price::float8 FROM brti_prices "
+        "WHERE timestamp >= %s AND timestamp < %s AND price IS NOT NULL ORDER BY timestamp",
+        (start, end), 2, conn)
+    return _epoch_to_datetime64(data[:, 0]), data[:, 1]
+
+
+def fetch_ohlc(resolution, start, end, conn=None):
+    """
+    Bars from the brti_ohlc_<resolution> rollup ("1s", "1m" or "1h") with
+    start <= bucket < end, as a dict of arrays keyed by OHLC_COLUMNS. bucket is
+    datetime64[us] UTC and realized_vol is sqrt(Σ tick log returns²) in the bar.
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {RESOLUTIONS}, got {resolution!r}")
+    data = _copy_float8(
+        "SELECT extract(epoch FROM bucket)::float8, open::float8, high::float8, low::float8, "
+        "close::float8, ticks::float8, sqrt(sum_r2)::float8 "
+        f"FROM brti_ohlc_{resolution} WHERE bucket >= %s AND bucket < %s ORDER BY bucket",
+        (start, end), len(OHLC_COLUMNS), conn)
+    bars = dict(zip(OHLC_COLUMNS, data.T))
+    bars["bucket"] = _epoch_to_datetime64(bars["bucket"])
+    bars["ticks"] = bars["ticks"].astype(np.int64)
+    return bars
+
+
+if __name__ == "__main__":
+    import time
+    from datetime import datetime, timedelta, timezone
+
+    end = datetime.now(timezone.utc)
+    t0 = time.perf_counter()
+    ts, price = fetch_prices(end - timedelta(days=1), end)
+    print(f"{len(price):,} ticks in the last 24h ({(time.perf_counter() - t0) * 1000:.0f} ms)")
+    if len(price):
+        print(f"first {ts[0]} {price[0]:,.2f}  last {ts[-1]} {price[-1]:,.2f}")
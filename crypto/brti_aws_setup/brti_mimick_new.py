@@ -1,20 +1,11 @@
-import asyncio, bisect, time, os, logging
-from collections import defaultdict
+import asyncio, time, logging
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Dict, List
 import numpy as np
-import psycopg2
-from psycopg2 import OperationalError
 from pytz import timezone
-from dotenv import load_dotenv
 
-# === Load env for DB creds ===
-load_dotenv()
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_NAME = os.getenv("DB_NAME", "brti")
-DB_USER = os.getenv("DB_USER", "postgres")
-DB_PORT = int(os.getenv("DB_PORT", "5432"))
+from db_writer import BatchWriter
 
 # === Setup logging to file and console ===
 logging.basicConfig(
@@ -28,37 +19,9 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 est = timezone('US/Eastern')
-conn = None
+# inserts are buffered and flushed in batches on a background thread, never on the event loop
+db_writer = BatchWriter("brti_prices", ("price", "timestamp"))
 
-def connect_to_db():
-    global conn
-    while True:
-        try:
-            logger.info("📡 Attempting PostgreSQL connection...")
-            conn = psycopg2.connect(
-                host=DB_HOST,
-                dbname=DB_NAME,
-                user=DB_USER,
-                port=DB_PORT
-            )
-            conn.autocommit = True
-            logger.info("✅ Connected to PostgreSQL.")
-            break
-        except OperationalError as e:
-            logger.warning(f"⏳ PostgreSQL connection failed. Retrying in 5s... Error: {e}")
-            time.sleep(5)
-
-def insert_to_db(price: float, timestamp: datetime):
-    global conn
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO brti_prices (price, timestamp) VALUES (%s, %s)",
-                (float(price), timestamp)
-            )
-    except (Exception, OperationalError) as e:
-        logger.error(f"❌ Database insert error: {e}")
-        connect_to_db()
 
 # === Choose ccxt backend ===
 try:
@@ -88,17 +51,31 @@ DEF_SYM = "BTC/USD"
 
 @dataclass(slots=True)
 class Book:
-    bids: List[Tuple[float, float]]
-    asks: List[Tuple[float, float]]
+    bids: np.ndarray   # (n, 2) [price, size], best first
+    asks: np.ndarray
     ts: int
 
 def now_ms() -> int: return int(time.time() * 1000)
+
+def _levels(raw) -> np.ndarray:
+    """ccxt [[price, size, ...], ...] -> (n, 2) float array without empty levels."""
+    arr = np.array([lvl[:2] for lvl in raw], dtype=float).reshape(-1, 2)
+    return arr[arr[:, 1] > 0]
+
+def _merge(sides: List[np.ndarray], descending: bool):
+    """Consolidate one side of several books into (prices, summed sizes), best first."""
+    lv = np.concatenate(sides) if sides else np.empty((0, 2))
+    if lv.size == 0: return np.empty(0), np.empty(0)
+    order = np.argsort(-lv[:, 0] if descending else lv[:, 0], kind='stable')
+    px = lv[order, 0]
+    sz = lv[order, 1]
+    starts = np.flatnonzero(np.r_[True, px[1:] != px[:-1]])
+    return px[starts], np.add.reduceat(sz, starts)
 def mid(b: Book) -> float: return (b.bids[0][0] + b.asks[0][0]) / 2
 def crossing(b: Book) -> bool: return b.bids[0][0] >= b.asks[0][0]
 
 class BRTI:
     def __init__(self):
-        connect_to_db()
         self.ex: Dict[str, "ccxt.Exchange"] = {}
         for eid in CANDIDATES:
             try:
@@ -116,10 +93,7 @@ class BRTI:
         lim = DEPTH.get(eid)
         try:
             ob = await ex.fetch_order_book(sym, limit=lim)
-            self.books[eid] = Book(
-                [(float(p), float(s)) for p, s, *_ in ob['bids'] if s > 0],
-                [(float(p), float(s)) for p, s, *_ in ob['asks'] if s > 0],
-                ob.get('timestamp') or now_ms())
+            self.books[eid] = Book(_levels(ob['bids']), _levels(ob['asks']), ob.get('timestamp') or now_ms())
         except Exception as e:
             logger.warning(f"[{eid}] REST error: {e}")
 
@@ -130,27 +104,21 @@ class BRTI:
         while True:
             try:
                 ob = await ex.watch_order_book(sym, limit=lim)
-                self.books[eid] = Book(
-                    [(float(p), float(s)) for p, s, *_ in ob['bids'] if s > 0],
-                    [(float(p), float(s)) for p, s, *_ in ob['asks'] if s > 0],
-                    ob.get('timestamp') or now_ms())
+                self.books[eid] = Book(_levels(ob['bids']), _levels(ob['asks']), ob.get('timestamp') or now_ms())
             except Exception as e:
                 logger.warning(f"[{eid}] WS error: {e}")
                 await asyncio.sleep(1)
 
+    # Books hold (n, 2) float arrays of [price, size]; the math is vectorised
+    # over all venues / the whole 1-BTC grid (same as websockets/brti.py,
+    # whose `--bench` mode checks it against the original loop version).
     @staticmethod
     def _consol(bks: Dict[str, Book]):
-        bmap, amap = defaultdict(float), defaultdict(float)
-        for bk in bks.values():
-            for p, s in bk.bids: bmap[p] += s
-            for p, s in bk.asks: amap[p] += s
-        bids = sorted(bmap.items(), key=lambda x: -x[0])
-        asks = sorted(amap.items(), key=lambda x: x[0])
-        return bids, asks
+        return _merge([b.bids for b in bks.values()], True), _merge([b.asks for b in bks.values()], False)
 
     @staticmethod
     def _cap(bids, asks):
-        samp = np.array([s for _, s in bids[:MAX_SAMPLE]] + [s for _, s in asks[:MAX_SAMPLE]])
+        samp = np.concatenate((bids[1][:MAX_SAMPLE], asks[1][:MAX_SAMPLE]))
         if samp.size == 0: return 0.
         samp.sort(); k = max(1, int(.01 * len(samp)))
         wins = samp.copy(); wins[:k] = wins[k]; wins[-k:] = wins[-k - 1]
@@ -158,16 +126,17 @@ class BRTI:
 
     @staticmethod
     def _cum(levels):
-        v, p, tot = [], [], 0.
-        for pr, sz in levels:
-            tot += sz; v.append(tot); p.append(pr)
-        return np.asarray(v), np.asarray(p)
+        prices, sizes = levels
+        return np.cumsum(sizes), prices
 
-    def _curve(self, vols, prices, grid):
-        return np.fromiter((prices[min(bisect.bisect_left(vols, v), len(prices) - 1)] for v in grid), float)
+    @staticmethod
+    def _curve(vols, prices, grid):
+        idx = np.searchsorted(vols, grid, side='left')
+        return prices[np.minimum(idx, len(prices) - 1)]
 
     def calc(self):
-        fresh = {e: b for e, b in self.books.items() if now_ms() - b.ts <= STALE_S * 1000 and not crossing(b)}
+        fresh = {e: b for e, b in self.books.items()
+                 if now_ms() - b.ts <= STALE_S * 1000 and len(b.bids) and len(b.asks) and not crossing(b)}
         if not fresh: return None, []
         mids = np.array([mid(b) for b in fresh.values()])
         med = np.median(mids)
@@ -176,15 +145,16 @@ class BRTI:
         bids, asks = self._consol(ok)
         cap = self._cap(bids, asks)
         if cap == 0: return None, []
-        bids = [(p, min(s, cap)) for p, s in bids]
-        asks = [(p, min(s, cap)) for p, s in asks]
+        bids = (bids[0], np.minimum(bids[1], cap))
+        asks = (asks[0], np.minimum(asks[1], cap))
         bv, bp = self._cum(bids)
         av, ap = self._cum(asks)
         tot = min(bv[-1], av[-1])
         if tot < SPACING_VOL: return None, []
         grid = np.arange(SPACING_VOL, tot + SPACING_VOL, SPACING_VOL)
-        mc = (self._curve(bv, bp, grid) + self._curve(av, ap, grid)) / 2
-        sc = self._curve(av, ap, grid) / mc - 1
+        ac = self._curve(av, ap, grid)
+        mc = (self._curve(bv, bp, grid) + ac) / 2
+        sc = ac / mc - 1
         mask = sc <= DEV_MID
         depth = grid[mask].max() if mask.any() else SPACING_VOL
         gu = grid[grid <= depth]
@@ -209,11 +179,14 @@ class BRTI:
                 logger.info(f"[{ts_str} EST] BRTI withheld – data")
             else:
                 logger.info(f"[{ts_str} EST] BRTI {idx:,.2f} USD (from {', '.join(ven)})")
-                insert_to_db(idx, ts)
+                db_writer.submit((float(idx), ts))
             await asyncio.sleep(TICK)
 
 if __name__ == '__main__':
+    db_writer.start()
     try:
         asyncio.run(BRTI().run())
     except KeyboardInterrupt:
         logger.info("Stopped by user.")
+    finally:
+        db_writer.close()
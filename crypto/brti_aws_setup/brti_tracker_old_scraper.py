@@ -8,17 +8,8 @@ from pytz import timezone
 from playwright.sync_api import sync_playwright
 import numpy as np
 import psutil
-import psycopg2
-from psycopg2 import OperationalError
-from dotenv import load_dotenv
 
-# === Load environment variables ===
-load_dotenv()
-
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_NAME = os.getenv("DB_NAME", "brti")
-DB_USER = os.getenv("DB_USER", "postgres")
-DB_PORT = int(os.getenv("DB_PORT", "5432"))
+from db_writer import BatchWriter
 
 # === Logging setup ===
 logging.basicConfig(
@@ -38,41 +29,13 @@ latest_price = {
 script_start_time = time.time()
 max_runtime_seconds = 20 * 60  # ⏱ Auto-restart after 20 minutes
 est = timezone('US/Eastern')
-conn = None
-
-def connect_to_db():
-    global conn
-    while True:
-        try:
-            logging.info("📡 Attempting PostgreSQL connection...")
-            conn = psycopg2.connect(
-                host=DB_HOST,
-                dbname=DB_NAME,
-                user=DB_USER,
-                port=DB_PORT
-            )
-            conn.autocommit = True
-            logging.info("✅ Connected to PostgreSQL.")
-            break
-        except OperationalError as e:
-            logging.warning(f"⏳ PostgreSQL connection failed. Retrying in 5s... Error: {e}")
-            time.sleep(5)
-
-def insert_to_db(price, sma, timestamp):
-    global conn
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO brti_prices (price, simple_average, timestamp) VALUES (%s, %s, %s)",
-                (float(price), float(sma), timestamp)
-            )
-    except (Exception, OperationalError) as e:
-        logging.error(f"❌ Database error during insert: {e}")
-        connect_to_db()
+# inserts are buffered and flushed in batches off the polling thread
+db_writer = BatchWriter("brti_prices", ("price", "simple_average", "timestamp"))
 
 def safe_restart():
     try:
         logging.warning("🔁 Restarting script...")
+        db_writer.close()  # flush or spill buffered rows; execv would drop them
         os.execv(sys.executable, ['python'] + sys.argv)
     except Exception as e:
         logging.critical(f"💥 Failed to restart script: {e}")
@@ -80,7 +43,7 @@ def safe_restart():
 
 def poll_brti():
     logging.info("🌀 Starting BRTI polling loop...")
-    connect_to_db()
+    db_writer.start()
 
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
@@ -129,7 +92,7 @@ def poll_brti():
                     mem_mb = mem_total / 1024 / 1024    
 
                     logging.info(f"📈 BRTI: {price:.2f} | SMA(60): {sma:.2f} | Mem: {mem_mb:.2f}MB ")
-                    insert_to_db(price, sma, timestamp_dt)
+                    db_writer.submit((float(price), float(sma), timestamp_dt))
 
                 if time.time() - script_start_time > max_runtime_seconds:
                     logging.info("🕒 20 minutes elapsed. Restarting script to ensure stability.")
@@ -24,33 +24,185 @@ sudo sed -i 's/^host\s\+all\s\+all\s\+::1\/128\s\+.*/host    all             all
 # Restart PostgreSQL to apply changes
 sudo systemctl restart postgresql
 
-# === Create database, drop old table, create new one ===
-echo "📦 Creating database and refreshing brti_prices table..."
-sudo -u postgres psql <<EOF
+# === Create database and the partitioned brti_prices table ===
+# brti_prices is range-partitioned by day on timestamp (the same layout as a
+# TimescaleDB hypertable with 1-day chunks) with a BRIN index, so range
+# queries only touch the days they ask for. Every INSERT statement also
+# upserts 1s / 1m / 1h OHLC + realized-vol rollups from its new rows.
+# Re-running is safe: an existing flat brti_prices is migrated, not dropped.
+PARTITION_DAYS_AHEAD=7
+
+# One rollup table, view and upsert per resolution (suffix:date_trunc unit)
+ROLLUPS="1s:second 1m:minute 1h:hour"
+ROLLUP_TABLES=""
+ROLLUP_UPSERTS=""
+ROLLUP_GRANTS=""
+for r in $ROLLUPS; do
+    suffix=${r%%:*}
+    unit=${r##*:}
+    ROLLUP_TABLES+="
+CREATE TABLE IF NOT EXISTS brti_ohlc_${suffix} (
+    bucket TIMESTAMPTZ PRIMARY KEY,
+    open NUMERIC(10, 2),
+    high NUMERIC(10, 2),
+    low NUMERIC(10, 2),
+    close NUMERIC(10, 2),
+    first_ts TIMESTAMPTZ,
+    last_ts TIMESTAMPTZ,
+    ticks INTEGER,
+    n_returns INTEGER,
+    sum_r DOUBLE PRECISION,   -- sum of tick log returns in the bucket
+    sum_r2 DOUBLE PRECISION   -- sum of squared log returns = realized variance
+);
+CREATE OR REPLACE VIEW brti_rv_${suffix} AS
+    SELECT bucket, open, high, low, close, ticks, sqrt(sum_r2) AS realized_vol
+    FROM brti_ohlc_${suffix};
+"
+    ROLLUP_UPSERTS+="
+    WITH batch AS (
+        SELECT timestamp, price,
+               ln(price / NULLIF(lag(price, 1, prev) OVER (ORDER BY timestamp), 0))::DOUBLE PRECISION AS r
+        FROM new_rows WHERE price IS NOT NULL
+    )
+    INSERT INTO brti_ohlc_${suffix} AS o
+    SELECT date_trunc('${unit}', timestamp),
+           (array_agg(price ORDER BY timestamp))[1],
+           max(price), min(price),
+           (array_agg(price ORDER BY timestamp DESC))[1],
+           min(timestamp), max(timestamp),
+           count(*), count(r), coalesce(sum(r), 0), coalesce(sum(r * r), 0)
+    FROM batch GROUP BY 1
+    ON CONFLICT (bucket) DO UPDATE SET
+        open = CASE WHEN EXCLUDED.first_ts < o.first_ts THEN EXCLUDED.open ELSE o.open END,
+        close = CASE WHEN EXCLUDED.last_ts >= o.last_ts THEN EXCLUDED.close ELSE o.close END,
+        high = GREATEST(o.high, EXCLUDED.high),
+        low = LEAST(o.low, EXCLUDED.low),
+        first_ts = LEAST(o.first_ts, EXCLUDED.first_ts),
+        last_ts = GREATEST(o.last_ts, EXCLUDED.last_ts),
+        ticks = o.ticks + EXCLUDED.ticks,
+        n_returns = o.n_returns + EXCLUDED.n_returns,
+        sum_r = o.sum_r + EXCLUDED.sum_r,
+        sum_r2 = o.sum_r2 + EXCLUDED.sum_r2;
+"
+    ROLLUP_GRANTS+="
+GRANT SELECT, INSERT, UPDATE ON TABLE brti_ohlc_${suffix} TO ubuntu;
+GRANT SELECT ON brti_rv_${suffix} TO ubuntu;"
+done
+
+echo "📦 Creating database, partitioned brti_prices table and rollups..."
+sudo -u postgres psql -v ON_ERROR_STOP=1 <<EOF
+-- CREATE DATABASE can't run inside a DO block, so build it conditionally
+SELECT 'CREATE DATABASE brti' WHERE NOT EXISTS (SELECT FROM pg_database WHERE datname = 'brti')\\gexec
+
+\c brti
+
+-- Daily partitions brti_prices_YYYYMMDD for every day in [from_day, to_day].
+-- Days that already exist are skipped without touching the default partition.
+-- If default already holds rows for a new day (the cron job stopped), the
+-- partition can't be created over them: default is detached, the day created,
+-- its rows moved in, and default re-attached. Each day is its own
+-- subtransaction, so one failing day is logged and the rest still get created.
+CREATE OR REPLACE FUNCTION brti_ensure_partitions(from_day DATE, to_day DATE) RETURNS VOID
+LANGUAGE plpgsql AS \$\$
+DECLARE d DATE; part TEXT; has_default BOOLEAN; moved BIGINT;
+BEGIN
+    FOR d IN SELECT generate_series(from_day, to_day, INTERVAL '1 day')::DATE LOOP
+        part := 'brti_prices_' || to_char(d, 'YYYYMMDD');
+        CONTINUE WHEN to_regclass(part) IS NOT NULL;
+        BEGIN
+            has_default := to_regclass('brti_prices_default') IS NOT NULL;
+            IF has_default AND EXISTS (SELECT FROM brti_prices_default
+                                       WHERE timestamp >= d::TIMESTAMPTZ AND timestamp < (d + 1)::TIMESTAMPTZ) THEN
+                ALTER TABLE brti_prices DETACH PARTITION brti_prices_default;
+                EXECUTE format('CREATE TABLE %I PARTITION OF brti_prices FOR VALUES FROM (%L) TO (%L)',
+                               part, d::TIMESTAMPTZ, (d + 1)::TIMESTAMPTZ);
+                -- straight into the partition: these rows were rolled up when first inserted
+                EXECUTE format('WITH m AS (DELETE FROM brti_prices_default WHERE timestamp >= %L AND timestamp < %L '
+                               'RETURNING id, price, timestamp) INSERT INTO %I (id, price, timestamp) SELECT * FROM m',
+                               d::TIMESTAMPTZ, (d + 1)::TIMESTAMPTZ, part);
+                GET DIAGNOSTICS moved = ROW_COUNT;
+                ALTER TABLE brti_prices ATTACH PARTITION brti_prices_default DEFAULT;
+                RAISE NOTICE 'Created % and moved % rows into it from brti_prices_default', part, moved;
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF brti_prices FOR VALUES FROM (%L) TO (%L)',
+                               part, d::TIMESTAMPTZ, (d + 1)::TIMESTAMPTZ);
+            END IF;
+        EXCEPTION WHEN OTHERS THEN
+            RAISE WARNING 'Could not create partition %: %', part, SQLERRM;
+        END;
+    END LOOP;
+END
+\$\$;
+
+-- A flat brti_prices from an earlier setup is set aside and migrated below
 DO \$\$
 BEGIN
-    IF NOT EXISTS (SELECT FROM pg_database WHERE datname = 'brti') THEN
-        CREATE DATABASE brti;
-        RAISE NOTICE '🆕 Database ''brti'' created.';
+    IF EXISTS (SELECT FROM pg_class WHERE relname = 'brti_prices' AND relkind = 'r') THEN
+        ALTER TABLE brti_prices RENAME TO brti_prices_flat;
+        ALTER SEQUENCE IF EXISTS brti_prices_id_seq RENAME TO brti_prices_flat_id_seq;
+        RAISE NOTICE '🔁 Migrating existing flat brti_prices.';
     END IF;
 END
 \$\$;
 
-\c brti
+CREATE TABLE IF NOT EXISTS brti_prices (
+    id BIGSERIAL,
+    price NUMERIC(10, 2),
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT now()
+) PARTITION BY RANGE (timestamp);
 
--- Drop old table if exists
-DROP TABLE IF EXISTS brti_prices;
+-- Catches rows outside the pre-created days (e.g. if the cron job stops)
+CREATE TABLE IF NOT EXISTS brti_prices_default PARTITION OF brti_prices DEFAULT;
 
--- Create updated table without simple_average
-CREATE TABLE brti_prices (
-    id SERIAL PRIMARY KEY,
-    price NUMERIC(10, 2),
-    timestamp TIMESTAMPTZ
-);
+-- Tiny index for append-only, time-ordered data; cascades to every partition
+CREATE INDEX IF NOT EXISTS brti_prices_timestamp_brin ON brti_prices USING BRIN (timestamp);
+
+SELECT brti_ensure_partitions(current_date - 1, current_date + ${PARTITION_DAYS_AHEAD});
+${ROLLUP_TABLES}
+-- Incremental rollups, one pass per INSERT statement (the tracker writes in
+-- batches). A batch's first return is taken against the last rolled-up close.
+CREATE OR REPLACE FUNCTION brti_rollup() RETURNS TRIGGER
+LANGUAGE plpgsql AS \$\$
+DECLARE prev NUMERIC;
+BEGIN
+    SELECT close INTO prev FROM brti_ohlc_1s
+    WHERE bucket <= (SELECT min(timestamp) FROM new_rows)
+    ORDER BY bucket DESC LIMIT 1;
+${ROLLUP_UPSERTS}
+    RETURN NULL;
+END
+\$\$;
+
+DROP TRIGGER IF EXISTS brti_prices_rollup ON brti_prices;
+CREATE TRIGGER brti_prices_rollup AFTER INSERT ON brti_prices
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION brti_rollup();
+
+-- Migrate the flat table, creating its days first so rows don't land in default
+DO \$\$
+DECLARE lo DATE; hi DATE;
+BEGIN
+    IF EXISTS (SELECT FROM pg_class WHERE relname = 'brti_prices_flat' AND relkind = 'r') THEN
+        SELECT min(timestamp)::DATE, max(timestamp)::DATE INTO lo, hi FROM brti_prices_flat;
+        IF lo IS NOT NULL THEN
+            PERFORM brti_ensure_partitions(lo, hi);
+        END IF;
+        INSERT INTO brti_prices (price, timestamp)
+            SELECT price, timestamp FROM brti_prices_flat WHERE timestamp IS NOT NULL ORDER BY timestamp;
+        DROP TABLE brti_prices_flat;
+        RAISE NOTICE '✅ Migrated flat brti_prices into daily partitions.';
+    END IF;
+END
+\$\$;
 
 -- Grant full access to ubuntu user
 GRANT ALL PRIVILEGES ON TABLE brti_prices TO ubuntu;
 GRANT USAGE, SELECT ON SEQUENCE brti_prices_id_seq TO ubuntu;
+${ROLLUP_GRANTS}
 EOF
 
-echo "✅ PostgreSQL setup complete. Database: brti | Table: brti_prices (without simple_average)"
+# Create the coming days' partitions every night
+CRON_LINE="15 0 * * * psql -d brti -c \"SELECT brti_ensure_partitions(current_date, current_date + ${PARTITION_DAYS_AHEAD});\""
+( sudo crontab -u postgres -l 2>/dev/null | grep -v brti_ensure_partitions; echo "$CRON_LINE" ) | sudo crontab -u postgres -
+
+echo "✅ PostgreSQL setup complete. Database: brti | Table: brti_prices (daily partitions, BRIN) | Rollups: brti_ohlc_1s / 1m / 1h"
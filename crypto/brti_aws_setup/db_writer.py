@@ -0,0 +1,242 @@
+"""
+Batched, non-blocking Postgres writer for the BRTI trackers.
+
+The trackers used to run one autocommit INSERT per tick on the caller's
+thread and reconnect synchronously on error, which stalled price polling (and
+the asyncio loop in brti_mimick_new.py). Now:
+
+  * `submit(row)` only appends to an in-memory buffer.
+  * A background thread flushes the buffer with one `execute_values` INSERT
+    per batch, every BATCH_ROWS rows or FLUSH_MS milliseconds.
+  * While Postgres is unreachable, batches are appended to a local CSV spill
+    file. Reconnects are retried every RECONNECT_S, and the spill file is
+    replayed before new rows once the database is back.
+  * Flush latency, backlog and spill counts are logged every STATS_S and
+    written to a JSON metrics file for monitoring.
+
+Kept in this folder (not crypto/) because the trackers are deployed to EC2 on
+their own.
+"""
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import psycopg2
+from psycopg2 import OperationalError, InterfaceError
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+load_dotenv()
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_NAME = os.getenv("DB_NAME", "brti")
+DB_USER = os.getenv("DB_USER", "postgres")
+DB_PORT = int(os.getenv("DB_PORT", "5432"))
+
+BATCH_ROWS = 50            # flush once this many rows are buffered ...
+FLUSH_MS = 1000            # ... or this long after the last flush
+RECONNECT_S = 5
+REPLAY_CHUNK = 5000        # spilled rows per INSERT when replaying
+STATS_S = 60
+LATENCY_SAMPLES = 1000     # recent flushes kept for latency percentiles
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    def __init__(self, table, columns, spill_path=None, metrics_path=None,
+                 batch_rows=BATCH_ROWS, flush_ms=FLUSH_MS):
+        self.table = table
+        self.columns = tuple(columns)
+        self.spill_path = spill_path or f"{table}_spill.csv"
+        self.metrics_path = metrics_path or f"{table}_writer_metrics.json"
+        self.batch_rows = batch_rows
+        self.flush_s = flush_ms / 1000
+        self.sql = f"INSERT INTO {table} ({', '.join(self.columns)}) VALUES %s"
+
+        self.buffer = deque()
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self.conn = None
+        self.thread = None
+
+        # metrics
+        self.rows_written = 0
+        self.rows_spilled = 0
+        self.rows_replayed = 0
+        self.spill_backlog = self._count_spilled()
+        self.flush_latency_ms = deque(maxlen=LATENCY_SAMPLES)
+        self.last_stats = time.time()
+
+    # ------------- producer side -------------
+    def submit(self, row):
+        """Queue one row (a tuple in `columns` order). Never blocks on the database."""
+        self.buffer.append(row)
+        if len(self.buffer) >= self.batch_rows:
+            self.wake.set()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self, timeout=10):
+        """Flush what's buffered (or spill it) and stop, e.g. before os.execv."""
+        self.stopping.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        if self.buffer:
+            self._spill(self._drain())
+        if self.conn is not None:
+            self._disconnect()
+
+    # ------------- writer thread -------------
+    def _run(self):
+        logger.info(f"🗄️ Batch writer for {self.table} started "
+                    f"({self.batch_rows} rows / {self.flush_s * 1000:.0f} ms).")
+        last_attempt = 0.0
+        while not self.stopping.is_set():
+            self.wake.wait(self.flush_s)
+            self.wake.clear()
+
+            if self.conn is None and time.time() - last_attempt >= RECONNECT_S:
+                last_attempt = time.time()
+                self._connect()
+            if self.conn is not None and self.spill_backlog:
+                self._replay()
+
+            rows = self._drain()
+            if rows:
+                if self.conn is None or not self._write(rows):
+                    self._spill(rows)
+
+            if time.time() - self.last_stats >= STATS_S:
+                self._export_stats()
+
+        # final flush on close
+        rows = self._drain()
+        if rows and (self.conn is None or not self._write(rows)):
+            self._spill(rows)
+        self._export_stats()
+
+    def _drain(self):
+        rows = []
+        while self.buffer:
+            rows.append(self.buffer.popleft())
+        return rows
+
+    def _connect(self):
+        try:
+            logger.info("📡 Attempting PostgreSQL connection...")
+            self.conn = psycopg2.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER, port=DB_PORT)
+            logger.info("✅ Connected to PostgreSQL.")
+        except OperationalError as e:
+            logger.warning(f"⏳ PostgreSQL connection failed. Retrying in {RECONNECT_S}s... Error: {e}")
+            self.conn = None
+
+    def _write(self, rows):
+        start = time.perf_counter()
+        try:
+            with self.conn.cursor() as cur:
+                execute_values(cur, self.sql, rows, page_size=len(rows))
+            self.conn.commit()
+        except (OperationalError, InterfaceError) as e:
+            logger.error(f"❌ Database connection lost during insert: {e}")
+            self._disconnect()
+            return False
+        except Exception as e:
+            # bad data, not a dead connection: roll back and keep the rows on disk
+            logger.error(f"❌ Database error during insert: {e}")
+            self.conn.rollback()
+            return False
+        self.flush_latency_ms.append((time.perf_counter() - start) * 1000)
+        self.rows_written += len(rows)
+        return True
+
+    def _disconnect(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        self.conn = None
+
+    # ------------- spill file -------------
+    def _spill(self, rows):
+        with open(self.spill_path, "a", newline="") as f:
+            writer = csv.writer(f)
+            for row in rows:
+                writer.writerow(["" if v is None else v.isoformat() if isinstance(v, datetime) else v for v in row])
+        self.rows_spilled += len(rows)
+        self.spill_backlog += len(rows)
+        logger.warning(f"💾 Spilled {len(rows)} rows to {self.spill_path} (backlog {self.spill_backlog}).")
+
+    def _count_spilled(self):
+        if not os.path.exists(self.spill_path):
+            return 0
+        with open(self.spill_path, newline="") as f:
+            return sum(1 for _ in f)
+
+    def _replay(self):
+        """Insert the spill file in chunks; the file is removed only once every chunk has committed."""
+        # Postgres casts the text fields (ISO timestamps, numbers) to the column types
+        with open(self.spill_path, newline="") as f:
+            rows = [tuple(None if v == "" else v for v in row) for row in csv.reader(f)]
+        done = 0
+        for i in range(0, len(rows), REPLAY_CHUNK):
+            if not self._write(rows[i:i + REPLAY_CHUNK]):
+                if self.conn is not None:
+                    # the database is up but rejected the rows: set them aside instead of retrying forever
+                    with open(self.spill_path + ".rejected", "a", newline="") as f:
+                        csv.writer(f).writerows(rows[i:])
+                    os.remove(self.spill_path)
+                    logger.error(f"🚫 {len(rows) - i} spilled rows rejected, moved to {self.spill_path}.rejected")
+                    self.rows_replayed += done
+                    self.spill_backlog = 0
+                    return
+                break
+            done = i + len(rows[i:i + REPLAY_CHUNK])
+
+        if done == len(rows):
+            os.remove(self.spill_path)
+        elif done:
+            # keep only what didn't make it
+            with open(self.spill_path, "w", newline="") as f:
+                csv.writer(f).writerows(rows[done:])
+        self.rows_replayed += done
+        self.spill_backlog = len(rows) - done
+        if done:
+            logger.info(f"♻️ Replayed {done} spilled rows ({self.spill_backlog} left).")
+
+    # ------------- metrics -------------
+    def stats(self):
+        lat = np.array(self.flush_latency_ms) if self.flush_latency_ms else np.zeros(1)
+        return {
+            "table": self.table,
+            "connected": self.conn is not None,
+            "buffered": len(self.buffer),
+            "spill_backlog": self.spill_backlog,
+            "rows_written": self.rows_written,
+            "rows_spilled": self.rows_spilled,
+            "rows_replayed": self.rows_replayed,
+            "flush_ms_p50": round(float(np.percentile(lat, 50)), 3),
+            "flush_ms_p99": round(float(np.percentile(lat, 99)), 3),
+            "flush_ms_max": round(float(lat.max()), 3),
+            "updated": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    def _export_stats(self):
+        self.last_stats = time.time()
+        stats = self.stats()
+        logger.info(f"📊 DB writer: {stats['rows_written']} written, {stats['buffered']} buffered, "
+                    f"{stats['spill_backlog']} spilled backlog, flush p50 {stats['flush_ms_p50']:.1f} ms "
+                    f"p99 {stats['flush_ms_p99']:.1f} ms")
+        tmp = self.metrics_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(stats, f)
+        os.replace(tmp, self.metrics_path)
@@ -0,0 +1,217 @@
+# brti_feed.py
+"""Local fan-out of the BRTI feed
+==============================
+`brti_listener.py` is the one process that owns a price source (scraper or
+engine, see price_source.py). Everything else on the box subscribes to it
+instead of running its own browser or polling `/price` over HTTP:
+
+  * push    – `FeedPublisher` sends every new tick to all `FeedClient`s over a
+              Unix domain socket as a fixed 40-byte frame.
+  * latest  – `latest_price()` reads the newest tick from the `PriceStore`
+              shared-memory segment the daemon also writes (no socket needed).
+
+Frames carry the wall-clock time the daemon received the price, so every
+client measures end-to-end latency (price read → callback) in a
+`LatencyHistogram`. `python brti_feed.py` subscribes and prints it.
+"""
+
+from __future__ import annotations
+import asyncio
+import inspect
+import os
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from latency import LatencyHistogram
+from shm_store import PriceStore
+
+FEED_SOCKET = os.environ.get("BRTI_FEED_SOCKET", "/tmp/brti_feed.sock")
+FRAME = struct.Struct("<qddqq")   # seq, price, simple_average, tick_ns, sent_ns
+RECONNECT_S = 1.0
+STALE_S = 30                      # latest_price ignores shm ticks older than this
+
+
+@dataclass(slots=True)
+class Tick:
+    seq: int
+    price: float
+    simple_average: float
+    tick_ns: int      # time.time_ns() when the daemon received the price
+    sent_ns: int      # time.time_ns() when the frame was written
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.fromtimestamp(self.tick_ns / 1e9).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class FeedPublisher:
+    """Accepts subscribers on a Unix socket and pushes every published tick to all of them."""
+
+    def __init__(self, path: str = FEED_SOCKET):
+        self.path = path
+        self.seq = 0
+        self.clients: List[socket.socket] = []
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket from a crashed daemon
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return  # closed
+            # never wait on a subscriber: one that stops reading is dropped, not waited for
+            conn.setblocking(False)
+            with self.lock:
+                self.clients.append(conn)
+            print(f"🔗 Feed subscriber connected ({len(self.clients)} total).")
+
+    def publish(self, price: float, simple_average: float, tick_ns: Optional[int] = None):
+        self.seq += 1
+        tick_ns = time.time_ns() if tick_ns is None else tick_ns
+        frame = FRAME.pack(self.seq, price, simple_average, tick_ns, time.time_ns())
+        with self.lock:
+            clients = list(self.clients)
+        dead = []
+        for conn in clients:
+            try:
+                # a partial send would leave a torn frame in the stream, so it counts as stuck too
+                if conn.send(frame) != len(frame):
+                    raise BlockingIOError
+            except OSError as e:  # BlockingIOError: its buffer is full, it stopped reading
+                print(f"⚠️ Dropping feed subscriber: {e!r}")
+                conn.close()
+                dead.append(conn)
+        if dead:
+            with self.lock:
+                self.clients = [c for c in self.clients if c not in dead]
+
+    def close(self):
+        with self.lock:
+            for conn in self.clients:
+                conn.close()
+            self.clients = []
+        self.server.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class FeedClient:
+    """
+    Subscribes to the daemon and calls `on_tick(Tick)` for every tick, from
+    `run()` (blocking, reconnects), `start()` (daemon thread) or `await arun()`
+    (on an asyncio loop; `on_tick` may then be a coroutine function). `latest`
+    is the last tick received. Missed sequence numbers are counted in `gaps`.
+    """
+
+    def __init__(self, on_tick: Optional[Callable[[Tick], None]] = None, path: str = FEED_SOCKET):
+        self.on_tick = on_tick
+        self.path = path
+        self.latest: Optional[Tick] = None
+        self.gaps = 0
+        self.latency = LatencyHistogram("price → client")
+
+    def _connect(self) -> socket.socket:
+        while True:
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(self.path)
+                print("📡 Subscribed to BRTI feed.")
+                return sock
+            except OSError:
+                sock.close()
+                time.sleep(RECONNECT_S)
+
+    def run(self):
+        while True:
+            sock = self._connect()
+            buf = b""
+            try:
+                while True:
+                    chunk = sock.recv(4096)
+                    if not chunk:
+                        break
+                    buf += chunk
+                    n = len(buf) // FRAME.size * FRAME.size
+                    for off in range(0, n, FRAME.size):
+                        self._handle(Tick(*FRAME.unpack_from(buf, off)))
+                    buf = buf[n:]
+            except OSError as e:
+                print(f"[{datetime.now()}] ⚠️ BRTI feed error: {e}")
+            finally:
+                sock.close()
+            print("🔌 BRTI feed disconnected, reconnecting...")
+            time.sleep(RECONNECT_S)
+
+    async def arun(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError:
+                await asyncio.sleep(RECONNECT_S)
+                continue
+            print("📡 Subscribed to BRTI feed.")
+            try:
+                while True:
+                    frame = await reader.readexactly(FRAME.size)
+                    result = self._handle(Tick(*FRAME.unpack(frame)))
+                    if inspect.isawaitable(result):
+                        await result
+            except (asyncio.IncompleteReadError, OSError) as e:
+                if not isinstance(e, asyncio.IncompleteReadError):
+                    print(f"[{datetime.now()}] ⚠️ BRTI feed error: {e}")
+            finally:
+                writer.close()
+            print("🔌 BRTI feed disconnected, reconnecting...")
+            await asyncio.sleep(RECONNECT_S)
+
+    def _handle(self, tick: Tick):
+        self.latency.record((time.time_ns() - tick.tick_ns) / 1e9)
+        if self.latest is not None and tick.seq > self.latest.seq + 1:
+            self.gaps += tick.seq - self.latest.seq - 1
+        self.latest = tick
+        if self.on_tick is not None:
+            return self.on_tick(tick)
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+
+_price_store: Optional[PriceStore] = None
+
+def latest_price() -> Tuple[Optional[float], Optional[float], Optional[str]]:
+    """(brti, simple_average, timestamp) from the daemon's shared memory, Nones if it isn't running."""
+    global _price_store
+    try:
+        if _price_store is None:
+            _price_store = PriceStore.attach()
+        price, average, ts = _price_store.latest_price()
+        if price is None or time.time() - ts > STALE_S:
+            return None, None, None
+        return price, average, datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+    except (FileNotFoundError, RuntimeError):
+        return None, None, None
+
+
+if __name__ == "__main__":
+    # Subscribe and report end-to-end latency every 10 s
+    client = FeedClient(on_tick=lambda t: print(f"[{t.timestamp}] #{t.seq} BRTI {t.price:,.2f} (avg {t.simple_average:,.2f})"))
+    client.start()
+    try:
+        while True:
+            time.sleep(10)
+            print(f"[STATS] {client.latency} gaps={client.gaps}")
+    except KeyboardInterrupt:
+        print("Stopped.")
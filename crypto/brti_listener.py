@@ -1,58 +1,45 @@
-import asyncio
 import threading
+import time
 from flask import Flask, jsonify
-from playwright.async_api import async_playwright
 from datetime import datetime
-import numpy as np
+
+from brti_feed import FeedPublisher
+from price_source import make_price_source
+from settlement import SettlementTracker
+from shm_store import PriceStore
 
 app = Flask(__name__)
 
 # Shared price state and lock
-latest_price = {'value': None, 'timestamp': None, 'simple_average': []}
+latest_price = {'value': None, 'timestamp': None}
+# simple_average = mean of the last 60 one-second prints, the way Kalshi settles
+settlement = SettlementTracker()
 price_lock = threading.Lock()
 
-# Async polling loop
-async def poll_brti():
-    async with async_playwright() as p:
-        print("🚀 Launching browser...")
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        await page.goto("https://www.cfbenchmarks.com/data/indices/BRTI", timeout=20000)
-        await page.wait_for_selector('div.leading-6 span')
-        print("📡 Connected to BRTI page.")
-
-        last_logged_price = None
-        while True:
-            try:
-                price_text = await page.locator('div.leading-6 span').first.text_content()
-                price = float(price_text.replace('$', '').replace(',', ''))
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-                if price != last_logged_price:
-                    print(f"[{timestamp}] 💰 New BRTI Price: ${price}")
-                    last_logged_price = price
-
-                    with price_lock:
-                        latest_price['simple_average'].append(price)
-                        if len(latest_price['simple_average']) > 60:
-                            latest_price['simple_average'].pop(0)
+# Local consumers read the latest price / tick history from shared memory instead of polling /price
+price_store = PriceStore.create()
+# ... and subscribe to pushed ticks on the feed socket (brti_feed.FeedClient / BRTI_SOURCE=feed)
+publisher = FeedPublisher()
 
-                        latest_price['value'] = price
-                        latest_price['timestamp'] = timestamp
+# Called by the price source (scraper or local engine) on every new price
+def on_price(price):
+    tick_ns = time.time_ns()
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print(f"[{timestamp}] 💰 New BRTI Price: ${price}")
 
-                else:
-                    with price_lock:
-                        latest_price['value'] = price
-                        latest_price['timestamp'] = timestamp
-
-            except Exception as e:
-                print(f"[{datetime.now()}] ⚠️ Error while fetching price:", e)
+    with price_lock:
+        settlement.update(price, tick_ns / 1e9)
 
-            await asyncio.sleep(0.3)
+        latest_price['value'] = price
+        latest_price['timestamp'] = timestamp
+        average = settlement.average()
+        price_store.write_price(price, average, tick_ns / 1e9)
+    publisher.publish(price, average, tick_ns)
 
-# Thread wrapper for async loop
-def start_polling():
-    asyncio.run(poll_brti())
+def on_unchanged(price):
+    with price_lock:
+        latest_price['value'] = price
+        latest_price['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
 # API endpoint to retrieve latest price
 @app.route('/price', methods=['GET'])
@@ -62,14 +49,22 @@ def get_price():
             return jsonify({'status': 'waiting for data'}), 503
         return jsonify({
             'brti': latest_price['value'],
-            'simple_average': np.mean(latest_price['simple_average']),
+            'simple_average': settlement.average(),
+            'settlement': settlement.project().to_dict(),
             'timestamp': latest_price['timestamp']
         })
 
 if __name__ == "__main__":
-    # Start polling thread
-    threading.Thread(target=start_polling, daemon=True).start()
+    # Start polling thread (BRTI_SOURCE=engine computes the index locally instead of scraping)
+    source = make_price_source(poll_s=0.3)
+    if source.name == "feed":
+        raise SystemExit("brti_listener is the feed daemon; set BRTI_SOURCE to scraper or engine")
+    source.start(on_price, on_unchanged)
 
     # Start Flask server
     print("🌐 Starting Flask server on http://localhost:5000 ...")
-    app.run(port=5000)
+    try:
+        app.run(port=5000)
+    finally:
+        publisher.close()
+        price_store.close()
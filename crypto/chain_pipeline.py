@@ -0,0 +1,141 @@
+# chain_pipeline.py
+"""Ingest → build → emit pipeline for the chain servers
+===================================================
+The chain servers used to build every payload on the price source's thread.
+That meant a fresh ThreadPoolExecutor per tick, waiting on every Kalshi REST
+call, so one slow response delayed the next BRTI read. `ChainPipeline` splits
+the work into three stages on the server's asyncio loop, joined by one-slot
+"latest wins" mailboxes:
+
+  * ingest – `submit(price, timestamp)` from the price callback. It only
+             stores the tick and never waits.
+  * build  – one task awaits `build(price, timestamp)` for the newest tick
+             (the per-contract Kalshi calls are awaited concurrently). Ticks
+             that arrive while a build is running replace each other. Only
+             the latest is built, the rest are counted as dropped.
+  * emit   – one task awaits `emit(payload)` (encode + socket.io emit). A
+             payload that is superseded before it goes out is dropped too.
+
+Per-stage timing (`LatencyHistogram`) and dropped counts are in `stats()` and
+are printed every STATS_S.
+"""
+
+from __future__ import annotations
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from aio_server import background
+from latency import LatencyHistogram
+
+STATS_S = 60
+
+
+class LatestSlot:
+    """One-item mailbox: `put` replaces whatever hasn't been taken yet."""
+
+    def __init__(self):
+        self.ready = asyncio.Event()
+        self.item = None
+        self.full = False
+
+    def put(self, item) -> bool:
+        """Store item; True if it overwrote one nobody took."""
+        replaced = self.full
+        self.item, self.full = item, True
+        self.ready.set()
+        return replaced
+
+    async def take(self):
+        while not self.full:
+            self.ready.clear()
+            await self.ready.wait()
+        item, self.item, self.full = self.item, None, False
+        return item
+
+
+class ChainPipeline:
+    def __init__(self, build: Callable[[float, str], Awaitable[Optional[Any]]],
+                 emit: Callable[[Any], Awaitable[None]],
+                 name: str = "chain", stats_s: float = STATS_S):
+        self.build = build
+        self.emit = emit
+        self.name = name
+        self.stats_s = stats_s
+        self.ticks = LatestSlot()
+        self.payloads = LatestSlot()
+
+        self.ingested = self.built = self.emitted = 0
+        self.dropped_ticks = 0        # superseded before a build started
+        self.dropped_payloads = 0     # superseded before they were emitted
+        self.build_errors = 0
+        self.queue_wait = LatencyHistogram("ingest → build")
+        self.build_time = LatencyHistogram("build")
+        self.emit_time = LatencyHistogram("emit")
+        self.end_to_end = LatencyHistogram("ingest → emitted")
+        self.last_stats = time.time()
+
+    def start(self):
+        """Start the build and emit tasks; call from inside the running loop."""
+        background(self._build_loop(), f"{self.name} build")
+        background(self._emit_loop(), f"{self.name} emit")
+        return self
+
+    # ------------- stages -------------
+    def submit(self, price: float, timestamp: str):
+        """Ingest a tick. Cheap and non-blocking, call it straight from the price callback."""
+        self.ingested += 1
+        if self.ticks.put((price, timestamp, time.perf_counter_ns())):
+            self.dropped_ticks += 1
+
+    async def _build_loop(self):
+        while True:
+            price, timestamp, ingest_ns = await self.ticks.take()
+            start = time.perf_counter_ns()
+            self.queue_wait.record((start - ingest_ns) / 1e9)
+            try:
+                payload = await self.build(price, timestamp)
+            except Exception as e:
+                self.build_errors += 1
+                print(f"⛔ {self.name} build failed for {price} @ {timestamp}: {e}")
+                continue
+            self.build_time.record_since(start)
+            if payload is None:
+                continue
+            self.built += 1
+            if self.payloads.put((payload, ingest_ns)):
+                self.dropped_payloads += 1
+
+    async def _emit_loop(self):
+        while True:
+            payload, ingest_ns = await self.payloads.take()
+            start = time.perf_counter_ns()
+            try:
+                await self.emit(payload)
+            except Exception as e:
+                print(f"⛔ {self.name} emit failed: {e}")
+                continue
+            self.emit_time.record_since(start)
+            self.end_to_end.record_since(ingest_ns)
+            self.emitted += 1
+            if time.time() - self.last_stats >= self.stats_s:
+                self._print_stats()
+
+    # ------------- metrics -------------
+    def stats(self) -> dict:
+        return {
+            'ingested': self.ingested,
+            'built': self.built,
+            'emitted': self.emitted,
+            'dropped_ticks': self.dropped_ticks,
+            'dropped_payloads': self.dropped_payloads,
+            'build_errors': self.build_errors,
+            'stages': {h.name: h.summary() for h in (self.queue_wait, self.build_time, self.emit_time, self.end_to_end)},
+        }
+
+    def _print_stats(self):
+        self.last_stats = time.time()
+        print(f"[STATS] {self.name} pipeline: ingested={self.ingested} built={self.built} emitted={self.emitted} "
+              f"dropped ticks={self.dropped_ticks} payloads={self.dropped_payloads} errors={self.build_errors}")
+        for h in (self.queue_wait, self.build_time, self.emit_time, self.end_to_end):
+            print(f"        {h}")
@@ -0,0 +1,308 @@
+# chain_stream.py
+"""Delta-encoded options chain stream
+==================================
+The chain servers used to emit the whole `brti_and_options_update` payload on
+every price change, including each contract's full orderbook and its last 10
+trades. Most of that is the same from one tick to the next. `ChainEncoder`
+turns the payloads into a numbered stream instead:
+
+  * snapshot – {'type': 'snapshot', 'stream', 'seq', 'payload'}: the full
+               payload. It is sent every SNAPSHOT_EVERY ticks, to each client on
+               connect, and whenever a client asks for a resync.
+  * delta    – {'type': 'delta', 'stream', 'seq', 'fields', 'contracts', 'order'}:
+      fields    top-level keys that changed (brti, simple_average, ...)
+      contracts {ticker: {'set': changed fields,
+                          'book': {'bids' / 'asks': [[price, qty], ...]}  (qty 0 = level gone),
+                          'trades': {'new': [...], 'keep': n, 'set': {...}}}}
+                only the contracts that changed, and only the parts that did
+      order     the ticker list, only when contracts were added, removed or reordered
+
+`seq` is per encoder, and every subscription room has its own encoder
+(subscriptions.py), so messages carry the encoder's `stream` id as well.
+
+`ChainReassembler` applies the stream back into the same payload dict the
+old event carried. It only continues the stream it has a snapshot for, so
+messages of a room the client just left can't be mixed in. After a
+subscribe, `subscribed(ack)` pins it to the new room's stream. When it sees
+a gap in `seq` it calls `on_gap` (emit RESYNC_EVENT) and ignores deltas
+until the next snapshot. The JS version is dashboard/src/chainStream.js.
+
+The encoder logs bytes/tick and diff + serialization time every STATS_S.
+"""
+
+from __future__ import annotations
+import copy
+import json
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+STREAM_EVENT = "brti_and_options_stream"
+RESYNC_EVENT = "chain_resync"      # client → server: send me a snapshot
+SNAPSHOT_EVERY = 100               # ticks between broadcast snapshots
+STATS_S = 60
+KEY = 'ticker'
+
+
+def _json_size(obj) -> int:
+    return len(json.dumps(obj, separators=(',', ':')))
+
+
+# ------------- diffs -------------
+def _book_side(levels) -> dict:
+    return {lvl['price']: lvl['quantity'] for lvl in levels}
+
+
+def _diff_book(old, new) -> Optional[dict]:
+    """Changed levels per side, or None if either book isn't a (bids, asks) pair."""
+    if not (isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)) and len(old) == len(new) == 2):
+        return None
+    delta = {}
+    for side, o, n in (('bids', old[0], new[0]), ('asks', old[1], new[1])):
+        o, n = _book_side(o), _book_side(n)
+        changed = [[p, q] for p, q in n.items() if o.get(p) != q]
+        changed += [[p, 0] for p in o if p not in n]
+        if changed:
+            delta[side] = changed
+    return delta
+
+
+def _diff_trades(old, new) -> Optional[dict]:
+    """
+    `get_contract_trades` returns {'trades': newest first, 'cursor': ...}. The
+    delta is the trades that weren't there before plus how many of the old
+    list follow them, or None if the new list isn't shaped like that.
+    """
+    if not (isinstance(old, dict) and isinstance(new, dict)):
+        return None
+    old_list, new_list = old.get('trades') or [], new.get('trades') or []
+    seen = {t.get('trade_id') for t in old_list}
+    n_new = 0
+    while n_new < len(new_list) and new_list[n_new].get('trade_id') not in seen:
+        n_new += 1
+    keep = len(new_list) - n_new
+    if new_list[n_new:] != old_list[:keep]:
+        return None
+    delta = {}
+    if n_new or keep != len(old_list):
+        delta['new'] = new_list[:n_new]
+        delta['keep'] = keep
+    fields = {k: v for k, v in new.items() if k != 'trades' and old.get(k) != v}
+    if fields:
+        delta['set'] = fields
+    return delta
+
+
+def _diff_contract(old: dict, new: dict) -> dict:
+    delta, fields = {}, {}
+    for k, v in new.items():
+        prev = old.get(k)
+        if prev == v:
+            continue
+        if k == 'orderbook':
+            book = _diff_book(prev, v)
+            if book is not None:
+                if book:
+                    delta['book'] = book
+                continue
+        elif k == 'trades':
+            trades = _diff_trades(prev, v)
+            if trades is not None:
+                if trades:
+                    delta['trades'] = trades
+                continue
+        fields[k] = v
+    if fields:
+        delta['set'] = fields
+    return delta
+
+
+# ------------- server side -------------
+class ChainEncoder:
+    """Turns successive full payloads into snapshot / delta messages (see module doc)."""
+
+    def __init__(self, snapshot_every: int = SNAPSHOT_EVERY):
+        self.snapshot_every = snapshot_every
+        self.stream = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.payload: Optional[dict] = None
+        self.contracts: dict = {}       # ticker -> last contract dict sent
+        self.since_snapshot = 0
+        self.lock = threading.Lock()
+
+        # metrics since the last report
+        self.last_stats = time.time()
+        self.deltas = self.snapshots = 0
+        self.delta_bytes = self.snapshot_bytes = 0
+        self.diff_s = self.serialize_s = 0.0
+
+    def encode(self, payload: dict) -> dict:
+        """Message to broadcast for this tick."""
+        start = time.perf_counter()
+        with self.lock:
+            self.seq += 1
+            if self.payload is None or self.since_snapshot + 1 >= self.snapshot_every:
+                msg = self._snapshot_locked(payload)
+            else:
+                msg = self._delta_locked(payload)
+        diffed = time.perf_counter()
+        size = _json_size(msg)
+        self._record(msg['type'], size, diffed - start, time.perf_counter() - diffed)
+        return msg
+
+    def snapshot(self) -> Optional[dict]:
+        """The current state as a snapshot message, for a client that just connected or resynced."""
+        with self.lock:
+            if self.payload is None:
+                return None
+            return {'type': 'snapshot', 'stream': self.stream, 'seq': self.seq, 'payload': self.payload}
+
+    def _snapshot_locked(self, payload: dict) -> dict:
+        self._remember(payload)
+        self.since_snapshot = 0
+        return {'type': 'snapshot', 'stream': self.stream, 'seq': self.seq, 'payload': payload}
+
+    def _delta_locked(self, payload: dict) -> dict:
+        fields = {k: v for k, v in payload.items() if k != 'contracts' and self.payload.get(k) != v}
+        contracts = {}
+        for c in payload.get('contracts', []):
+            prev = self.contracts.get(c[KEY])
+            d = _diff_contract(prev, c) if prev is not None else {'set': c}
+            if d:
+                contracts[c[KEY]] = d
+        msg = {'type': 'delta', 'stream': self.stream, 'seq': self.seq}
+        if fields:
+            msg['fields'] = fields
+        if contracts:
+            msg['contracts'] = contracts
+        order = [c[KEY] for c in payload.get('contracts', [])]
+        if order != [c[KEY] for c in self.payload.get('contracts', [])]:
+            msg['order'] = order
+        self._remember(payload)
+        self.since_snapshot += 1
+        return msg
+
+    def _remember(self, payload: dict):
+        self.payload = payload
+        self.contracts = {c[KEY]: c for c in payload.get('contracts', [])}
+
+    # ------------- metrics -------------
+    def _record(self, kind: str, size: int, diff_s: float, serialize_s: float):
+        if kind == 'snapshot':
+            self.snapshots += 1
+            self.snapshot_bytes += size
+        else:
+            self.deltas += 1
+            self.delta_bytes += size
+        self.diff_s += diff_s
+        self.serialize_s += serialize_s
+        if time.time() - self.last_stats >= STATS_S:
+            print(f"[STATS] chain stream: {self.stats()}")
+            self.last_stats = time.time()
+            self.deltas = self.snapshots = 0
+            self.delta_bytes = self.snapshot_bytes = 0
+            self.diff_s = self.serialize_s = 0.0
+
+    def stats(self) -> dict:
+        ticks = self.deltas + self.snapshots
+        return {
+            'ticks': ticks,
+            'snapshots': self.snapshots,
+            'bytes_per_tick': round((self.delta_bytes + self.snapshot_bytes) / ticks) if ticks else None,
+            'delta_bytes': round(self.delta_bytes / self.deltas) if self.deltas else None,
+            'snapshot_bytes': round(self.snapshot_bytes / self.snapshots) if self.snapshots else None,
+            'diff_ms': round(self.diff_s / ticks * 1000, 3) if ticks else None,
+            'serialize_ms': round(self.serialize_s / ticks * 1000, 3) if ticks else None,
+        }
+
+
+# ------------- client side -------------
+def _apply_book(book, delta: dict):
+    bids, asks = _book_side(book[0]), _book_side(book[1])
+    for side, levels in (('bids', bids), ('asks', asks)):
+        for price, qty in delta.get(side, ()):
+            if qty:
+                levels[price] = qty
+            else:
+                levels.pop(price, None)
+    return ([{'price': p, 'quantity': bids[p]} for p in sorted(bids, reverse=True)],
+            [{'price': p, 'quantity': asks[p]} for p in sorted(asks)])
+
+
+def _apply_trades(trades: dict, delta: dict) -> dict:
+    trades = dict(trades)
+    if 'keep' in delta:
+        trades['trades'] = delta['new'] + (trades.get('trades') or [])[:delta['keep']]
+    trades.update(delta.get('set', {}))
+    return trades
+
+
+class ChainReassembler:
+    """
+    Rebuilds full payloads from the stream. `apply(msg)` returns the current
+    payload after applying msg, or None if there's nothing new to act on
+    (stale message, or waiting for a snapshot after a gap).
+    """
+
+    def __init__(self, on_gap: Optional[Callable[[], None]] = None):
+        self.on_gap = on_gap
+        self.stream: Optional[str] = None     # stream the payload belongs to
+        self.wanted: Optional[str] = None     # stream of the acked subscription, if any
+        self.seq: Optional[int] = None
+        self.payload: Optional[dict] = None
+        self.snapshots = self.deltas = self.gaps = 0
+
+    def reset(self):
+        """Forget the stream, e.g. on disconnect or before subscribing: the next snapshot starts over."""
+        self.stream = self.wanted = None
+        self.seq = None
+        self.payload = None
+
+    def subscribed(self, ack: dict):
+        """SUBSCRIBE_EVENT was acked: only the new room's stream counts from here on."""
+        self.wanted = ack.get('stream')
+        if self.stream != self.wanted:
+            # its snapshot came before the ack and may have been replaced by the old room's
+            self.payload = None
+            if self.on_gap is not None:
+                self.on_gap()
+
+    def apply(self, msg: dict) -> Optional[dict]:
+        stream = msg.get('stream')
+        if self.wanted is not None and stream != self.wanted:
+            return None  # a room we've left
+        if msg['type'] == 'snapshot':
+            if self.payload is not None and stream == self.stream and msg['seq'] <= self.seq:
+                return None  # resync answer overtaken by newer deltas
+            self.payload = copy.deepcopy(msg['payload'])
+            self.stream = stream
+            self.seq = msg['seq']
+            self.snapshots += 1
+            return self.payload
+
+        if self.payload is None or stream != self.stream:
+            return None  # waiting for a snapshot of this stream
+        if msg['seq'] <= self.seq:
+            return None
+        if msg['seq'] != self.seq + 1:
+            self.gaps += 1
+            self.payload = None
+            if self.on_gap is not None:
+                self.on_gap()
+            return None
+
+        self.payload.update(msg.get('fields', {}))
+        contracts = {c[KEY]: c for c in self.payload.get('contracts', [])}
+        for ticker, d in msg.get('contracts', {}).items():
+            c = contracts.setdefault(ticker, {})
+            c.update(d.get('set', {}))
+            if 'book' in d:
+                c['orderbook'] = _apply_book(c['orderbook'], d['book'])
+            if 'trades' in d:
+                c['trades'] = _apply_trades(c['trades'], d['trades'])
+        if 'order' in msg:
+            self.payload['contracts'] = [contracts[t] for t in msg['order']]
+        self.seq = msg['seq']
+        self.deltas += 1
+        return self.payload
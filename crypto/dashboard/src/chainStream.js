@@ -0,0 +1,117 @@
+// Client side of the options chain delta stream (crypto/chain_stream.py).
+// The server sends a full snapshot every so often, then per-tick deltas with
+// sequence numbers. This rebuilds the same payload the old
+// 'brti_and_options_update' event carried. On a sequence gap it asks the
+// server for a fresh snapshot. Messages may arrive JSON or MessagePack (wire.js).
+// Every subscription room numbers its own stream, so messages carry a stream
+// id and only the stream of the last snapshot is continued.
+
+import { decode } from './wire';
+
+export const STREAM_EVENT = 'brti_and_options_stream';
+export const RESYNC_EVENT = 'chain_resync';
+export const SUBSCRIBE_EVENT = 'subscribe';
+
+const toSide = (levels) => new Map(levels.map(l => [l.price, l.quantity]));
+
+function applyBook(book, delta) {
+  const bids = toSide(book[0]);
+  const asks = toSide(book[1]);
+  for (const [side, levels] of [['bids', bids], ['asks', asks]]) {
+    for (const [price, qty] of delta[side] ?? []) {
+      if (qty) levels.set(price, qty);
+      else levels.delete(price);
+    }
+  }
+  const toLevels = (m, dir) => [...m.keys()].sort((a, b) => dir * (a - b))
+    .map(price => ({ price, quantity: m.get(price) }));
+  return [toLevels(bids, -1), toLevels(asks, 1)];
+}
+
+function applyTrades(trades, delta) {
+  const next = { ...trades };
+  if ('keep' in delta) {
+    next.trades = [...delta.new, ...(trades.trades ?? []).slice(0, delta.keep)];
+  }
+  return { ...next, ...(delta.set ?? {}) };
+}
+
+// Calls onUpdate(payload) with the rebuilt payload for every applied message.
+// Changed contracts are new objects, so React state updates see them.
+// `subscription` narrows what the server sends (crypto/subscriptions.py), e.g.
+// { tickers: [], max_hz: 10 } for price only at 10 Hz. Omit it to get everything.
+// Returns the unsubscribe function.
+export function subscribeChain(socket, onUpdate, subscription = null) {
+  let stream = null;  // stream the payload belongs to
+  let wanted = null;  // stream of the acked subscription
+  let seq = null;
+  let payload = null;
+
+  const reset = () => {
+    stream = null;
+    wanted = null;
+    seq = null;
+    payload = null;
+  };
+
+  // every reconnect or subscription starts a new stream, with its own seq. The
+  // server's connect-time snapshot can be delivered before 'connect' fires, so
+  // the reset for a reconnect happens on 'disconnect'.
+  const onConnect = () => {
+    if (subscription) {
+      reset();
+      socket.emit(SUBSCRIBE_EVENT, subscription, (ack) => {
+        // from here on only the new room counts. Its snapshot was sent before
+        // the ack and may have been replaced by one from the old room.
+        wanted = ack.stream;
+        if (stream !== wanted) {
+          payload = null;
+          socket.emit(RESYNC_EVENT);
+        }
+      });
+    }
+  };
+
+  const handler = (raw) => {
+    const msg = decode(raw);
+    if (wanted !== null && msg.stream !== wanted) return;  // a room we've left
+    if (msg.type === 'snapshot') {
+      // overtaken by newer deltas
+      if (payload !== null && msg.stream === stream && msg.seq <= seq) return;
+      payload = msg.payload;
+      stream = msg.stream;
+      seq = msg.seq;
+      onUpdate(payload);
+      return;
+    }
+
+    if (payload === null || msg.stream !== stream || msg.seq <= seq) return;
+    if (msg.seq !== seq + 1) {
+      payload = null;
+      socket.emit(RESYNC_EVENT);
+      return;
+    }
+
+    const contracts = new Map((payload.contracts ?? []).map(c => [c.ticker, c]));
+    for (const [ticker, d] of Object.entries(msg.contracts ?? {})) {
+      const c = { ...(contracts.get(ticker) ?? {}), ...(d.set ?? {}) };
+      if (d.book) c.orderbook = applyBook(c.orderbook, d.book);
+      if (d.trades) c.trades = applyTrades(c.trades, d.trades);
+      contracts.set(ticker, c);
+    }
+    const order = msg.order ?? (payload.contracts ?? []).map(c => c.ticker);
+    payload = { ...payload, ...(msg.fields ?? {}), contracts: order.map(t => contracts.get(t)) };
+    seq = msg.seq;
+    onUpdate(payload);
+  };
+
+  socket.on(STREAM_EVENT, handler);
+  socket.on('connect', onConnect);
+  socket.on('disconnect', reset);
+  if (socket.connected) onConnect();
+  return () => {
+    socket.off(STREAM_EVENT, handler);
+    socket.off('connect', onConnect);
+    socket.off('disconnect', reset);
+  };
+}
@@ -1,12 +1,15 @@
 import React, { useEffect, useState } from 'react';
 import { io } from 'socket.io-client';
+import { subscribeChain } from '../chainStream';
+import { ENCODING } from '../wire';
 import {
   LineChart, Line, XAxis, YAxis, Tooltip,
   ResponsiveContainer, CartesianGrid
 } from 'recharts';
 
 const socket = io('http://localhost:5050', {
-  transports: ['websocket']
+  transports: ['websocket'],
+  query: { encoding: ENCODING }
 });
 
 export default function LivePriceChart() {
@@ -18,7 +21,7 @@ export default function LivePriceChart() {
   useEffect(() => {
     let lastUpdate = 0;
 
-    socket.on('brti_and_options_update', (update) => {
+    const unsubscribe = subscribeChain(socket, (update) => {
       const now = Date.now();
       if (now - lastUpdate > 100) {
         lastUpdate = now;
@@ -66,9 +69,9 @@ export default function LivePriceChart() {
           return updated;
         });
       }
-    });
+    }, { tickers: [], max_hz: 10 });  // price only, no contracts
 
-    return () => socket.off('brti_and_options_update');
+    return unsubscribe;
   }, []);
 
   return (
@@ -1,10 +1,12 @@
 // src/components/MarketViewer.js
 import React, { useEffect, useState } from 'react';
 import { io } from 'socket.io-client';
+import { decode, ENCODING } from '../wire';
 import Plot from 'react-plotly.js';
 
 const socket = io('http://localhost:5051', {
-  transports: ['websocket']
+  transports: ['websocket'],
+  query: { encoding: ENCODING }
 });
 
 export default function MarketViewer() {
@@ -13,7 +15,8 @@ export default function MarketViewer() {
   const [trades, setTrades] = useState([]);
 
   useEffect(() => {
-    socket.on('market_data_update', data => {
+    socket.on('market_data_update', raw => {
+      const data = decode(raw);
       setBids(data.order_book.bids.slice(0, 20));
       setAsks(data.order_book.asks.slice(0, 20));
       setTrades(data.recent_trades.slice(0, 20));
@@ -1,12 +1,15 @@
 import React, { useEffect, useState } from 'react';
 import { io } from 'socket.io-client';
+import { subscribeChain } from '../chainStream';
+import { ENCODING } from '../wire';
 import {
   LineChart, Line, XAxis, YAxis, Tooltip,
   CartesianGrid, ResponsiveContainer, Legend
 } from 'recharts';
 
 const socket = io('http://localhost:5050', {
-  transports: ['websocket']
+  transports: ['websocket'],
+  query: { encoding: ENCODING }
 });
 
 export default function OptionsChainPanel() {
@@ -16,15 +19,13 @@ export default function OptionsChainPanel() {
   const [timestamp, setTimestamp] = useState(null);
   
   useEffect(() => {
-    socket.on('brti_and_options_update', (update) => {
+    return subscribeChain(socket, (update) => {
       if (update.contracts) {
         setContracts(update.contracts);
         setBrti(update.brti);
         setAvg(update.simple_average);
         setTimestamp(update.timestamp); }
-    });
-
-    return () => socket.off('brti_and_options_update');
+    }, { max_hz: 4 });  // the table doesn't need every tick
   }, []);
 
   const formatIV = (iv) => iv === null || isNaN(iv) ? 'nan%' : `${iv.toFixed(2)}%`;
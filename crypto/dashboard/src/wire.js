@@ -0,0 +1,98 @@
+// Decoder for the opt-in binary socket.io encoding (crypto/wire.py).
+// Connect with io(url, { query: { encoding: 'msgpack' } }) and pass every
+// payload through decode(): ArrayBuffers are MessagePack, anything else is
+// already a JSON object (older server, or msgpack not installed there).
+// Arrays packed under ND_EXT (float64 book levels) come back as arrays of
+// rows, the same shape JSON gives.
+
+export const ENCODING = 'msgpack';
+const ND_EXT = 1;
+
+const textDecoder = new TextDecoder();
+
+function unpackNd(view, offset, length) {
+  const ndim = view.getUint8(offset);
+  const shape = [];
+  for (let i = 0; i < ndim; i++) shape.push(view.getUint32(offset + 1 + 4 * i, true));
+  const start = offset + 1 + 4 * ndim;
+  const n = (length - 1 - 4 * ndim) / 8;
+  const flat = new Array(n);
+  for (let i = 0; i < n; i++) flat[i] = view.getFloat64(start + 8 * i, true);
+  if (ndim !== 2) return flat;
+  const rows = [];
+  for (let r = 0; r < shape[0]; r++) rows.push(flat.slice(r * shape[1], (r + 1) * shape[1]));
+  return rows;
+}
+
+function unpack(buf) {
+  const view = new DataView(buf);
+  const bytes = new Uint8Array(buf);
+  let pos = 0;
+
+  const str = (n) => { const s = textDecoder.decode(bytes.subarray(pos, pos + n)); pos += n; return s; };
+  const bin = (n) => { const b = buf.slice(pos, pos + n); pos += n; return b; };
+  const arr = (n) => { const a = new Array(n); for (let i = 0; i < n; i++) a[i] = read(); return a; };
+  const map = (n) => { const m = {}; for (let i = 0; i < n; i++) { const k = read(); m[k] = read(); } return m; };
+  const ext = (n) => {
+    const type = view.getInt8(pos);
+    pos += 1;
+    const value = type === ND_EXT ? unpackNd(view, pos, n) : { type, data: buf.slice(pos, pos + n) };
+    pos += n;
+    return value;
+  };
+  const u8 = () => view.getUint8(pos++);
+  const u16 = () => { const v = view.getUint16(pos); pos += 2; return v; };
+  const u32 = () => { const v = view.getUint32(pos); pos += 4; return v; };
+
+  function read() {
+    const b = u8();
+    if (b <= 0x7f) return b;
+    if (b >= 0xe0) return b - 0x100;
+    if (b >= 0x80 && b <= 0x8f) return map(b & 0x0f);
+    if (b >= 0x90 && b <= 0x9f) return arr(b & 0x0f);
+    if (b >= 0xa0 && b <= 0xbf) return str(b & 0x1f);
+    let v;
+    switch (b) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: return bin(u8());
+      case 0xc5: return bin(u16());
+      case 0xc6: return bin(u32());
+      case 0xc7: return ext(u8());
+      case 0xc8: return ext(u16());
+      case 0xc9: return ext(u32());
+      case 0xca: v = view.getFloat32(pos); pos += 4; return v;
+      case 0xcb: v = view.getFloat64(pos); pos += 8; return v;
+      case 0xcc: return u8();
+      case 0xcd: return u16();
+      case 0xce: return u32();
+      case 0xcf: v = Number(view.getBigUint64(pos)); pos += 8; return v;
+      case 0xd0: v = view.getInt8(pos); pos += 1; return v;
+      case 0xd1: v = view.getInt16(pos); pos += 2; return v;
+      case 0xd2: v = view.getInt32(pos); pos += 4; return v;
+      case 0xd3: v = Number(view.getBigInt64(pos)); pos += 8; return v;
+      case 0xd4: return ext(1);
+      case 0xd5: return ext(2);
+      case 0xd6: return ext(4);
+      case 0xd7: return ext(8);
+      case 0xd8: return ext(16);
+      case 0xd9: return str(u8());
+      case 0xda: return str(u16());
+      case 0xdb: return str(u32());
+      case 0xdc: return arr(u16());
+      case 0xdd: return arr(u32());
+      case 0xde: return map(u16());
+      case 0xdf: return map(u32());
+      default: throw new Error(`msgpack: unsupported type byte 0x${b.toString(16)}`);
+    }
+  }
+
+  return read();
+}
+
+export function decode(data) {
+  if (data instanceof ArrayBuffer) return unpack(data);
+  if (ArrayBuffer.isView(data)) return unpack(data.buffer.slice(data.byteOffset, data.byteOffset + data.byteLength));
+  return data;
+}
@@ -1,39 +1,237 @@
-from websockets.utils import *
+# collect_data.py
+"""BRTI + Kalshi order book collector
+==================================
+At most once a second, when BRTI moves, snapshots the top DEPTH_LEVEL levels
+of every tracked contract's book next to the BRTI price.
+
+One process follows the series for as long as it runs:
+
+  * the event is discovered (`current_event(SERIES)`, the open one that
+    settles first) instead of hard-coded, and its market list is cached.
+  * the tracked contracts are the strike nearest live BRTI plus
+    STRIKES_EACH_SIDE either side, taken from the event's own strike list.
+    They are re-picked every tick, so strikes come and go as spot moves.
+  * once the event closes, collection pauses and the collector looks for
+    the next event every ROLL_RETRY_S, then carries on in its directory.
+
+Collection used to open a new thread pool per tick, make two REST calls per
+contract (market + orderbook) on fresh connections, and reopen the CSV with a
+new DataFrame every second. It now runs on one asyncio loop:
+
+  * Kalshi REST goes through one pooled `KalshiClient` session. Strike and
+    expiration come from the event's market list, fetched once per event and
+    cached, so a tick is one orderbook call per contract, all in flight at once.
+  * ticks go through a `ChainPipeline`: a tick that arrives while the
+    previous one is still collecting replaces the waiting one instead of
+    queueing behind it. Per-tick collection latency is its `build` stage.
+  * rows are buffered by a `ChunkWriter` and written as tick store chunks
+    (tick_store.py: a BRTI series plus per-contract level arrays, zstd
+    Parquet, data/<event>/<start>-<n>.*) every CHUNK_ROWS rows or CHUNK_S
+    seconds, off the loop. Without pyarrow it falls back to gzipped CSV.
+    A roll flushes the old event's rows before switching directory.
+
+Rows/sec, chunks and bytes written and the pipeline's per-stage latency are
+printed every STATS_S. `tick_store.load("data/<event>", "long" | "wide")`
+reads an event back.
+"""
+
+import asyncio
+import bisect
+import os
+import time
 from datetime import datetime, timezone
+
 import pandas as pd
-import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from playwright.async_api import async_playwright
-import asyncio
+
+from utils import dataRow, parse_orderbook
+from aio_server import background
+from chain_pipeline import ChainPipeline
+from kalshi_client import KalshiClient
+from price_source import make_price_source
+
+try:
+    import tick_store
+    FORMAT = "ticks"
+except ImportError:
+    print("⚠️ pyarrow not installed, writing gzipped CSV chunks instead of the tick store")
+    FORMAT = "csv.gz"
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SERIES = "KXBTCD"
+STRIKES_EACH_SIDE = 3   # tracked strikes below and above the one nearest BRTI
+ROLL_RETRY_S = 5        # after the event closes, how often to look for the next one
+DEPTH_LEVEL = 5
+CHUNK_ROWS = 5000     # ~10 minutes of 8 rows/s
+CHUNK_S = 300
+STATS_S = 60
+
+COLUMNS = (['timestamp', 'product', 'price', 'strike', 'expiration_time']
+           + [f'{side}_{i}_{field}' for side in ('bid', 'ask') for i in range(1, DEPTH_LEVEL + 1)
+              for field in ('price', 'quantity')])
+
+
+class ChunkWriter:
+    """
+    Buffers rows and writes them to `directory` as one compressed file per
+    `chunk_rows` rows or `chunk_s` seconds, whichever comes first. Writes run
+    in a thread. `add` only appends, so collection never waits on the disk.
+    The write counters are only touched on the loop, when a write finishes.
+    """
+
+    def __init__(self, directory, columns=COLUMNS, chunk_rows=CHUNK_ROWS, chunk_s=CHUNK_S, fmt=FORMAT):
+        self.directory = directory
+        self.columns = columns
+        self.chunk_rows = chunk_rows
+        self.chunk_s = chunk_s
+        self.fmt = fmt
+        self.rows = []
+        self.first_row_at = None
+        self.run = int(time.time())
+        self.chunks = 0
+        self.writes = set()
+
+        # metrics since the last report
+        self.last_stats = time.time()
+        self.rows_added = self.rows_written = self.bytes_written = 0
+        self.write_s = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        """Start the time trigger; call from inside the running loop."""
+        background(self._flush_loop(), "chunk writer")
+        return self
+
+    async def add(self, rows):
+        if not self.rows:
+            self.first_row_at = time.monotonic()
+        self.rows.extend(rows)
+        self.rows_added += len(rows)
+        if len(self.rows) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """Hand the buffered rows to a write task."""
+        if not self.rows:
+            return
+        rows, self.rows = self.rows, []
+        name = f"{self.run}-{self.chunks:05d}"
+        self.chunks += 1
+        task = background(asyncio.to_thread(self._write, rows, self.directory, name), "chunk write")
+        self.writes.add(task)
+        task.add_done_callback(self._written)
+
+    def roll(self, directory):
+        """Flush what's buffered to the current directory and continue in `directory`."""
+        self.flush()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    async def close(self):
+        """Write what's buffered and wait for every write in flight."""
+        self.flush()
+        if self.writes:
+            await asyncio.wait(self.writes)
+
+    def _written(self, task):
+        self.writes.discard(task)
+        if task.cancelled() or task.exception() is not None:
+            return  # background() reports it
+        rows, written, seconds = task.result()
+        self.rows_written += rows
+        self.bytes_written += written
+        self.write_s += seconds
+
+    def _write(self, rows, directory, name):
+        """Runs in a worker thread; returns (rows, bytes, seconds) for the loop to count."""
+        start = time.perf_counter()
+        df = pd.DataFrame(rows, columns=self.columns)
+        if self.fmt == "ticks":
+            written = tick_store.write_chunk(df, directory, name)
+        else:
+            path = os.path.join(directory, f"{name}.csv.gz")
+            df.to_csv(path, index=False, compression="gzip")
+            written = os.path.getsize(path)
+        print(f"[CHUNK] Wrote {len(rows)} rows to {os.path.join(directory, name)}.*")
+        return len(rows), written, time.perf_counter() - start
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(1)
+            if self.rows and time.monotonic() - self.first_row_at >= self.chunk_s:
+                self.flush()
+            if time.time() - self.last_stats >= STATS_S:
+                self._print_stats()
+
+    def _print_stats(self):
+        elapsed = time.time() - self.last_stats
+        print(f"[STATS] collector: {self.rows_added / elapsed:.1f} rows/s, buffered={len(self.rows)}, "
+              f"wrote {self.rows_written} rows / {self.bytes_written / 1024:.0f} KiB "
+              f"in {self.write_s * 1000:.0f} ms ({self.chunks} chunks since start)")
+        self.last_stats = time.time()
+        self.rows_added = self.rows_written = self.bytes_written = 0
+        self.write_s = 0.0
+
+
+def _utc(iso):
+    return datetime.fromisoformat(iso.replace('Z', '+00:00'))
 
 
 class dataCollector:
-    def __init__(self):
-        middle_contract = 'KXBTCD-25MAY1417-T103499.99'
-        event_name = '-'.join(middle_contract.split('-')[:2])
-        middle_strike = float(middle_contract.split('-')[2][1:])
+    def __init__(self, series=SERIES, each_side=STRIKES_EACH_SIDE, kalshi=None):
+        self.series = series
+        self.each_side = each_side
+        self.depth_level = DEPTH_LEVEL
+        self.kalshi = kalshi or KalshiClient()
 
-        num_each_side = 3
+        # current event, loaded once per event by roll()
+        self.event_name = None
+        self.close_time = None     # when the event stops trading
+        self.metadata = {}         # ticker -> (strike, expiration_time)
+        self.strikes = []          # (floor strike, ticker), ascending
         self.contracts_to_track = []
-        for i in range(-num_each_side, num_each_side + 1):
-            strike = middle_strike + i * 500
-            contract = f'{event_name}-T{strike:.2f}'
-            self.contracts_to_track.append(contract)
-
-        self.depth_level = 5
-        print(f"[INIT] Tracking {len(self.contracts_to_track)} contracts:")
-        for c in self.contracts_to_track:
-            print(f" - {c}")
-        print(f"[INIT] Order book depth: {self.depth_level}")
-
-    def collect_one_contract(self, ticker, timestamp, depth_level):
-        try:
-            print(f"[CONTRACT] Collecting {ticker}")
-            data = get_market_data(ticker)
-            strike = data['strike']
-            expiration_time = datetime.fromisoformat(data['expiration_time'].replace('Z', '+00:00'))
+        self.next_roll_check = 0.0
+        print(f"[INIT] Series {series}: strike nearest BRTI ±{each_side}, order book depth {self.depth_level}")
+
+    async def roll(self):
+        """Move to the open event that settles first. False if it is still the current one."""
+        self.next_roll_check = time.time() + ROLL_RETRY_S
+        event = await self.kalshi.current_event(self.series)
+        if event == self.event_name:
+            return False
+        await self.load_metadata(event)
+        print(f"[ROLL] Collecting {event} ({len(self.strikes)} strikes, closes {self.close_time})")
+        return True
 
-            bids, asks = get_orderbook(ticker)
+    async def load_metadata(self, event):
+        markets = await self.kalshi.event_markets(event)
+        self.metadata, self.strikes = {}, []
+        for market in markets:
+            expiration_time = _utc(market['expected_expiration_time'])
+            strike = int(round(market['floor_strike'], 0)) if market.get('floor_strike') is not None else None
+            self.metadata[market['ticker']] = (strike, expiration_time)
+            if strike is not None:
+                self.strikes.append((market['floor_strike'], market['ticker']))
+        self.strikes.sort()
+        self.close_time = min(_utc(market['close_time']) for market in markets)
+        self.event_name = event
+        self.contracts_to_track = []
+
+    def update_window(self, brti_price):
+        """Track the strike nearest `brti_price` and each_side strikes on either side of it."""
+        i = bisect.bisect_left(self.strikes, (brti_price,))
+        if i > 0 and (i == len(self.strikes) or brti_price - self.strikes[i - 1][0] < self.strikes[i][0] - brti_price):
+            i -= 1
+        window = [ticker for _, ticker in self.strikes[max(i - self.each_side, 0):i + self.each_side + 1]]
+        if window != self.contracts_to_track:
+            added = [t for t in window if t not in self.contracts_to_track]
+            removed = [t for t in self.contracts_to_track if t not in window]
+            print(f"[WINDOW] BRTI {brti_price}: +{added} -{removed}")
+            self.contracts_to_track = window
+
+    async def collect_one_contract(self, ticker, timestamp, depth_level):
+        try:
+            strike, expiration_time = self.metadata[ticker]
+            bids, asks = parse_orderbook(await self.kalshi.orderbook(ticker) or {})
             top_bids = sorted(bids, key=lambda x: -x["price"])[:depth_level]
             top_asks = sorted(asks, key=lambda x: x["price"])[:depth_level]
 
@@ -47,65 +245,68 @@ class dataCollector:
             )
 
             return ticker_row.make_data_row()
-        
+
         except Exception as e:
             print(f"[ERROR] Failed to collect data for {ticker}: {e}")
             return None
 
-    def parallel_collect_data(self, brti_price, timestamp):
-        data_rows = []
+    async def collect_data(self, brti_price, timestamp):
+        """(event, rows) for this tick, or None while waiting for the next event."""
+        if self.close_time is None or datetime.now(timezone.utc) >= self.close_time:
+            if time.time() < self.next_roll_check or not await self.roll():
+                return None
+        self.update_window(brti_price)
+
         brti_row = dataRow(timestamp, "BRTI", price=brti_price)
-        data_rows.append(brti_row.make_data_row())
-
-        with ThreadPoolExecutor(max_workers=len(self.contracts_to_track)) as executor:
-            futures = [
-                executor.submit(self.collect_one_contract, ticker, timestamp, self.depth_level)
-                for ticker in self.contracts_to_track
-            ]
-
-            for future in as_completed(futures):
-                result = future.result()
-                if result:
-                    data_rows.append(result)
-        
-        return data_rows
-
-def append_rows_to_csv(rows, filename='data/data_log.csv'):
-    df = pd.DataFrame(rows)
-    file_exists = os.path.exists(filename)
-    df.to_csv(filename, mode='a', index=False, header=not file_exists)
-    print(f"[CSV] Wrote {len(df)} rows to {filename}")
+        results = await asyncio.gather(*(
+            self.collect_one_contract(ticker, timestamp, self.depth_level)
+            for ticker in self.contracts_to_track
+        ))
+        return self.event_name, [brti_row.make_data_row()] + [row for row in results if row]
+
 
 async def poll_brti_and_collect():
     collector = dataCollector()
-    print("🌀 Starting Playwright polling loop...")
-    async with async_playwright() as p:
-        print("🚀 Launching browser...")
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        await page.goto("https://www.cfbenchmarks.com/data/indices/BRTI", timeout=20000)
-        await page.wait_for_selector('div.leading-6 span')
-        print("📡 Connected to BRTI page.")
-
-        last_logged_time = None
-        last_logged_price = None
-        while True:
-            try:
-                price_text = await page.locator('div.leading-6 span').first.text_content()
-                price = float(price_text.replace('$', '').replace(',', ''))
-                timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    writer = None
+
+    async def store(batch):
+        # one directory per event; the first batch of a new event rolls the writer
+        nonlocal writer
+        event, rows = batch
+        directory = os.path.join(DATA_DIR, event)
+        if writer is None:
+            writer = ChunkWriter(directory).start()
+        elif writer.directory != directory:
+            writer.roll(directory)
+        await writer.add(rows)
+
+    pipeline = ChainPipeline(build=collector.collect_data, emit=store, name="collector",
+                             stats_s=STATS_S).start()
+    last_logged_time = None
+    last_logged_price = None
 
-                if timestamp != last_logged_time and price != last_logged_price:
-                    last_logged_time = timestamp
-                    last_logged_price = price
-                    print(f"[BRTI] New price: {price} at {timestamp}")
-                    rows = collector.parallel_collect_data(price, timestamp)
-                    append_rows_to_csv(rows)
+    # At most one snapshot per second, and only when the price moved since the last one.
+    # Also called on unchanged polls, so a move skipped within a second is picked up next second.
+    def on_price(price):
+        nonlocal last_logged_time, last_logged_price
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
 
-            except Exception as e:
-                print(f"[{datetime.now()}] ⚠️ Error while fetching price:", e)
+        if timestamp != last_logged_time and price != last_logged_price:
+            last_logged_time = timestamp
+            last_logged_price = price
+            print(f"[BRTI] New price: {price} at {timestamp}")
+            pipeline.submit(price, timestamp)
 
-            await asyncio.sleep(0.1)
+    # BRTI_SOURCE: scraper (default), engine (local index) or feed (ticks pushed by brti_listener)
+    try:
+        await make_price_source(poll_s=0.1).stream(on_price, on_unchanged=on_price)
+    finally:
+        if writer is not None:
+            await writer.close()
+        await collector.kalshi.close()
 
 if __name__ == "__main__":
-    asyncio.run(poll_brti_and_collect())
+    try:
+        asyncio.run(poll_brti_and_collect())
+    except KeyboardInterrupt:
+        print("[EXIT] Stopped, buffered rows written.")
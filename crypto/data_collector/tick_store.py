@@ -0,0 +1,211 @@
+# tick_store.py
+"""Long-format tick store for BRTI + Kalshi book snapshots
+=======================================================
+`dataRow.make_data_row` gives one wide row per contract (`bid_{i}_price`,
+`bid_{i}_quantity`, ...) with BRTI rows interleaved, so most cells in the
+CSVs are empty and every float is parsed from text. The store keeps the same
+information in two Parquet tables per chunk, zstd-compressed:
+
+  * <name>.brti.parquet – ts, price (float64): the BRTI series.
+  * <name>.book.parquet – one row per contract snapshot:
+        ts, ticker (dictionary-encoded), strike (int32), expiration_time,
+        bid_price / ask_price (list<int8>, cents), bid_size / ask_size (list<int32>)
+    levels best first, only the levels the book had.
+
+Chunks of an event live together in one directory (the collector writes
+data/<event>/<start>-<n>.*). `load(directory, view)` reads them back:
+
+  * "long"  – ts, ticker, side, level, price, size: one row per level.
+  * "wide"  – the old row layout for contracts (bid_1_price ... ask_N_quantity)
+              with the BRTI price at that tick as a `brti` column.
+  * "raw"   – the book table as stored, level arrays and all.
+
+`load_brti(directory)` gives the BRTI series alone.
+
+`convert_csv` turns the collector's old CSVs into the same layout. A few
+percent of their rows have a level under a later column with the ones
+before it empty (batches appended under a header with a different column
+set). Those levels are kept in order, so they move up to the first free level.
+
+    python tick_store.py convert data/*.csv    # CSV -> data/<name>/converted.*
+    python tick_store.py bench data/KXBTCD-25MAY1400.csv
+"""
+
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+COMPRESSION = "zstd"
+SIDES = ("bid", "ask")
+BRTI = "BRTI"
+
+
+# ------------- write -------------
+def _levels(df, side, field, depth):
+    """(offsets, values) of a list column from the wide `{side}_{i}_{field}` columns."""
+    columns = [f"{side}_{i}_{field}" for i in range(1, depth + 1)]
+    matrix = df.reindex(columns=columns).to_numpy(dtype=float)
+    present = ~np.isnan(matrix)
+    offsets = np.zeros(len(df) + 1, dtype=np.int32)
+    np.cumsum(present.sum(axis=1), out=offsets[1:])
+    return offsets, matrix[present]   # row-major, so levels keep their order
+
+
+def from_wide(df):
+    """(brti, book) tables from wide rows: a DataFrame of make_data_row dicts or a collector CSV."""
+    depth = max((int(c.split("_")[1]) for c in df.columns if c.startswith(("bid_", "ask_"))), default=0)
+    ts = pd.to_datetime(df["timestamp"], utc=True)
+    is_brti = (df["product"] == BRTI).to_numpy()
+
+    brti = pa.table({
+        "ts": pa.array(ts[is_brti], pa.timestamp("ms", tz="UTC")),
+        "price": pa.array(df.loc[is_brti, "price"], pa.float64()),
+    })
+
+    contracts = df.loc[~is_brti]
+    columns = {
+        "ts": pa.array(ts[~is_brti], pa.timestamp("ms", tz="UTC")),
+        "ticker": pa.array(pd.Categorical(contracts["product"])),
+        "strike": pa.array(contracts["strike"].round().astype("Int32"), pa.int32()),
+        "expiration_time": pa.array(pd.to_datetime(contracts["expiration_time"], utc=True),
+                                    pa.timestamp("us", tz="UTC")),
+    }
+    for side in SIDES:
+        offsets, prices = _levels(contracts, side, "price", depth)
+        _, sizes = _levels(contracts, side, "quantity", depth)
+        columns[f"{side}_price"] = pa.ListArray.from_arrays(offsets, pa.array(np.rint(prices).astype(np.int8)))
+        columns[f"{side}_size"] = pa.ListArray.from_arrays(offsets, pa.array(np.rint(sizes).astype(np.int32)))
+    return brti, pa.table(columns)
+
+
+def write_chunk(df, directory, name):
+    """Write wide rows as <name>.brti.parquet and <name>.book.parquet in `directory`; total bytes."""
+    os.makedirs(directory, exist_ok=True)
+    written = 0
+    for kind, table in zip(("brti", "book"), from_wide(df)):
+        path = os.path.join(directory, f"{name}.{kind}.parquet")
+        pq.write_table(table, path, compression=COMPRESSION)
+        written += os.path.getsize(path)
+    return written
+
+
+def convert_csv(csv_path, directory=None):
+    """Convert a collector CSV; by default into data/<csv name>/converted.*. Returns the directory."""
+    directory = directory or os.path.splitext(csv_path)[0]
+    write_chunk(pd.read_csv(csv_path), directory, "converted")
+    return directory
+
+
+# ------------- read -------------
+def _read(directory, kind, filter=None):
+    paths = sorted(glob.glob(os.path.join(directory, f"*.{kind}.parquet")))
+    if not paths:
+        raise FileNotFoundError(f"no {kind} chunks in {directory}")
+    table = ds.dataset(paths, format="parquet").to_table(filter=filter)
+    return table.unify_dictionaries().combine_chunks()
+
+
+def load_brti(directory):
+    return _read(directory, "brti").to_pandas().sort_values("ts", kind="stable", ignore_index=True)
+
+
+def load(directory, view="long", tickers=None):
+    """Book snapshots of every chunk in `directory` as a "long", "wide" or "raw" DataFrame."""
+    book = _read(directory, "book", ds.field("ticker").isin(tickers) if tickers else None)
+    if view == "raw":
+        return book.to_pandas()
+    if view == "long":
+        return _long(book)
+    if view == "wide":
+        return _wide(book, load_brti(directory))
+    raise ValueError(f"unknown view {view!r}, expected 'long', 'wide' or 'raw'")
+
+
+def _flat(book, side):
+    """(row index, level, price, size) of every level on one side."""
+    prices = book[f"{side}_price"].combine_chunks()
+    sizes = book[f"{side}_size"].combine_chunks()
+    offsets = prices.offsets.to_numpy()
+    offsets = offsets - offsets[0]
+    lengths = np.diff(offsets)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    level = np.arange(len(rows)) - offsets[rows] + 1
+    return rows, level, prices.flatten().to_numpy(), sizes.flatten().to_numpy()
+
+
+def _long(book):
+    flat = [_flat(book, side) for side in SIDES]
+    rows, level, price, size = (np.concatenate(parts) for parts in zip(*flat))
+    side = np.concatenate([np.full(len(f[0]), i, dtype=np.int8) for i, f in enumerate(flat)])
+    order = np.lexsort((level, side, rows))   # by snapshot, bids before asks, best level first
+    rows = rows[order]
+
+    def take(column):
+        return book[column].to_pandas().take(rows).reset_index(drop=True)
+
+    return pd.DataFrame({
+        "ts": take("ts"),
+        "ticker": take("ticker"),
+        "side": pd.Categorical.from_codes(side[order], SIDES),
+        "level": level[order].astype(np.int8),
+        "price": price[order],
+        "size": size[order],
+    })
+
+
+def _wide(book, brti):
+    n = book.num_rows
+    wide = pd.DataFrame({
+        "ts": book["ts"].to_pandas(),
+        "ticker": book["ticker"].to_pandas(),
+        "strike": book["strike"].to_pandas(),
+        "expiration_time": book["expiration_time"].to_pandas(),
+    })
+    for side in SIDES:
+        rows, level, prices, sizes = _flat(book, side)
+        for i in range(1, level.max(initial=0) + 1):
+            at = level == i
+            for field, values in (("price", prices), ("quantity", sizes)):
+                column = np.full(n, np.nan)
+                column[rows[at]] = values[at]
+                wide[f"{side}_{i}_{field}"] = column
+    order = np.argsort(wide["ts"].to_numpy(), kind="stable")
+    wide = wide.iloc[order].reset_index(drop=True)
+    return pd.merge_asof(wide, brti.rename(columns={"price": "brti"}), on="ts")
+
+
+# ------------- cli -------------
+def _bench(csv_path, out_dir):
+    start = time.perf_counter()
+    df = pd.read_csv(csv_path)
+    csv_s = time.perf_counter() - start
+    write_chunk(df, out_dir, "bench")
+    size = sum(os.path.getsize(p) for p in glob.glob(os.path.join(out_dir, "bench.*.parquet")))
+    print(f"{csv_path}: {len(df)} rows, {df.isna().to_numpy().mean():.0%} empty cells")
+    print(f"  csv          {os.path.getsize(csv_path) / 1024:8.0f} KiB  read_csv {csv_s * 1000:7.1f} ms")
+    print(f"  tick store   {size / 1024:8.0f} KiB")
+    for view in ("raw", "long", "wide"):
+        start = time.perf_counter()
+        out = load(out_dir, view)
+        print(f"  load {view:<5}                   {(time.perf_counter() - start) * 1000:7.1f} ms  ({len(out)} rows)")
+
+
+if __name__ == "__main__":
+    command, paths = sys.argv[1], sys.argv[2:]
+    if command == "convert":
+        for path in paths:
+            print(f"[CONVERT] {path} -> {convert_csv(path)}")
+    elif command == "bench":
+        import tempfile
+        for path in paths:
+            with tempfile.TemporaryDirectory() as tmp:
+                _bench(path, tmp)
+    else:
+        sys.exit("usage: python tick_store.py convert|bench <csv> ...")
@@ -69,29 +69,30 @@ def get_orderbook(ticker, cents=True):
         headers = {"accept": "application/json"}
         response = requests.get(url, headers=headers)
         order_book = json.loads(response.text)['orderbook']
-
-        if cents:
-            divisor = 1
-        else:
-            divisor = 100
-        
-        asks = []
-        bids = []
-
-        # print(order_book)
-
-        if order_book['yes']:
-            for price, size in order_book['yes']:
-                bids.append({'price': price/divisor, 'quantity': size})
-        if order_book['no']:
-            for price, size in order_book['no']:
-                asks.append({'price': (100-price)/divisor, 'quantity': size})
-        
-        return bids, asks   
+        return parse_orderbook(order_book, cents)
     
     except Exception as e:
         print("❌ Error fetching orderbook:", e)
         return None, None
+
+def parse_orderbook(order_book, cents=True):
+    # REST orderbook ({'yes': [[price, size], ...], 'no': [...]}) -> bids, asks
+    if cents:
+        divisor = 1
+    else:
+        divisor = 100
+    
+    asks = []
+    bids = []
+
+    if order_book.get('yes'):
+        for price, size in order_book['yes']:
+            bids.append({'price': price/divisor, 'quantity': size})
+    if order_book.get('no'):
+        for price, size in order_book['no']:
+            asks.append({'price': (100-price)/divisor, 'quantity': size})
+    
+    return bids, asks
     
 
 def calculate_tte(expiration_time):
@@ -9,11 +9,18 @@ from scipy.stats import norm
 from scipy.optimize import brentq
 import numpy as np
 
+from brti_feed import latest_price
+
 session = requests.Session()
 
 USE_YEARS = True  # Set to True if you want to use years for TTE, False for hours
 
 def get_brti_price():
+    # brti_listener's shared memory first, /price only if the feed daemon isn't local
+    price, average, timestamp = latest_price()
+    if price is not None:
+        return price, average, timestamp
+
     try:
         response = session.get("http://localhost:5000/price", timeout=0.2)
         if response.status_code == 200:
@@ -0,0 +1,293 @@
+# kalshi_book.py
+"""Array-backed order book for Kalshi binary contracts
+======================================================
+Kalshi prices are whole cents in 1–99, so each side of a market fits in a
+fixed length-100 int array indexed by price (index 0 is unused). Everything is
+kept in YES terms, the same way `get_orderbook` reports it:
+
+  * `bids[p]` – resting YES size at p cents
+  * `asks[p]` – resting NO size at (100 - p) cents, i.e. the YES ask at p
+
+A delta is a single array write plus an update of the best / "first level with
+size ≥ threshold" pointers. The pointers only need a rescan when the level they
+point at shrinks below its threshold, and that rescan is bounded by 99 cents.
+Empty sides follow the existing convention: bid 0, ask 100.
+
+`EventBooks` keeps every market of an event in two (n_markets, 100) arrays so
+the whole event can be handed to NumPy (or shared memory) without copying.
+`LargeOrderDetector` turns the threshold pointers into appear / move /
+disappear events so quoting only reacts when a large resting order changes.
+Run scripts with crypto/ on PYTHONPATH (same as gui/) to import it.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+N_LEVELS = 100        # prices 1..99, index 0 unused
+NO_BID = 0            # best bid when the YES side is empty
+NO_ASK = 100          # best ask when the NO side is empty
+SIZE_DTYPE = np.int64
+
+
+class KalshiBook:
+    __slots__ = ("bids", "asks", "best_bid", "best_ask", "thresholds", "mm_bids", "mm_asks")
+
+    def __init__(self, thresholds: Iterable[int] = (), bids: Optional[np.ndarray] = None,
+                 asks: Optional[np.ndarray] = None):
+        # bids / asks may be views into a larger array (see EventBooks)
+        self.bids = bids if bids is not None else np.zeros(N_LEVELS, dtype=SIZE_DTYPE)
+        self.asks = asks if asks is not None else np.zeros(N_LEVELS, dtype=SIZE_DTYPE)
+        self.thresholds = tuple(sorted(set(int(t) for t in thresholds)))
+        self.best_bid = NO_BID
+        self.best_ask = NO_ASK
+        self.mm_bids: Dict[int, int] = {t: NO_BID for t in self.thresholds}
+        self.mm_asks: Dict[int, int] = {t: NO_ASK for t in self.thresholds}
+        self._rescan()
+
+    # ------------- construction -------------
+    @classmethod
+    def from_rest(cls, order_book: dict, thresholds: Iterable[int] = ()) -> "KalshiBook":
+        """Build from the `orderbook` field of GET /markets/{ticker}/orderbook."""
+        book = cls(thresholds)
+        book.load(order_book.get('yes'), order_book.get('no'))
+        return book
+
+    def load(self, yes_levels, no_levels):
+        """Replace the whole book with raw [price, size] lists (snapshot / REST)."""
+        self.bids[:] = 0
+        self.asks[:] = 0
+        for price, size in (yes_levels or []):
+            self.bids[price] = size
+        for price, size in (no_levels or []):
+            self.asks[100 - price] = size
+        self._rescan()
+
+    def apply_snapshot(self, msg: dict):
+        """Apply an `orderbook_snapshot` websocket message."""
+        self.load(msg.get('yes'), msg.get('no'))
+
+    def add_threshold(self, threshold: int):
+        threshold = int(threshold)
+        if threshold in self.mm_bids:
+            return
+        self.thresholds = tuple(sorted(self.thresholds + (threshold,)))
+        self.mm_bids[threshold] = self._scan_bid(N_LEVELS, threshold)
+        self.mm_asks[threshold] = self._scan_ask(0, threshold)
+
+    # ------------- updates -------------
+    def apply_delta(self, side: str, price: int, delta: int) -> int:
+        """
+        Apply an `orderbook_delta` (side is 'yes' or 'no', price in that side's
+        own cents, as Kalshi sends it). Returns the new size at the level.
+        """
+        if side == 'yes':
+            return self.set_bid(price, int(self.bids[price]) + delta)
+        return self.set_ask(100 - price, int(self.asks[100 - price]) + delta)
+
+    def set_bid(self, price: int, qty: int) -> int:
+        qty = max(qty, 0)
+        self.bids[price] = qty
+
+        if qty > 0 and price > self.best_bid:
+            self.best_bid = price
+        elif qty == 0 and price == self.best_bid:
+            self.best_bid = self._scan_bid(price, 1)
+
+        for t in self.thresholds:
+            current = self.mm_bids[t]
+            if qty >= t and price > current:
+                self.mm_bids[t] = price
+            elif qty < t and price == current:
+                self.mm_bids[t] = self._scan_bid(price, t)
+        return qty
+
+    def set_ask(self, price: int, qty: int) -> int:
+        qty = max(qty, 0)
+        self.asks[price] = qty
+
+        if qty > 0 and price < self.best_ask:
+            self.best_ask = price
+        elif qty == 0 and price == self.best_ask:
+            self.best_ask = self._scan_ask(price, 1)
+
+        for t in self.thresholds:
+            current = self.mm_asks[t]
+            if qty >= t and price < current:
+                self.mm_asks[t] = price
+            elif qty < t and price == current:
+                self.mm_asks[t] = self._scan_ask(price, t)
+        return qty
+
+    # ------------- queries -------------
+    def mm_bid(self, threshold: int) -> int:
+        """Highest bid with size ≥ threshold (0 if none)."""
+        if threshold not in self.mm_bids:
+            self.add_threshold(threshold)
+        return self.mm_bids[threshold]
+
+    def mm_ask(self, threshold: int) -> int:
+        """Lowest ask with size ≥ threshold (100 if none)."""
+        if threshold not in self.mm_asks:
+            self.add_threshold(threshold)
+        return self.mm_asks[threshold]
+
+    def levels(self):
+        """
+        Sorted levels in the shape `get_orderbook` has always returned:
+        (bids high→low, asks low→high) as lists of {'price', 'quantity'}.
+        """
+        bid_px = np.flatnonzero(self.bids)[::-1]
+        ask_px = np.flatnonzero(self.asks)
+        bids = [{'price': int(p), 'quantity': int(self.bids[p])} for p in bid_px]
+        asks = [{'price': int(p), 'quantity': int(self.asks[p])} for p in ask_px]
+        return bids, asks
+
+    def top_levels(self, depth: int):
+        """The best `depth` levels per side, in the same shape as `levels`."""
+        bid_px = np.flatnonzero(self.bids)[::-1][:depth]
+        ask_px = np.flatnonzero(self.asks)[:depth]
+        bids = [{'price': int(p), 'quantity': int(self.bids[p])} for p in bid_px]
+        asks = [{'price': int(p), 'quantity': int(self.asks[p])} for p in ask_px]
+        return bids, asks
+
+    # ------------- internals -------------
+    def _scan_bid(self, below: int, threshold: int) -> int:
+        hits = np.flatnonzero(self.bids[:below] >= threshold)
+        return int(hits[-1]) if hits.size else NO_BID
+
+    def _scan_ask(self, above: int, threshold: int) -> int:
+        hits = np.flatnonzero(self.asks[above + 1:] >= threshold)
+        return int(hits[0]) + above + 1 if hits.size else NO_ASK
+
+    def _rescan(self):
+        self.bids[0] = 0
+        self.asks[0] = 0
+        self.best_bid = self._scan_bid(N_LEVELS, 1)
+        self.best_ask = self._scan_ask(0, 1)
+        for t in self.thresholds:
+            self.mm_bids[t] = self._scan_bid(N_LEVELS, t)
+            self.mm_asks[t] = self._scan_ask(0, t)
+
+
+class EventBooks:
+    """All markets of an event, stacked into (n_markets, 100) bid/ask arrays."""
+
+    def __init__(self, tickers: Iterable[str] = (), thresholds: Iterable[int] = ()):
+        self.thresholds = tuple(thresholds)
+        self.tickers: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.books: Dict[str, KalshiBook] = {}
+        self.bids = np.zeros((0, N_LEVELS), dtype=SIZE_DTYPE)
+        self.asks = np.zeros((0, N_LEVELS), dtype=SIZE_DTYPE)
+        self.add(tickers)
+
+    def __getitem__(self, ticker: str) -> KalshiBook:
+        return self.books[ticker]
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self.books
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def add(self, tickers: Iterable[str]):
+        """
+        Add markets, keeping the state of the ones already tracked. The arrays
+        are reallocated, so look books up again via `event_books[ticker]`.
+        """
+        new = [t for t in tickers if t not in self.index]
+        if not new:
+            return
+        n = len(self.tickers) + len(new)
+        bids = np.zeros((n, N_LEVELS), dtype=SIZE_DTYPE)
+        asks = np.zeros((n, N_LEVELS), dtype=SIZE_DTYPE)
+        bids[:len(self.tickers)] = self.bids
+        asks[:len(self.tickers)] = self.asks
+        self.bids, self.asks = bids, asks
+        self.tickers.extend(new)
+        self._rebind()
+
+    def remove(self, tickers: Iterable[str]):
+        drop = set(tickers) & set(self.index)
+        if not drop:
+            return
+        keep = [i for i, t in enumerate(self.tickers) if t not in drop]
+        self.bids = self.bids[keep].copy()
+        self.asks = self.asks[keep].copy()
+        self.tickers = [self.tickers[i] for i in keep]
+        for t in drop:
+            self.books.pop(t, None)
+        self._rebind()
+
+    def best_bids(self) -> np.ndarray:
+        return np.array([self.books[t].best_bid for t in self.tickers], dtype=np.int16)
+
+    def best_asks(self) -> np.ndarray:
+        return np.array([self.books[t].best_ask for t in self.tickers], dtype=np.int16)
+
+    def _rebind(self):
+        # point every book at its row of the stacked arrays; pointers are
+        # rebuilt from the copied data so existing state carries over
+        self.index = {t: i for i, t in enumerate(self.tickers)}
+        for i, t in enumerate(self.tickers):
+            old = self.books.get(t)
+            thresholds = old.thresholds if old is not None else self.thresholds
+            self.books[t] = KalshiBook(thresholds, bids=self.bids[i], asks=self.asks[i])
+
+
+@dataclass(slots=True)
+class LevelEvent:
+    ticker: str
+    side: str         # 'bid' or 'ask'
+    threshold: int
+    kind: str         # 'appeared' | 'moved' | 'disappeared'
+    old_price: int
+    new_price: int
+
+
+class LargeOrderDetector:
+    """
+    Tracks the best level with size ≥ threshold for every (market, side,
+    threshold) and reports only when that level appears, moves or disappears.
+    Size changes that leave the level where it was are not reported.
+
+    `check` reads the pointers a KalshiBook already maintains, so calling it
+    after every delta is O(#thresholds).
+    """
+
+    def __init__(self, thresholds: Iterable[int], on_event: Optional[Callable[[LevelEvent], None]] = None):
+        self.thresholds = tuple(sorted(set(int(t) for t in thresholds)))
+        self.on_event = on_event
+        self.last: Dict[str, Dict[Tuple[str, int], int]] = {}
+
+    def check(self, ticker: str, book: KalshiBook) -> List[LevelEvent]:
+        prev = self.last.setdefault(ticker, {})
+        events = []
+        for t in self.thresholds:
+            for side, price, empty in (('bid', book.mm_bid(t), NO_BID), ('ask', book.mm_ask(t), NO_ASK)):
+                old = prev.get((side, t), empty)
+                if price == old:
+                    continue
+                prev[(side, t)] = price
+                if old == empty:
+                    kind = 'appeared'
+                elif price == empty:
+                    kind = 'disappeared'
+                else:
+                    kind = 'moved'
+                events.append(LevelEvent(ticker, side, t, kind, old, price))
+
+        if self.on_event is not None:
+            for event in events:
+                self.on_event(event)
+        return events
+
+    def current(self, ticker: str, threshold: int) -> Tuple[int, int]:
+        """Last reported (bid, ask) for a market at a threshold."""
+        prev = self.last.get(ticker, {})
+        return prev.get(('bid', threshold), NO_BID), prev.get(('ask', threshold), NO_ASK)
+
+    def forget(self, ticker: str):
+        self.last.pop(ticker, None)
@@ -0,0 +1,81 @@
+# kalshi_client.py
+"""Async Kalshi REST client
+========================
+The chain servers' utils call `requests.get` once per contract per tick, each
+on a fresh connection, from a thread pool. `KalshiClient` is the asyncio
+version for servers that run on one event loop (see aio_server.py): a single
+aiohttp session with pooled keep-alive connections, shared by every
+coroutine, at most LIMIT requests in flight. It returns the same JSON the
+sync helpers parse, so the parsing in utils.py is reused as is.
+
+The session is opened on first use, inside the running loop. Request count,
+errors and latency are in `stats()`.
+"""
+
+from __future__ import annotations
+import time
+from typing import Optional
+
+import aiohttp
+
+from latency import LatencyHistogram
+
+BASE_URL = "https://api.elections.kalshi.com/trade-api/v2"
+LIMIT = 10            # concurrent connections, the size of the old per-contract thread pool
+TIMEOUT_S = 5
+
+
+class KalshiClient:
+    def __init__(self, base_url: str = BASE_URL, limit: int = LIMIT, timeout_s: float = TIMEOUT_S):
+        self.base_url = base_url
+        self.limit = limit
+        self.timeout_s = timeout_s
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.requests = self.errors = 0
+        self.latency = LatencyHistogram("kalshi REST")
+
+    def _session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_s),
+                headers={"accept": "application/json"},
+            )
+        return self.session
+
+    async def get(self, path: str, **params) -> dict:
+        start = time.perf_counter_ns()
+        self.requests += 1
+        try:
+            async with self._session().get(self.base_url + path, params=params or None) as response:
+                response.raise_for_status()
+                return await response.json()
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.latency.record_since(start)
+
+    # ------------- endpoints -------------
+    async def current_event(self, series: str) -> str:
+        """Ticker of the open event in `series` that settles first."""
+        data = await self.get("/events", status="open", series_ticker=series)
+        events = sorted(data['events'], key=lambda e: e['strike_date'])
+        print(f"First Event Ticker: {events[0]['event_ticker']}")
+        return events[0]['event_ticker']
+
+    async def event_markets(self, event: str) -> list:
+        return (await self.get(f"/events/{event}"))['markets']
+
+    async def orderbook(self, ticker: str) -> Optional[dict]:
+        return (await self.get(f"/markets/{ticker}/orderbook")).get('orderbook')
+
+    async def trades(self, ticker: str, limit: int = 10) -> dict:
+        return await self.get("/markets/trades", limit=limit, ticker=ticker)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    def stats(self) -> dict:
+        return {'requests': self.requests, 'errors': self.errors, 'latency': self.latency.summary()}
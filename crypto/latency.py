@@ -0,0 +1,69 @@
+# latency.py
+"""Tiny log2-bucketed latency histogram
+====================================
+Cheap enough to call on every websocket message: `record` is a bit_length and
+a list increment. Bucket i holds samples in [2^(i-1), 2^i) microseconds, so
+percentiles are reported as the bucket's upper bound (within 2x).
+"""
+
+from __future__ import annotations
+import time
+from typing import Dict, List
+
+N_BUCKETS = 32  # 2^31 µs ≈ 36 min, anything larger lands in the last bucket
+
+
+class LatencyHistogram:
+    __slots__ = ("name", "counts", "count", "total_us", "max_us")
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.counts: List[int] = [0] * N_BUCKETS
+        self.count = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+
+    def record(self, seconds: float):
+        us = seconds * 1e6
+        if us < 0:
+            us = 0.0
+        self.counts[min(int(us).bit_length(), N_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+
+    def record_since(self, start_ns: int):
+        """Record time elapsed since a `time.perf_counter_ns()` stamp."""
+        self.record((time.perf_counter_ns() - start_ns) / 1e9)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound (µs) of the bucket containing the q-th percentile."""
+        if self.count == 0:
+            return 0.0
+        target = q / 100 * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target and c:
+                return float(1 << i)
+        return self.max_us
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'mean_us': self.total_us / self.count if self.count else 0.0,
+            'p50_us': self.percentile(50),
+            'p90_us': self.percentile(90),
+            'p99_us': self.percentile(99),
+            'max_us': self.max_us,
+        }
+
+    def __str__(self):
+        s = self.summary()
+        return (f"{self.name}: n={s['count']} mean={s['mean_us']:.0f}µs "
+                f"p50≤{s['p50_us']:.0f}µs p90≤{s['p90_us']:.0f}µs "
+                f"p99≤{s['p99_us']:.0f}µs max={s['max_us']:.0f}µs")
@@ -1,6 +1,7 @@
 // src/components/CumulativePnLChart.js
 import React, { useEffect, useState, useRef } from 'react';
 import { io } from 'socket.io-client';
+import { subscribeDashboard } from '../dashboardStream';
 import {
   LineChart, Line, XAxis, YAxis, Tooltip,
   CartesianGrid, ResponsiveContainer, Legend
@@ -18,7 +19,7 @@ export default function CumulativePnLChart() {
   const seenTickers = useRef(new Set());
 
   useEffect(() => {
-    socket.on('dashboard_update', (data) => {
+    const unsubscribe = subscribeDashboard(socket, (data) => {
       const currentPositions = data.positions || {};
       const avgPrices = data.avg_prices || {};
       const midPrices = data.mid_prices || {};
@@ -61,7 +62,7 @@ export default function CumulativePnLChart() {
       forceUpdate(prev => prev + 1); // trigger re-render
     });
 
-    return () => socket.off('dashboard_update');
+    return unsubscribe;
   }, []);
 
   const tickerOptions = ['ALL', ...Array.from(seenTickers.current).sort()];
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { io } from 'socket.io-client';
+import { subscribeDashboard } from '../dashboardStream';
 import {
   AreaChart, Area, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer,
   LineChart, Line
@@ -16,7 +17,7 @@ export default function EstimatedPriceTracker() {
   const [volatilityData, setVolatilityData] = useState([]);
 
   useEffect(() => {
-    socket.on('dashboard_update', (update) => {
+    const unsubscribe = subscribeDashboard(socket, (update) => {
       const marketQuotes = update.market_quotes || {};
       const estMidPrices = update.estimated_mid_prices || {};
       const volatility = update.brti_60s_realized_volatility || 0;
@@ -60,7 +61,7 @@ export default function EstimatedPriceTracker() {
       }
     });
 
-    return () => socket.off('dashboard_update');
+    return unsubscribe;
   }, [allData, contracts]);
 
   const currentData = selectedContract ? allData[selectedContract] || [] : [];
@@ -1,6 +1,7 @@
 // src/components/MarketMakingStats.js
 import React, { useEffect, useState } from 'react';
 import { io } from 'socket.io-client';
+import { subscribeDashboard } from '../dashboardStream';
 
 const socket = io('http://localhost:5052', {
   transports: ['websocket']
@@ -13,7 +14,7 @@ export default function MarketMakingStats() {
   const [totalCumulativePnL, setTotalCumulativePnL] = useState(0);
 
   useEffect(() => {
-    socket.on('dashboard_update', (data) => {
+    const unsubscribe = subscribeDashboard(socket, (data) => {
       const realized = data.realized_pnl || {};
       const trades = data.total_trades || 0;
       const expected = data.total_expected_spread_pnl || 0;
@@ -25,7 +26,7 @@ export default function MarketMakingStats() {
       setTotalExpected(expected);
       setTotalCumulativePnL(cumulative);
     });
-    return () => socket.off('dashboard_update');
+    return unsubscribe;
   }, []);
 
   const realizedPerTrade = totalTrades > 0 ? (totalPnL / totalTrades).toFixed(4) : 'N/A';
@@ -1,5 +1,6 @@
 import React, { useEffect, useState, useRef } from 'react';
 import { io } from 'socket.io-client';
+import { subscribeDashboard } from '../dashboardStream';
 
 const socket = io('http://localhost:5052', {
   transports: ['websocket']
@@ -10,7 +11,7 @@ export default function QuotesPanel() {
   const seenTickers = useRef(new Set());
 
   useEffect(() => {
-    socket.on('dashboard_update', (data) => {
+    const unsubscribe = subscribeDashboard(socket, (data) => {
       const currentMarket = data.market_quotes || {};
       const currentOur = data.our_quotes || {};
       const currentPositions = data.positions || {};
@@ -72,7 +73,7 @@ export default function QuotesPanel() {
       setQuotes(merged);
     });
 
-    return () => socket.off('dashboard_update');
+    return unsubscribe;
   }, []);
 
   const brtiPrice = quotes._brti || 0;
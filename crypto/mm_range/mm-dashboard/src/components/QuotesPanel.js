@@ -1,5 +1,6 @@
 import React, { useEffect, useState, useRef } from 'react';
 import { io } from 'socket.io-client';
+import { subscribeDashboard } from '../dashboardStream';
 
 const socket = io('http://localhost:5052', {
   transports: ['websocket']
@@ -11,7 +12,7 @@ export default function QuotesPanel() {
   const [realizedVol, setRealizedVol] = useState(0);
 
   useEffect(() => {
-    socket.on('dashboard_update', (data) => {
+    const unsubscribe = subscribeDashboard(socket, (data) => {
       const currentMarket = data.market_quotes || {};
       const currentOur = data.our_quotes || {};
       const currentPositions = data.positions || {};
@@ -81,7 +82,7 @@ export default function QuotesPanel() {
       setQuotes(merged);
     });
 
-    return () => socket.off('dashboard_update');
+    return unsubscribe;
   }, []);
 
   const brtiPrice = quotes._brti || 0;
@@ -1,6 +1,7 @@
 // src/components/RecentTrades.js
 import React, { useEffect, useState } from 'react';
 import { io } from 'socket.io-client';
+import { subscribeDashboard } from '../dashboardStream';
 
 const socket = io('http://localhost:5052', {
   transports: ['websocket']
@@ -8,15 +9,28 @@ const socket = io('http://localhost:5052', {
 
 export default function RecentTrades() {
   const [trades, setTrades] = useState([]);
+  const [older, setOlder] = useState([]);      // pages from the trade store, before the live window
+  const [cursor, setCursor] = useState(null);  // null: page from the oldest live trade
+  const [exhausted, setExhausted] = useState(false);
 
   useEffect(() => {
-    socket.on('dashboard_update', (data) => {
+    const unsubscribe = subscribeDashboard(socket, (data) => {
       const log = data.trade_log || [];
       setTrades(log.slice().reverse()); // show latest first
     });
-    return () => socket.off('dashboard_update');
+    return unsubscribe;
   }, []);
 
+  const loadOlder = () => {
+    const before = cursor ?? trades[trades.length - 1]?.id;
+    if (before == null) return;
+    socket.emit('trade_history', { before, limit: 100 }, (page) => {
+      setOlder(prev => [...prev, ...page.fills]);
+      setCursor(page.next);
+      setExhausted(page.next === null);
+    });
+  };
+
   return (
     <div style={{ padding: '1.5rem', maxHeight: '500px', overflowY: 'auto' }}>
       <h2>📝 Recent Trades</h2>
@@ -29,7 +43,7 @@ export default function RecentTrades() {
           </tr>
         </thead>
         <tbody>
-          {trades.map((t, i) => (
+          {[...trades, ...older].map((t, i) => (
             <tr key={i} style={{ backgroundColor: t.side === 'buy' ? '#eaffea' : '#ffeaea' }}>
               <td style={{ border: '1px solid #ccc', padding: '8px' }}>{t.ticker}</td>
               <td style={{ border: '1px solid #ccc', padding: '8px', color: t.side === 'buy' ? 'green' : 'red' }}>{t.side}</td>
@@ -41,6 +55,9 @@ export default function RecentTrades() {
           ))}
         </tbody>
       </table>
+      {!exhausted && trades.length > 0 && (
+        <button onClick={loadOlder} style={{ marginTop: '1rem' }}>Load older trades</button>
+      )}
     </div>
   );
 }
@@ -0,0 +1,67 @@
+// Client side of test_trading.py's dashboard stream (crypto/state_stream.py).
+// The server coalesces trading ticks and sends a full snapshot every so often,
+// then sequenced deltas with only what changed. This rebuilds the same state
+// the old 'dashboard_update' event carried. On a sequence gap it asks the
+// server for a fresh snapshot.
+
+export const DASHBOARD_EVENT = 'dashboard_stream';
+export const RESYNC_EVENT = 'dashboard_resync';
+
+function applyDelta(state, msg) {
+  const next = { ...state, ...(msg.set ?? {}) };
+  for (const [key, entries] of Object.entries(msg.merge ?? {})) {
+    next[key] = { ...(next[key] ?? {}), ...entries };
+  }
+  for (const [key, gone] of Object.entries(msg.drop ?? {})) {
+    next[key] = { ...(next[key] ?? {}) };
+    for (const k of gone) delete next[key][k];
+  }
+  for (const [key, { trim, items }] of Object.entries(msg.append ?? {})) {
+    next[key] = [...(next[key] ?? []).slice(trim), ...items];
+  }
+  for (const key of msg.unset ?? []) delete next[key];
+  return next;
+}
+
+// Calls onUpdate(state) with the rebuilt state for every applied message.
+// Changed keys are new objects, so React state updates see them.
+// Returns the unsubscribe function.
+export function subscribeDashboard(socket, onUpdate) {
+  let seq = null;
+  let state = null;
+
+  // the server's connect-time snapshot can be delivered before 'connect'
+  // fires, so a reconnect resets on 'disconnect'
+  const reset = () => {
+    seq = null;
+    state = null;
+  };
+
+  const handler = (msg) => {
+    if (msg.type === 'snapshot') {
+      if (state !== null && msg.seq <= seq) return;  // overtaken by newer deltas
+      state = msg.state;
+      seq = msg.seq;
+      onUpdate(state);
+      return;
+    }
+
+    if (state === null || msg.seq <= seq) return;
+    if (msg.seq !== seq + 1) {
+      state = null;
+      socket.emit(RESYNC_EVENT);
+      return;
+    }
+
+    state = applyDelta(state, msg);
+    seq = msg.seq;
+    onUpdate(state);
+  };
+
+  socket.on(DASHBOARD_EVENT, handler);
+  socket.on('disconnect', reset);
+  return () => {
+    socket.off(DASHBOARD_EVENT, handler);
+    socket.off('disconnect', reset);
+  };
+}
@@ -1,66 +1,110 @@
-import eventlet
-eventlet.monkey_patch()
-
 import sys
-import time
-import threading
-import numpy as np
+import asyncio
 from datetime import datetime, timezone
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-from flask_socketio import SocketIO
-from playwright.sync_api import sync_playwright
-from concurrent.futures import ThreadPoolExecutor
+
+from aio_server import make_server, serve, query_arg, background
+from kalshi_client import KalshiClient
+from price_source import make_price_source
+from settlement import SettlementTracker
+from chain_stream import STREAM_EVENT, RESYNC_EVENT
+from subscriptions import SubscriptionHub, SUBSCRIBE_EVENT
+from wire import Wire
+from chain_pipeline import ChainPipeline
 
 from utils import (
-    get_current_event_ticker, get_options_chain_for_event, get_moneyness,
-    implied_vol_binary_call, implied_vol_one_touch, get_orderbook,
-    get_contract_trades
+    filter_chain, get_moneyness, implied_vol_binary_call, implied_vol_one_touch,
+    parse_orderbook
 )
 
 # CONTROLS HOW NEAR THE MONEY WE SEE CONTRACTS
 THRESHOLD = 500 # 4 contracts seems to be the maximum we can do with our rate limits
+SERIES = "KXBTC"
 
 EVENT = sys.argv[1] if len(sys.argv) > 1 else None
 RUNTIME_SECONDS = int(sys.argv[2]) if len(sys.argv) > 2 else 3600
 USE_ONE_TOUCH = False
 IV_FN = implied_vol_one_touch if USE_ONE_TOUCH else implied_vol_binary_call
-
-# === Flask App Setup ===
-app = Flask(__name__)
-CORS(app, supports_credentials=True)
-socketio = SocketIO(app, async_mode='eventlet', cors_allowed_origins='*')
-
-latest_price = {'value': None, 'timestamp': None, 'simple_average': []}
+# Chain updates go out as a snapshot + delta stream on STREAM_EVENT (see chain_stream.py).
+# Set to also emit the old full brti_and_options_update payload every tick.
+EMIT_FULL_UPDATES = False
+
+latest_price = {'value': None, 'timestamp': None}
+# simple_average = mean of the last 60 one-second prints, the way Kalshi settles
+settlement = SettlementTracker()
+# pooled async session for the per-contract REST calls (was a thread pool of requests.get)
+kalshi = KalshiClient()
 active_clients = set()
 
-@socketio.on('connect')
-def handle_connect():
-    sid = request.sid
-    active_clients.add(sid)
-    print(f"🔗 Client connected: {sid}")
-
-@socketio.on('disconnect')
-def handle_disconnect():
-    sid = request.sid
-    active_clients.discard(sid)
-    print(f"❌ Client disconnected: {sid}")
-
-@app.route('/price', methods=['GET'])
 def get_price():
     if latest_price['value'] is None:
-        return jsonify({'status': 'waiting for data'}), 503
-    return jsonify({
+        return {'status': 'waiting for data'}, 503
+    return {
         'brti': latest_price['value'],
-        'simple_average': np.mean(latest_price['simple_average']),
+        'simple_average': settlement.average(),
+        'settlement': settlement.project().to_dict(),
         'timestamp': latest_price['timestamp']
-    })
+    }
 
-@app.route("/status", methods=["GET"])
 def status():
-    return jsonify({"status": "running", "event": EVENT})
+    return {"status": "running", "event": EVENT}
+
+# === Socket.IO App Setup (asyncio, see aio_server.py) ===
+sio, app = make_server({
+    '/price': get_price,
+    '/status': status,
+    '/pipeline': lambda: pipeline.stats(),
+    '/subscriptions': lambda: subscriptions.stats(),
+    '/kalshi': lambda: kalshi.stats(),
+})
+# per-client encoding: JSON by default, ?encoding=msgpack for binary (see wire.py)
+wire = Wire(sio)
+# one snapshot + delta stream per subscription room (see subscriptions.py)
+subscriptions = SubscriptionHub(wire)
+
+@sio.on('connect')
+async def handle_connect(sid, environ, auth=None):
+    active_clients.add(sid)
+    encoding = await wire.connect(sid, query_arg(environ, 'encoding'))
+    print(f"🔗 Client connected: {sid} ({encoding})")
+    await subscriptions.subscribe(sid)  # everything at full rate until it subscribes
+
+@sio.on('disconnect')
+async def handle_disconnect(sid, *args):
+    active_clients.discard(sid)
+    await subscriptions.unsubscribe(sid)
+    wire.disconnect(sid)
+    print(f"❌ Client disconnected: {sid}")
+
+@sio.on(SUBSCRIBE_EVENT)
+async def handle_subscribe(sid, spec):
+    # tickers / strike range / fields / max_hz; the ack is the subscription as applied
+    sub = await subscriptions.subscribe(sid, spec)
+    print(f"📝 Client {sid} subscribed: {sub}")
+    return sub
+
+@sio.on(RESYNC_EVENT)
+async def handle_resync(sid, *args):
+    # client saw a gap in the delta stream
+    await subscriptions.send_snapshot(sid)
+
+async def fetch_contract_trades(ticker):
+    try:
+        return await kalshi.trades(ticker, limit=10)
+    except Exception as e:
+        print("❌ Error fetching trades:", e)
+        return None
 
-def process_contract(contract, brti_price, now_utc):
+async def fetch_orderbook(ticker):
+    try:
+        order_book = await kalshi.orderbook(ticker)
+        if order_book is None:
+            return None, None, None, None, None
+        return parse_orderbook(order_book)
+    except Exception as e:
+        print("❌ Error fetching orderbook:", e)
+        return None, None, None, None, None
+
+async def process_contract(contract, brti_price, now_utc):
     try:
         ticker = contract['ticker']
 
@@ -70,8 +114,8 @@ def process_contract(contract, brti_price, now_utc):
         top = float(subtitle[2].replace(',', ''))
 
         strike = f"{bottom}-{top}"
-        trades = get_contract_trades(ticker)
-        orderbook, top_ask, top_bid, mm_bid, mm_ask = get_orderbook(ticker)
+        trades, (orderbook, top_ask, top_bid, mm_bid, mm_ask) = await asyncio.gather(
+            fetch_contract_trades(ticker), fetch_orderbook(ticker))
 
         middle = (bottom + top) / 2 
         expiration_time = datetime.fromisoformat(contract['close_time'].replace('Z', '+00:00'))
@@ -81,6 +125,9 @@ def process_contract(contract, brti_price, now_utc):
             return None
         
         hours_left = max(total_seconds / 3600, 0.001)
+        # P(YES) from the projected 60 s settlement average for this expiry
+        projection = settlement.project(expiration_time.timestamp())
+        settlement_prob = projection.prob_between(bottom, top) if projection else None
         moneyness = get_moneyness(brti_price, middle, hours_left)        
 
         trade_market = True
@@ -116,7 +163,8 @@ def process_contract(contract, brti_price, now_utc):
             'spread': spread,
             'mid_price': mid_price,
             'trades' : trades,
-            'trade_market' : trade_market
+            'trade_market' : trade_market,
+            'settlement_prob': round(settlement_prob, 4) if settlement_prob is not None else None
         }
     
 
@@ -124,67 +172,53 @@ def process_contract(contract, brti_price, now_utc):
         print(f"⛔ Skipped contract {contract.get('ticker', '')}: {e}")
         return None
 
-def poll_brti():
-    print("🌀 Starting Playwright polling loop...")
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        page.goto("https://www.cfbenchmarks.com/data/indices/BRTI", timeout=20000)
-        page.wait_for_selector('div.leading-6 span')
-        print("📡 Connected to BRTI page.")
-
-        last_logged_price = None
-        time.sleep(2)
-
-        while True:
-            try:
-                price_text = page.locator('div.leading-6 span').first.text_content()
-                price = float(price_text.replace('$', '').replace(',', ''))
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-
-                if price != last_logged_price:
-                    last_logged_price = price
-                    latest_price['simple_average'].append(price)
-                    if len(latest_price['simple_average']) > 60:
-                        latest_price['simple_average'].pop(0)
-
-                    average = np.mean(latest_price['simple_average'])
-                    latest_price['value'] = price
-                    latest_price['timestamp'] = timestamp
-
-                    # Build combined payload
-                    combined_payload = build_options_payload(price, average, timestamp)
-
-                    if combined_payload is None:
-                        print(f"⚠️ No options data available for price {price} at {timestamp}.")
-                        continue
-
-                    brti_data = {
-                        'brti': price,
-                        'simple_average': average,
-                        'timestamp': timestamp
-                    }
-                    combined_payload.update(brti_data)
-                    
-                    socketio.emit("brti_and_options_update", combined_payload)
-                    print(f"📢 Emitting price_update {brti_data['timestamp']} @ {brti_data['brti']} with {len(combined_payload['contracts'])} contracts")
-
-            except Exception as e:
-                print(f"[{datetime.now()}] ⚠️ Error during BRTI polling or options processing: {e}")
-
-            time.sleep(0.1)
-
-def build_options_payload(brti_price, average, timestamp):
+def on_price(price):
+    # ingest stage: runs on the loop between awaits, so nothing here waits on Kalshi
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    settlement.update(price)
+    latest_price['value'] = price
+    latest_price['timestamp'] = timestamp
+    pipeline.submit(price, timestamp)
+
+async def build_tick(price, timestamp):
+    average = settlement.average()
+
+    # Build combined payload
+    combined_payload = await build_options_payload(price, average, timestamp)
+
+    if combined_payload is None:
+        print(f"⚠️ No options data available for price {price} at {timestamp}.")
+        return None
+
+    brti_data = {
+        'brti': price,
+        'simple_average': average,
+        'settlement': settlement.project().to_dict(),
+        'timestamp': timestamp
+    }
+    combined_payload.update(brti_data)
+    return combined_payload
+
+async def emit_tick(combined_payload):
+    await subscriptions.publish(combined_payload)
+    if EMIT_FULL_UPDATES:
+        await wire.emit("brti_and_options_update", combined_payload)
+    print(f"📢 Emitting price_update {combined_payload['timestamp']} @ {combined_payload['brti']} with {len(combined_payload['contracts'])} contracts")
+
+# newest tick wins: ticks that arrive while a payload is being built are dropped, not queued
+pipeline = ChainPipeline(build=build_tick, emit=emit_tick, name="mm chain")
+
+async def build_options_payload(brti_price, average, timestamp):
     global EVENT
     if EVENT is None:
         raise ValueError("No event ticker provided")
 
-    chain_data = get_options_chain_for_event(EVENT, average, threshold=THRESHOLD)
+    chain_data = filter_chain(await kalshi.event_markets(EVENT), average, threshold=THRESHOLD)
 
     # check if all statuses are are finalized to do exit logic
     if all(m['status'] == 'finalized' for m in chain_data):
         print(f"🔄 Market closed. Getting new Event ticker")
-        EVENT = get_current_contract_ticker()
+        EVENT = await kalshi.current_event(SERIES)
         market_outcomes = [(m['ticker'], m['result']) for m in chain_data if m['status'] == 'finalized']
         
         yes_market = None
@@ -193,18 +227,17 @@ def build_options_payload(brti_price, average, timestamp):
                 yes_market = t
 
         print(f"📊 Final ITM Contract {yes_market}. Emitting data.")
-        socketio.emit('final_itm_market', {
+        await sio.emit('final_itm_market', {
                         "timestamp": timestamp,
                         "yes_market": yes_market
                     })
         
         return None
 
-    output = []
     now_utc = datetime.now().astimezone().astimezone(timezone.utc)
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        results = executor.map(lambda c: process_contract(c, brti_price, now_utc), chain_data)
+    # every contract's trades + orderbook in flight at once, over the client's pooled connections
+    results = await asyncio.gather(*(process_contract(c, brti_price, now_utc) for c in chain_data))
 
     output = [r for r in results if r is not None]
 
@@ -212,19 +245,22 @@ def build_options_payload(brti_price, average, timestamp):
         'contracts': output
     }
 
-def shutdown_after(seconds):
-    time.sleep(seconds)
-    print(f"\n🕒 Runtime limit of {seconds} seconds reached. Shutting down...")
-    socketio.stop()
-    sys.exit(0)
-
-if __name__ == "__main__":
-    threading.Thread(target=poll_brti, daemon=True).start()
-    threading.Thread(target=shutdown_after, args=(RUNTIME_SECONDS,), daemon=True).start()
-
+async def main():
+    global EVENT
     if EVENT is None:
         print("🔍 No event ticker provided. Fetching current contract ticker...")
-        EVENT = get_current_event_ticker()
+        EVENT = await kalshi.current_event(SERIES)
 
-    print(f"🌐 Serving brti_and_options_update on http://localhost:5050 for {EVENT}...")
-    socketio.run(app, host="127.0.0.1", port=5050)
+    # BRTI_SOURCE: scraper (default), engine (local index) or feed (ticks pushed by brti_listener)
+    pipeline.start()
+    subscriptions.start()
+    source = background(make_price_source(poll_s=0.1, warmup_s=2).stream(on_price), "price source")
+    print(f"🌐 Serving {STREAM_EVENT} on http://localhost:5050 for {EVENT}...")
+    try:
+        await serve(app, host="127.0.0.1", port=5050, runtime_s=RUNTIME_SECONDS)
+    finally:
+        source.cancel()
+        await kalshi.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,21 +1,22 @@
-import eventlet
-eventlet.monkey_patch()
-import threading
-
+import asyncio
+import os
 import socketio
-from collections import defaultdict
+from collections import defaultdict, deque
 import time
-from flask import Flask
-from flask_socketio import SocketIO
-from flask_cors import CORS
-from flask_socketio import SocketIO
-
-from flask import Flask, jsonify, request
 
 import numpy as np # for realized vol tracking
 from utils import binary_call_price, implied_vol_binary_call
-
-sio = socketio.Client()
+from rolling import RollingWindow
+from chain_stream import ChainReassembler, STREAM_EVENT, RESYNC_EVENT
+from wire import Wire, ENCODINGS, decode
+from aio_server import make_server, serve, query_arg, background
+from state_stream import StatePublisher
+from trade_store import TradeStore
+
+# chain server client and dashboard server share one asyncio loop (see aio_server.py)
+sio = socketio.AsyncClient()
+# rebuilds brti_and_options_update payloads from the server's snapshot + delta stream
+chain = ChainReassembler(on_gap=lambda: background(sio.emit(RESYNC_EVENT), "chain resync"))
 
 # Store last known bid/ask per contract
 previous_quotes = {}
@@ -24,13 +25,17 @@ new_quotes = {} # new quotes we are proposing this round
 mid_prices = {} 
 estiamted_mid_prices = {}
 
-brti_window = [] # List to store last 60 seconds of BRTI prices
+brti_window = RollingWindow(span_s=60) # last 60 seconds of BRTI prices
 
 # Global dictionary to track seen trades by contract
 seen_trades = {}
 
-trade_log = []  # List of trade events with per-trade realized pnl
-finalized_trades = []  # List of finalized trades with realized pnl
+# === Trade history ===
+TRADE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "trades.db")
+TRADE_LOG_KEEP = 100  # fills kept in memory for the dashboard, the full history is in TRADE_DB
+store = TradeStore(TRADE_DB)  # fills, per-tick PnL and settlements, written off the trading path
+
+trade_log = deque(maxlen=TRADE_LOG_KEEP)  # latest trade events with per-trade realized pnl
 cumulative_pnl = defaultdict(float)  # Running realized + unrealized pnl per contract
 
 # === Config ===
@@ -47,42 +52,86 @@ avg_prices = defaultdict(float)           # ticker -> avg entry price
 realized_pnl = defaultdict(float)         # ticker -> realized pnl
 unrealized_pnl = defaultdict(float)
 real_unrealized_pnl = defaultdict(float)  # ticker -> unrealized pnl
+last_tick = {}                            # per-tick values the dashboard shows, set by handle_update
+
+# === Dashboard ===
+DASHBOARD_HZ = 4                       # dashboard updates per second at most, ticks in between are coalesced
+DASHBOARD_EVENT = "dashboard_stream"   # snapshot + delta stream, see state_stream.py
+DASHBOARD_RESYNC = "dashboard_resync"
+DASHBOARD_FULL_EVENT = None            # e.g. "dashboard_update" to also send the whole state each update
 
 
 @sio.event
-def connect():
+async def connect():
     print("✅ Connected to WebSocket server.")
 
 @sio.event
-def disconnect():
+async def disconnect():
+    # a reconnect starts a fresh stream. Not reset in connect(): the server's
+    # snapshot is sent before the connect ack, so it can arrive first
+    chain.reset()
     print("❌ Disconnected from WebSocket server.")
 
 # Websocket Logic
-app = Flask(__name__)
-socketio = SocketIO(app, async_mode='eventlet', cors_allowed_origins='*')
-# socketio.run(app, host="127.0.0.1", port=5052)
-
-@app.route('/')
-def index():
-    return "WebSocket server is running."
+server, app = make_server({'/': lambda: "WebSocket server is running."})
+# per-client encoding for dashboard_update: JSON by default, ?encoding=msgpack for binary
+wire = Wire(server)
 
 active_clients = set()
-@socketio.on('connect')
-def handle_connect():
-    sid = request.sid
+@server.on('connect')
+async def handle_connect(sid, environ, auth=None):
     active_clients.add(sid)
-    print(f"🔗 Client connected: {sid}")
-
-@socketio.on('disconnect')
-def handle_disconnect():
-    sid = request.sid
+    encoding = await wire.connect(sid, query_arg(environ, 'encoding'))
+    await dashboard.send_snapshot(sid)
+    print(f"🔗 Client connected: {sid} ({encoding})")
+
+@server.on(DASHBOARD_RESYNC)
+async def handle_resync(sid, *args):
+    await dashboard.send_snapshot(sid)
+
+# History pages for the dashboard, answered as the ack: {'before': id, 'limit': n, 'ticker': t}
+@server.on('trade_history')
+async def handle_trade_history(sid, query=None):
+    query = query or {}
+    return await asyncio.to_thread(store.fills, query.get('before'), min(int(query.get('limit', 100)), 1000),
+                                   query.get('ticker'))
+
+@server.on('pnl_history')
+async def handle_pnl_history(sid, query=None):
+    return await asyncio.to_thread(store.pnl_history, (query or {}).get('since'))
+
+@server.on('disconnect')
+async def handle_disconnect(sid, *args):
     active_clients.discard(sid)
+    wire.disconnect(sid)
     print(f"❌ Client disconnected: {sid}")
 
-def emit_data(event, data):
-    # Emit data to all connected clients.
-    socketio.emit(event, data)
-    print(f"🔊 Emitted event '{event}' with data")
+def dashboard_state():
+    # Built by the dashboard publisher at DASHBOARD_HZ, never on the trading path
+    return {
+        "timestamp": last_tick["timestamp"],
+        "market_quotes": last_tick["market_quotes"],
+        "estimated_mid_prices": {k: float(v)*100 for k, v in estiamted_mid_prices.items()},
+        "our_quotes": our_quotes,
+        "positions": dict(positions),
+        "avg_prices": dict(avg_prices),
+        "mid_prices": dict(mid_prices),
+        "brti_60s_price" : last_tick["brti_60s_price"],
+        "brti_60s_realized_volatility": last_tick["brti_60s_realized_volatility"],
+        "strikes": strikes,
+        "realized_pnl": {k: v / 100 for k, v in realized_pnl.items()},
+        "unrealized_pnl": {k: v / 100 for k, v in unrealized_pnl.items()},  # in dollars
+        "cumulative_pnl": last_tick["cumulative_pnl"],
+        "total_trades": total_trades,
+        "expected_spread_pnl": dict(expected_spread_pnl),
+        "total_expected_spread_pnl": total_expected_spread_pnl,
+        "quotes": our_quotes,
+        "trade_log": list(trade_log)
+    }
+
+# Sends only what changed since the last update, at most DASHBOARD_HZ times a second
+dashboard = StatePublisher(wire, dashboard_state, DASHBOARD_EVENT, rate_hz=DASHBOARD_HZ,
+                           full_event=DASHBOARD_FULL_EVENT, name="dashboard")
 
 # error bands on estimated fair price
 def compute_error_band_quotes(P_fair, absolute_uncertainty=0.05):
@@ -92,18 +141,20 @@ def compute_error_band_quotes(P_fair, absolute_uncertainty=0.05):
 
 
 
-@sio.on('brti_and_options_update')
+@sio.on(STREAM_EVENT)
+async def handle_stream(msg):
+    data = chain.apply(decode(msg))
+    if data is not None:
+        handle_update(data)
+
 def handle_update(data):
     global total_trades, unrealized_pnl, real_unrealized_pnl, expected_spread_pnl, total_expected_spread_pnl, our_quotes, new_quotes, mid_prices, brti_window, estiamted_mid_prices
 
     brti_window.append(data['brti'])
-    if len(brti_window) > 60:
-        brti_window.pop(0)
 
     # Compute realized volatility if enough data
     if len(brti_window) > 1:
-        log_returns = np.diff(np.log(brti_window))
-        brti_60s_realized_volatility = np.std(log_returns) # convert to years
+        brti_60s_realized_volatility = brti_window.log_return_std() # std of 1-tick log returns, O(1)
 
         # Annualize (31,536,000 seconds in a year)
         volatility_annualized = brti_60s_realized_volatility * np.sqrt(31_536_000)
@@ -249,7 +300,7 @@ def handle_update(data):
                     expected_spread_pnl[ticker] += spread_edge
                     total_expected_spread_pnl += spread_edge
 
-                    trade_log.append({
+                    fill = {
                         'trade_id': trade_id,
                         'ticker': ticker,
                         'side': 'buy',
@@ -258,7 +309,9 @@ def handle_update(data):
                         'realized_pnl': realized,
                         'position_after': positions[ticker],
                         'avg_entry_price_after': avg_prices[ticker]
-                    })
+                    }
+                    fill['id'] = store.record_fill(fill)
+                    trade_log.append(fill)
                     print(f"    🟩 FILLED BUY {filled} @ {our_bid:.2f}")
 
                 elif side == 'sell':
@@ -295,7 +348,7 @@ def handle_update(data):
                     expected_spread_pnl[ticker] += spread_edge
                     total_expected_spread_pnl += spread_edge
 
-                    trade_log.append({
+                    fill = {
                         'trade_id': trade_id,
                         'ticker': ticker,
                         'side': 'sell',
@@ -304,7 +357,9 @@ def handle_update(data):
                         'realized_pnl': realized,
                         'position_after': positions[ticker],
                         'avg_entry_price_after': avg_prices[ticker]
-                    })
+                    }
+                    fill['id'] = store.record_fill(fill)
+                    trade_log.append(fill)
                     print(f"    🟥 FILLED SELL {filled} @ {price:.2f}")
             else:
                 print(f"    🔍 TRADE @ {price:.2f} not inside our market.")
@@ -366,37 +421,28 @@ def handle_update(data):
     our_quotes = new_quotes.copy()
     new_quotes = {}
 
-    # === Emit structured state ===
-    emit_data("dashboard_update", {
+    # === Hand the new state to the dashboard publisher ===
+    last_tick.update({
         "timestamp": data["timestamp"],
         "market_quotes": market_quotes,
-        "estimated_mid_prices": {k: float(v)*100 for k, v in estiamted_mid_prices.items()},
-        "our_quotes": our_quotes,
-        "positions": dict(positions),
-        "avg_prices": dict(avg_prices),
-        "mid_prices": dict(mid_prices),
-        "brti_60s_price" : data["simple_average"],
+        "brti_60s_price": data["simple_average"],
         "brti_60s_realized_volatility": volatility_annualized,
-        "strikes": strikes,
-        "realized_pnl": {k: v / 100 for k, v in realized_pnl.items()},
-        "unrealized_pnl": {k: v / 100 for k, v in unrealized_pnl.items()},  # in dollars
         "cumulative_pnl": total_unrealized/100 + total_realized/100,
-        "total_trades": total_trades,
-        "expected_spread_pnl": dict(expected_spread_pnl),
-        "total_expected_spread_pnl": total_expected_spread_pnl,
-        "quotes": our_quotes,
-        "trade_log": trade_log[-100:]
     })
+    dashboard.touch()
+    store.record_pnl(data["timestamp"], sum(realized_pnl.values())/100, total_unrealized/100,
+                     total_trades, total_expected_spread_pnl)
     
 @sio.on('final_itm_market')
 def handle_finalized_outcomes(data):
-    global finalized_trades, trade_log, positions, avg_prices, realized_pnl, cumulative_pnl, unrealized_pnl, global_total_cumulative_pnl
+    global trade_log, positions, avg_prices, realized_pnl, cumulative_pnl, unrealized_pnl, global_total_cumulative_pnl
     timestamp = data.get('timestamp', time.time())
     yes_market = data.get('yes_market', None)
 
     print("🔄 Market Finalized. Processing outcomes.")
     print(f"📊 Final ITM Contract: {yes_market} at {timestamp}")
 
+    closed = []
     for ticker, pos in positions.items():
         if pos == 0:
             continue
@@ -408,6 +454,8 @@ def handle_finalized_outcomes(data):
         final_pnl = (result - avg_entry) * pos
         realized_pnl[ticker] += final_pnl
         cumulative_pnl[ticker] += final_pnl
+        closed.append({'ticker': ticker, 'position': pos, 'avg_entry': avg_entry,
+                       'outcome': result // 100, 'final_pnl': final_pnl / 100})
 
         print(f"🔚 {ticker}: Closed position {pos} @ avg {avg_entry:.2f} -> Outcome: {result} | Final PnL: {final_pnl/100:.2f}")
     
@@ -415,30 +463,42 @@ def handle_finalized_outcomes(data):
     cumulative_total_pnl = sum(realized_pnl.values()) / 100
     expected_edge = sum(expected_spread_pnl.values())    
 
-    # Update trade log with final outcomes and move to finalized_trades
+    # Mark the live trade log with final outcomes; the store marks every stored fill of the event
+    finalized = 0
     for trade in trade_log:
+        if trade.get('expired'):
+            continue
         ticker = trade['ticker']
         trade['expired'] = True
         trade['outcome'] = 1 if ticker == yes_market else 0
-        finalized_trades.append(trade)
+        finalized += 1
+    store.record_settlement(yes_market, closed)
 
     print(f"📈 Total Cumulative PnL: ${cumulative_total_pnl:.2f} | Expected Edge: ${expected_edge:.2f}")
-    print(f"📊 Finalized Trades: {len(finalized_trades)}")
+    print(f"📊 Finalized Trades: {finalized} (history in {TRADE_DB})")
     print(f"📊 Expected Spread PnL: {total_expected_spread_pnl:.2f}")
     print("=" * 50)
+    if last_tick:
+        dashboard.touch()
 
-    # TODO: Implement logic to SAVE this information somewhere in like a CSV, then restart the test_trading file the dashboard. 
-    # then can just make another dashboard for visualizing results
+    return cumulative_total_pnl, expected_edge
 
-    return finalized_trades, cumulative_total_pnl, expected_edge
+async def start_sio_client():
+    # binary chain stream when msgpack is installed, the server falls back to JSON otherwise
+    encoding = "msgpack" if "msgpack" in ENCODINGS else "json"
+    await sio.connect(f"http://localhost:5050?encoding={encoding}", transports=["websocket"])
+    await sio.wait()
 
-def start_sio_client():
-    sio.connect("http://localhost:5050", transports=["websocket"])
-    sio.wait()
+async def main():
+    # Start the chain client as a task on the same loop
+    background(start_sio_client(), "chain client")
+    dashboard.start()
 
-if __name__ == "__main__":
-    # Start the client in a background thread
-    threading.Thread(target=start_sio_client, daemon=True).start()
+    # Serve the dashboard stream on 5052
+    try:
+        await serve(app, host="127.0.0.1", port=5052)
+    finally:
+        store.close()
 
-    # Start the Flask-SocketIO server
-    socketio.run(app, host="127.0.0.1", port=5052)
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
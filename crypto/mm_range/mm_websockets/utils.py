@@ -9,6 +9,8 @@ from scipy.stats import norm
 from scipy.optimize import brentq
 import numpy as np
 
+from kalshi_book import KalshiBook
+
 session = requests.Session()
 
 USE_YEARS = True  # Set to True if you want to use years for TTE, False for hours
@@ -92,37 +94,25 @@ def get_orderbook(ticker):
             print(response.text)
             return None, None, None, None, None
         
-        asks = []
-        bids = []
-
-        if order_book['yes']:
-            for price, size in order_book['yes']:
-                bids.append({'price': price, 'quantity': size})
-        if order_book['no']:
-            for price, size in order_book['no']:
-                asks.append({'price': (100-price), 'quantity': size})
-        
-        sorted_bids = sorted(bids, key=lambda x: -x["price"])  # High to low
-        sorted_asks = sorted(asks, key=lambda x: x["price"])   # Low to high
+        return parse_orderbook(order_book)
+    
+    except Exception as e:
+        print("❌ Error fetching orderbook:", e)
+        return None, None, None, None, None
 
+def parse_orderbook(order_book):
+    book = KalshiBook.from_rest(order_book, thresholds=(MM_THRESHOLD,))
 
-        top_ask = sorted_asks[0]['price'] if len(asks) > 0 else 100
-        top_bid = sorted_bids[0]['price'] if len(bids) > 0 else 0
+    top_ask = book.best_ask
+    top_bid = book.best_bid
 
-        # identify bids and asks mad eby marketmakers
-        mm_bids = list(filter(lambda x: x['quantity'] >= MM_THRESHOLD, sorted_bids))
-        mm_asks = list(filter(lambda x: x['quantity'] >= MM_THRESHOLD, sorted_asks))
+    # identify bids and asks made by marketmakers
+    mm_bid = book.mm_bid(MM_THRESHOLD)
+    mm_ask = book.mm_ask(MM_THRESHOLD)
 
-        mm_bid = mm_bids[0]['price'] if len(mm_bids) > 0 else 0
-        mm_ask = mm_asks[0]['price'] if len(mm_asks) > 0 else 100
+    orderbook = book.levels()
 
-        orderbook = (sorted_bids, sorted_asks)
-
-        return orderbook, top_ask, top_bid, mm_bid, mm_ask  
-    
-    except Exception as e:
-        print("❌ Error fetching orderbook:", e)
-        return None, None, None, None, None
+    return orderbook, top_ask, top_bid, mm_bid, mm_ask  
 
 def binary_call_price(S, K, T_hours, sigma, r=0.0):
     T = T_hours / (365 * 24)  # Convert hours to years
@@ -230,26 +220,28 @@ def get_options_chain_for_event(event, brti_price=0, threshold=1000):
         headers = {"accept": "application/json"}
         response = requests.get(url, headers=headers)
 
-        chain = []
         res = json.loads(response.text)
+        return filter_chain(res['markets'], brti_price, threshold)
+    
+    except Exception as e:
+        print("❌ Error fetching chain:", e)
+        return None, None
 
-        for m in res['markets']:
-            things = m['subtitle'].split(" ")
+def filter_chain(markets, brti_price=0, threshold=1000):
+    chain = []
+    for m in markets:
+        things = m['subtitle'].split(" ")
 
-            try:
-                bottom = float(things[0][1:].replace(',', ''))
+        try:
+            bottom = float(things[0][1:].replace(',', ''))
 
-                top = float(things[2].replace(',', ''))
-                middle = (bottom + top) / 2
+            top = float(things[2].replace(',', ''))
+            middle = (bottom + top) / 2
 
-                if abs(middle - brti_price) < threshold:
-                    chain.append(m)
+            if abs(middle - brti_price) < threshold:
+                chain.append(m)
 
-            except Exception as e:
-                continue
+        except Exception as e:
+            continue
 
-        return chain    
-    
-    except Exception as e:
-        print("❌ Error fetching chain:", e)
-        return None, None
\ No newline at end of file
+    return chain
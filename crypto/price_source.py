@@ -0,0 +1,256 @@
+# price_source.py
+"""Pluggable BRTI price sources
+============================
+Every price server used to launch headless Chromium and scrape the CF
+Benchmarks page. They now take the price from a `PriceSource`:
+
+  * `ScraperSource` – the original feed: headless Chromium on the BRTI page,
+                      reading `div.leading-6 span`. The published value, but a
+                      few hundred MB per process and seconds of startup.
+  * `EngineSource`  – the `BRTI` engine from `websockets/brti.py`, computed
+                      in-process from ccxt order books. No browser; it is our
+                      reconstruction of the index, not the published value.
+  * `FeedSource`    – ticks pushed by the `brti_listener.py` daemon (which runs
+                      one of the above), so one browser / engine serves every
+                      server on the box. See brti_feed.py.
+
+Both are polled the same way: `run(on_price)` reads the current price every
+`poll_s` and calls `on_price(price)` whenever it changes, in the caller's
+thread. The asyncio socket servers (aio_server.py) `await stream(on_price)`
+instead, which does the same on the running loop: async Playwright, the
+engine as a task on that loop, the feed socket through asyncio. Their
+callbacks may be coroutine functions. Servers keep their own timestamps,
+averages and emits, so `/price` and the socket payloads are unchanged.
+`make_price_source()` picks the source from the BRTI_SOURCE environment
+variable ("scraper", "engine" or "feed").
+"""
+
+from __future__ import annotations
+import asyncio
+import importlib.util
+import inspect
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from brti_feed import FeedClient
+
+BRTI_URL = "https://www.cfbenchmarks.com/data/indices/BRTI"
+PRICE_SELECTOR = 'div.leading-6 span'
+DEFAULT_SOURCE = os.environ.get("BRTI_SOURCE", "scraper")
+ENGINE_PATH = Path(__file__).resolve().parent / "websockets" / "brti.py"
+
+
+class PriceSource:
+    name = "base"
+
+    def __init__(self, poll_s: float = 0.3, warmup_s: float = 0.0):
+        self.poll_s = poll_s
+        self.warmup_s = warmup_s   # pause after connecting, e.g. to let clients connect
+
+    def _open(self):
+        """Connect to the feed; blocks until the first price can be read."""
+        raise NotImplementedError
+
+    def _read(self) -> Optional[float]:
+        raise NotImplementedError
+
+    def run(self, on_price: Callable[[float], None], on_unchanged: Optional[Callable[[float], None]] = None):
+        """
+        Blocking poll loop. `on_unchanged`, if given, is called on polls that
+        read the same price again. Errors are logged and polling continues.
+        """
+        self._open()
+        print(f"📡 Connected to BRTI ({self.name}).")
+        time.sleep(self.warmup_s)
+
+        last_price = None
+        while True:
+            try:
+                price = self._read()
+                if price is not None and price != last_price:
+                    last_price = price
+                    on_price(price)
+                elif price is not None and on_unchanged is not None:
+                    on_unchanged(price)
+            except Exception as e:
+                print(f"[{datetime.now()}] ⚠️ Error in BRTI {self.name} feed or price handler: {e}")
+            time.sleep(self.poll_s)
+
+    def start(self, on_price: Callable[[float], None],
+              on_unchanged: Optional[Callable[[float], None]] = None) -> threading.Thread:
+        thread = threading.Thread(target=self.run, args=(on_price, on_unchanged), daemon=True)
+        thread.start()
+        return thread
+
+    # ------------- asyncio -------------
+    async def _aopen(self):
+        """`_open` for `stream`; by default the blocking one, off the loop."""
+        await asyncio.to_thread(self._open)
+
+    async def _aread(self) -> Optional[float]:
+        return self._read()
+
+    async def stream(self, on_price: Callable[[float], Any], on_unchanged: Optional[Callable[[float], Any]] = None):
+        """`run` on the running loop. Never returns; wrap it in a task."""
+        await self._aopen()
+        print(f"📡 Connected to BRTI ({self.name}).")
+        await asyncio.sleep(self.warmup_s)
+
+        last_price = None
+        while True:
+            try:
+                price = await self._aread()
+                if price is not None and price != last_price:
+                    last_price = price
+                    await _call(on_price, price)
+                elif price is not None and on_unchanged is not None:
+                    await _call(on_unchanged, price)
+            except Exception as e:
+                print(f"[{datetime.now()}] ⚠️ Error in BRTI {self.name} feed or price handler: {e}")
+            await asyncio.sleep(self.poll_s)
+
+
+async def _call(fn, *args):
+    result = fn(*args)
+    if inspect.isawaitable(result):
+        await result
+
+
+class ScraperSource(PriceSource):
+    name = "scraper"
+
+    def _open(self):
+        from playwright.sync_api import sync_playwright
+        print("🚀 Launching browser...")
+        self._playwright = sync_playwright().start()
+        browser = self._playwright.chromium.launch(headless=True)
+        self._page = browser.new_page()
+        self._page.goto(BRTI_URL, timeout=20000)
+        self._page.wait_for_selector(PRICE_SELECTOR)
+
+    def _read(self) -> Optional[float]:
+        price_text = self._page.locator(PRICE_SELECTOR).first.text_content()
+        return float(price_text.replace('$', '').replace(',', ''))
+
+    async def _aopen(self):
+        from playwright.async_api import async_playwright
+        print("🚀 Launching browser...")
+        self._playwright = await async_playwright().start()
+        browser = await self._playwright.chromium.launch(headless=True)
+        self._page = await browser.new_page()
+        await self._page.goto(BRTI_URL, timeout=20000)
+        await self._page.wait_for_selector(PRICE_SELECTOR)
+
+    async def _aread(self) -> Optional[float]:
+        price_text = await self._page.locator(PRICE_SELECTOR).first.text_content()
+        return float(price_text.replace('$', '').replace(',', ''))
+
+
+class EngineSource(PriceSource):
+    """
+    Runs the BRTI engine on its own OS thread (or, under `stream`, as a task
+    on the caller's loop) and polls the last published index, rounded to
+    cents like the CF page. `mode` is the engine's publication mode ("tick" =
+    once a second like the real index, or "event").
+    """
+    name = "engine"
+
+    def __init__(self, poll_s: float = 0.3, warmup_s: float = 0.0, mode: str = "tick",
+                 open_timeout_s: float = 60.0):
+        super().__init__(poll_s, warmup_s)
+        self.mode = mode
+        self.open_timeout_s = open_timeout_s
+        self._price: Optional[float] = None
+
+    @staticmethod
+    def _load_engine():
+        # websockets/ is not a package (and the name would shadow the pip
+        # `websockets` library), so load brti.py from its path
+        module = sys.modules.get("brti")
+        if module is None:
+            spec = importlib.util.spec_from_file_location("brti", ENGINE_PATH)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules["brti"] = module   # dataclasses look their module up here
+            spec.loader.exec_module(module)
+        return module.BRTI
+
+    def _on_publish(self, idx, venues, ts):
+        if idx is None:
+            return  # withheld: keep serving the last good price
+        self._price = round(idx, 2)
+
+    def _open(self):
+        BRTI = self._load_engine()
+        print("🚀 Starting in-process BRTI engine...")
+        # build the engine inside its thread so its exchanges bind to that loop
+        threading.Thread(target=lambda: asyncio.run(BRTI(mode=self.mode, on_publish=self._on_publish).run()),
+                         daemon=True).start()
+        deadline = time.monotonic() + self.open_timeout_s
+        while self._price is None and time.monotonic() < deadline:
+            time.sleep(self.poll_s)
+        self._warn_if_silent()
+
+    async def _aopen(self):
+        BRTI = self._load_engine()
+        print("🚀 Starting in-process BRTI engine on the server loop...")
+        self._engine = asyncio.create_task(BRTI(mode=self.mode, on_publish=self._on_publish).run())
+        deadline = time.monotonic() + self.open_timeout_s
+        while self._price is None and time.monotonic() < deadline and not self._engine.done():
+            await asyncio.sleep(self.poll_s)
+        if self._engine.done() and self._engine.exception() is not None:
+            raise self._engine.exception()
+        self._warn_if_silent()
+
+    def _warn_if_silent(self):
+        if self._price is None:
+            print(f"⚠️ BRTI engine has not published after {self.open_timeout_s:.0f}s, still waiting...")
+
+    def _read(self) -> Optional[float]:
+        return self._price
+
+
+class FeedSource(PriceSource):
+    """Push instead of poll: `on_price` runs as each tick arrives from the daemon."""
+    name = "feed"
+
+    def run(self, on_price: Callable[[float], None], on_unchanged: Optional[Callable[[float], None]] = None):
+        time.sleep(self.warmup_s)
+
+        def on_tick(tick):
+            try:
+                on_price(tick.price)  # the daemon only publishes changes
+            except Exception as e:
+                print(f"[{datetime.now()}] ⚠️ Error in BRTI {self.name} price handler: {e}")
+
+        FeedClient(on_tick).run()
+
+    async def stream(self, on_price: Callable[[float], Any], on_unchanged: Optional[Callable[[float], Any]] = None):
+        await asyncio.sleep(self.warmup_s)
+
+        async def on_tick(tick):
+            try:
+                await _call(on_price, tick.price)
+            except Exception as e:
+                print(f"[{datetime.now()}] ⚠️ Error in BRTI {self.name} price handler: {e}")
+
+        await FeedClient(on_tick).arun()
+
+
+SOURCES = {
+    ScraperSource.name: ScraperSource,
+    EngineSource.name: EngineSource,
+    FeedSource.name: FeedSource,
+}
+
+
+def make_price_source(kind: Optional[str] = None, **kwargs) -> PriceSource:
+    """Build the source named by `kind` (default: BRTI_SOURCE env var, else "scraper")."""
+    kind = kind or DEFAULT_SOURCE
+    if kind not in SOURCES:
+        raise ValueError(f"Unknown BRTI source '{kind}', expected one of {sorted(SOURCES)}")
+    return SOURCES[kind](**kwargs)
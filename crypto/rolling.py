@@ -0,0 +1,140 @@
+# rolling.py
+"""O(1) rolling window of prices
+=============================
+Replaces the `list.append` / `pop(0)` / `np.mean` pattern. A deque of
+(timestamp, value) plus running sums gives the mean, variance and log-return
+statistics in O(1) per tick.
+
+The window is bounded by sample count (`size`), by time (`span_s`: keep
+samples newer than the last timestamp minus span_s), or both.
+
+Sums are kept relative to an offset (the oldest sample when last rebuilt) so
+variance of ~1e5 prices doesn't cancel catastrophically. They are rebuilt
+from the deque once per full turnover of the window, so float drift stays
+bounded at amortised O(1) cost.
+"""
+
+from __future__ import annotations
+import math
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+import numpy as np
+
+
+class RollingWindow:
+    __slots__ = ("size", "span_s", "samples", "offset", "sum", "sumsq",
+                 "ret_sum", "ret_sumsq", "_since_rebuild")
+
+    def __init__(self, size: Optional[int] = None, span_s: Optional[float] = None):
+        if size is None and span_s is None:
+            raise ValueError("RollingWindow needs a size, a span_s or both")
+        self.size = size
+        self.span_s = span_s
+        # (ts, value, log return from the previous sample or nan)
+        self.samples: Deque[Tuple[float, float, float]] = deque()
+        self.offset = 0.0
+        self.sum = 0.0          # Σ(x - offset)
+        self.sumsq = 0.0        # Σ(x - offset)²
+        self.ret_sum = 0.0      # Σ log returns between samples in the window
+        self.ret_sumsq = 0.0
+        self._since_rebuild = 0
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    # ------------- updates -------------
+    def append(self, value: float, ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        value = float(value)
+        if not self.samples:
+            self.offset = value
+            r = math.nan
+        else:
+            prev = self.samples[-1][1]
+            r = math.log(value / prev) if prev > 0 and value > 0 else math.nan
+
+        self.samples.append((ts, value, r))
+        d = value - self.offset
+        self.sum += d
+        self.sumsq += d * d
+        if r == r:  # not nan
+            self.ret_sum += r
+            self.ret_sumsq += r * r
+
+        self._evict(ts)
+        self._since_rebuild += 1
+        if self._since_rebuild >= max(len(self.samples), 64):
+            self._rebuild()
+
+    def expire(self, now: Optional[float] = None):
+        """Drop samples older than span_s before `now` (e.g. when reading after a pause)."""
+        self._evict(time.time() if now is None else now)
+
+    def clear(self):
+        self.samples.clear()
+        self._rebuild()
+
+    def _evict(self, now: float):
+        while self.samples and (
+            (self.size is not None and len(self.samples) > self.size) or
+            (self.span_s is not None and self.samples[0][0] <= now - self.span_s)
+        ):
+            _, value, _ = self.samples.popleft()
+            d = value - self.offset
+            self.sum -= d
+            self.sumsq -= d * d
+            if self.samples:
+                # the new oldest sample's return pointed at the evicted one
+                r = self.samples[0][2]
+                if r == r:
+                    self.ret_sum -= r
+                    self.ret_sumsq -= r * r
+
+    def _rebuild(self):
+        self._since_rebuild = 0
+        self.offset = self.samples[0][1] if self.samples else 0.0
+        self.sum = self.sumsq = self.ret_sum = self.ret_sumsq = 0.0
+        for i, (_, value, r) in enumerate(self.samples):
+            d = value - self.offset
+            self.sum += d
+            self.sumsq += d * d
+            if i and r == r:
+                self.ret_sum += r
+                self.ret_sumsq += r * r
+
+    # ------------- queries -------------
+    @property
+    def last(self) -> Optional[float]:
+        return self.samples[-1][1] if self.samples else None
+
+    def mean(self) -> float:
+        n = len(self.samples)
+        return self.offset + self.sum / n if n else math.nan
+
+    def var(self, ddof: int = 0) -> float:
+        n = len(self.samples)
+        if n - ddof <= 0:
+            return math.nan
+        return max(self.sumsq - self.sum * self.sum / n, 0.0) / (n - ddof)
+
+    def std(self, ddof: int = 0) -> float:
+        return math.sqrt(self.var(ddof))
+
+    def log_return_mean(self) -> float:
+        n = len(self.samples) - 1
+        return self.ret_sum / n if n > 0 else math.nan
+
+    def log_return_std(self, ddof: int = 0) -> float:
+        """Std of log returns between consecutive samples (np.std(np.diff(np.log(x))) for ddof=0)."""
+        n = len(self.samples) - 1
+        if n - ddof <= 0:
+            return math.nan
+        var = max(self.ret_sumsq - self.ret_sum * self.ret_sum / n, 0.0) / (n - ddof)
+        return math.sqrt(var)
+
+    def values(self) -> np.ndarray:
+        return np.fromiter((v for _, v, _ in self.samples), dtype=np.float64, count=len(self.samples))
+
+    def timestamps(self) -> np.ndarray:
+        return np.fromiter((t for t, _, _ in self.samples), dtype=np.float64, count=len(self.samples))
@@ -0,0 +1,147 @@
+# settlement.py
+"""Kalshi settlement-average tracker
+=================================
+KXBTC / KXBTCD settle on the simple average of the 60 one-second BRTI values
+before expiry, not on the last price or on the last 60 price changes.
+`SettlementTracker` samples whatever ticks arrive onto that per-second grid.
+A grid second takes the last price at or before it, so sticky prices are
+forward-filled.
+
+From the grid the tracker keeps:
+
+  * `average()` – the trailing 60 s grid average, i.e. what the contract
+                  would settle on if it expired now.
+  * `project(expiry)` – the expected settlement average and its standard
+                  deviation. Seconds of the settlement window already
+                  printed are fixed. The rest follow a driftless random walk
+                  from the current price, with per-second variance taken
+                  from realized grid returns or from a supplied annual vol.
+
+`Projection.prob_above` / `prob_between` turn that into a YES probability
+(normal approximation) for pricing.
+"""
+
+from __future__ import annotations
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from rolling import RollingWindow
+
+WINDOW_S = 60              # settlement averages the last 60 one-second prints
+VOL_WINDOW_S = 600         # grid seconds used for the realized per-second vol
+SECONDS_PER_YEAR = 31_536_000
+
+
+def next_expiry(now: Optional[float] = None) -> float:
+    """Unix time of the next top of the hour (hourly KXBTC / KXBTCD close)."""
+    now = time.time() if now is None else now
+    return (math.floor(now / 3600) + 1) * 3600.0
+
+
+@dataclass(slots=True)
+class Projection:
+    mean: float        # expected settlement average
+    std: float         # standard deviation of the settlement average
+    observed: int      # settlement-window seconds already printed
+    remaining: int     # settlement-window seconds still to come
+
+    def prob_above(self, strike: float) -> float:
+        """P(settlement average > strike)."""
+        if not self.std > 0:
+            return 1.0 if self.mean > strike else 0.0
+        return 0.5 * math.erfc((strike - self.mean) / (self.std * math.sqrt(2)))
+
+    def prob_between(self, low: float, high: float) -> float:
+        """P(low ≤ settlement average ≤ high), for range (KXBTC) markets."""
+        return max(self.prob_above(low) - self.prob_above(high), 0.0)
+
+    def to_dict(self) -> dict:
+        return {'mean': self.mean, 'std': self.std, 'observed': self.observed, 'remaining': self.remaining}
+
+
+class SettlementTracker:
+    def __init__(self, window_s: int = WINDOW_S, vol_window_s: int = VOL_WINDOW_S):
+        self.window_s = window_s
+        self.grid = RollingWindow(size=window_s)                   # trailing settlement average
+        self.vol = RollingWindow(size=max(vol_window_s, window_s))  # per-second returns / history
+        self.price: Optional[float] = None
+        self.last_sec: Optional[int] = None   # last grid second filled
+        self.lock = threading.Lock()
+
+    # ------------- updates -------------
+    def update(self, price: float, ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        with self.lock:
+            if self.price is None:
+                self.last_sec = math.floor(ts)  # that second's value predates us
+            else:
+                self._advance(ts)  # seconds up to this tick still carried the old price
+            self.price = float(price)
+
+    def advance(self, now: Optional[float] = None):
+        """Forward-fill the grid up to `now` (done by every query)."""
+        with self.lock:
+            self._advance(time.time() if now is None else now)
+
+    def _advance(self, now: float):
+        if self.price is None:
+            return
+        now_sec = math.floor(now)
+        # after a long gap only the seconds still inside the vol window matter
+        first = max(self.last_sec + 1, now_sec - self.vol.size + 1)
+        for sec in range(first, now_sec + 1):
+            self.grid.append(self.price, sec)
+            self.vol.append(self.price, sec)
+        self.last_sec = max(self.last_sec, now_sec)
+
+    # ------------- queries -------------
+    def average(self, now: Optional[float] = None) -> Optional[float]:
+        """Trailing window_s grid average (the last price until a full second has printed)."""
+        self.advance(now)
+        return self.grid.mean() if len(self.grid) else self.price
+
+    def second_vol(self) -> float:
+        """Realized std of one-second log returns on the grid (nan until two seconds)."""
+        return self.vol.log_return_std(ddof=1)
+
+    def project(self, expiry_ts: Optional[float] = None, now: Optional[float] = None,
+                sigma_annual: Optional[float] = None) -> Optional[Projection]:
+        """
+        Settlement average for the window ending at `expiry_ts` (default: next
+        top of the hour). `sigma_annual` (e.g. an implied vol) overrides the
+        realized per-second vol.
+        """
+        now = time.time() if now is None else now
+        expiry_ts = next_expiry(now) if expiry_ts is None else expiry_ts
+        with self.lock:
+            self._advance(now)
+            if self.price is None:
+                return None
+            price = self.price
+            end = math.floor(expiry_ts)
+            start = end - self.window_s   # settlement window is seconds (start, end]
+            now_sec = math.floor(now)
+            observed = min(max(now_sec - start, 0), self.window_s)
+            # the vol window keeps the longer history, so a just-expired window is still whole
+            values = [v for sec, v, _ in self.vol.samples if start < sec <= end]
+            observed_sum = sum(values)
+            # seconds we have no print for (tracker started mid-window) count at the current price
+            observed_sum += (observed - len(values)) * price
+            ret_std = self.second_vol()
+
+        remaining = self.window_s - observed
+        mean = (observed_sum + remaining * price) / self.window_s
+
+        if sigma_annual is not None:
+            var_s = price * price * sigma_annual * sigma_annual / SECONDS_PER_YEAR
+        else:
+            var_s = price * price * ret_std * ret_std if ret_std == ret_std else 0.0
+        # Σ of the remaining prints of a random walk that starts `gap` seconds from now:
+        # every step before the window hits all m prints, step r into it hits m - r + 1
+        gap = max(start - now_sec, 0)
+        m = remaining
+        var_sum = var_s * (gap * m * m + m * (m + 1) * (2 * m + 1) / 6)
+        return Projection(mean, math.sqrt(var_sum) / self.window_s, observed, remaining)
@@ -0,0 +1,357 @@
+# shm_store.py
+"""Shared-memory live store for Kalshi books and the BRTI price
+==============================================================
+One process owns the live data and writes it into a named shared-memory
+segment; any number of local readers attach to the same segment and get NumPy
+views straight onto it (no HTTP, no socket.io JSON, no copies).
+
+Two segments, each with exactly one writer:
+
+  * `BookStore`  – (capacity, 100) YES-terms bid / ask arrays in the same
+                   layout as `kalshi_book.EventBooks`, plus tickers and best
+                   bid / ask per market.
+  * `PriceStore` – latest BRTI / simple average / timestamp and a ring of the
+                   last `ring_size` (timestamp, price) ticks.
+
+Consistency uses a seqlock: the writer bumps the sequence to odd before
+writing and back to even after. Readers call `read(fn)`, which runs `fn` on
+the live views and retries if the sequence moved underneath it – so `fn`
+should copy out whatever it wants to keep. A retry yields the CPU first and
+backs off if the writer keeps getting in the way. Row numbers come from the
+market list, so `BookStore.read_rows(fn)` also checks that the list (its
+LAYOUT counter) didn't change between building the index and the read.
+
+A restarted writer unlinks the old segment and creates a new one under the
+same name, so readers check at most every REATTACH_S that the name still
+points at the segment they mapped and re-attach if it doesn't.
+
+`live_book(ticker)` is the one-call reader for consumers that can fall back
+to REST: a market's (bids, asks) from the live store, or None.
+"""
+
+from __future__ import annotations
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+import numpy as np
+
+from kalshi_book import N_LEVELS, NO_BID, NO_ASK, SIZE_DTYPE, KalshiBook
+
+BOOKS_NAME = "kalshi_books"
+PRICE_NAME = "brti_price"
+TICKER_LEN = 48
+HEADER_LEN = 8              # int64 slots
+MAX_READ_RETRIES = 1000
+MAX_LAYOUT_RETRIES = 10     # read_rows: re-index at most this often before giving up
+SPIN_RETRIES = 10           # retries that only yield before backing off
+BACKOFF_S = 0.0001
+REATTACH_S = 1.0
+STALE_S = 5.0               # live_book: ignore a store the writer hasn't touched for this long
+
+# header slots
+SEQ, COUNT, CAPACITY, LAYOUT, UPDATED_NS, WRITER_ID = 0, 1, 2, 3, 4, 5
+
+T = TypeVar("T")
+
+
+def _open(name: str, create: bool, size: int = 0) -> shared_memory.SharedMemory:
+    if create:
+        try:
+            old = shared_memory.SharedMemory(name=name)
+            old.close()
+            old.unlink()  # stale segment from a crashed writer
+        except FileNotFoundError:
+            pass
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # readers must not unlink the writer's segment when they exit
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+        return shm
+
+
+class _Segment:
+    """Header handling, the seqlock and re-attaching shared by both stores."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, writer: bool):
+        self.shm = shm
+        self.writer = writer
+        self.name = shm.name
+        self.next_check = time.monotonic() + REATTACH_S
+        self.header = np.ndarray((HEADER_LEN,), dtype=np.int64, buffer=shm.buf)
+        if writer:
+            self.header[:] = 0
+            self.header[WRITER_ID] = time.time_ns()
+
+    def _map(self):
+        """(Re)build the array views onto self.shm."""
+        raise NotImplementedError
+
+    @property
+    def seq(self) -> int:
+        return int(self.header[SEQ])
+
+    def _begin(self):
+        self.header[SEQ] += 1     # odd: write in progress
+
+    def _end(self):
+        self.header[UPDATED_NS] = time.time_ns()
+        self.header[SEQ] += 1     # even: consistent
+
+    def read(self, fn: Callable[[], T], max_retries: int = MAX_READ_RETRIES) -> T:
+        self.check_writer()
+        for attempt in range(max_retries):
+            before = int(self.header[SEQ])
+            if not before & 1:
+                result = fn()
+                if int(self.header[SEQ]) == before:
+                    return result
+            # let the writer finish instead of spinning against it
+            time.sleep(0 if attempt < SPIN_RETRIES else BACKOFF_S)
+        raise RuntimeError(f"{self.name}: could not get a consistent read")
+
+    def check_writer(self):
+        """Re-attach if a restarted writer replaced the segment. Readers only, at most every REATTACH_S."""
+        if self.writer or time.monotonic() < self.next_check:
+            return
+        self.next_check = time.monotonic() + REATTACH_S
+        try:
+            shm = _open(self.name, create=False)
+        except FileNotFoundError:
+            return  # writer gone and not back yet: keep the last data
+        if np.ndarray((HEADER_LEN,), dtype=np.int64, buffer=shm.buf)[WRITER_ID] == self.header[WRITER_ID]:
+            shm.close()
+            return
+        print(f"🔁 {self.name}: writer restarted, re-attaching")
+        self._drop_views()
+        self.shm.close()
+        self.shm = shm
+        self.header = np.ndarray((HEADER_LEN,), dtype=np.int64, buffer=shm.buf)
+        self._map()
+
+    def updated_ns(self) -> int:
+        return int(self.header[UPDATED_NS])
+
+    def _drop_views(self):
+        # views must go before their mapping is closed
+        for attr in list(vars(self)):
+            if isinstance(getattr(self, attr), np.ndarray):
+                setattr(self, attr, None)
+
+    def close(self):
+        self._drop_views()
+        self.shm.close()
+        if self.writer:
+            self.shm.unlink()
+
+
+class BookStore(_Segment):
+    def __init__(self, name: str = BOOKS_NAME, capacity: int = 256, create: bool = False):
+        size = HEADER_LEN * 8
+        if create:
+            size += capacity * (TICKER_LEN + 2 * N_LEVELS * 8 + 2 * 2)
+        super().__init__(_open(name, create, size), writer=create)
+        if create:
+            self.header[CAPACITY] = capacity
+        self._map()
+
+    def _map(self):
+        capacity = int(self.header[CAPACITY])
+        buf = self.shm.buf
+        offset = HEADER_LEN * 8
+        self.tickers = np.ndarray((capacity,), dtype=f"S{TICKER_LEN}", buffer=buf, offset=offset)
+        offset += capacity * TICKER_LEN
+        self.bids = np.ndarray((capacity, N_LEVELS), dtype=SIZE_DTYPE, buffer=buf, offset=offset)
+        offset += capacity * N_LEVELS * 8
+        self.asks = np.ndarray((capacity, N_LEVELS), dtype=SIZE_DTYPE, buffer=buf, offset=offset)
+        offset += capacity * N_LEVELS * 8
+        self.best = np.ndarray((capacity, 2), dtype=np.int16, buffer=buf, offset=offset)
+
+        # a new writer starts its layout count over
+        self._layout = -1
+        self._index: Dict[str, int] = {}
+
+    @classmethod
+    def create(cls, name: str = BOOKS_NAME, capacity: int = 256) -> "BookStore":
+        return cls(name, capacity, create=True)
+
+    @classmethod
+    def attach(cls, name: str = BOOKS_NAME) -> "BookStore":
+        return cls(name)
+
+    # ------------- writer -------------
+    def set_markets(self, tickers: Iterable[str]):
+        """Replace the market list (e.g. on an event roll). Rows are cleared."""
+        tickers = list(tickers)
+        self._check_capacity(tickers)
+        self._begin()
+        self._set_markets(tickers)
+        self._end()
+
+    def _check_capacity(self, tickers: List[str]):
+        if len(tickers) > len(self.tickers):
+            raise ValueError(f"{len(tickers)} markets exceed store capacity {len(self.tickers)}")
+
+    def _set_markets(self, tickers: List[str]):
+        # inside a seqlock section
+        self.tickers[:] = b""
+        self.tickers[:len(tickers)] = [t.encode() for t in tickers]
+        self.bids[:] = 0
+        self.asks[:] = 0
+        self.best[:] = (NO_BID, NO_ASK)
+        self.header[COUNT] = len(tickers)
+        self.header[LAYOUT] += 1
+
+    def write_book(self, ticker: str, book: KalshiBook):
+        i = self.index()[ticker]
+        self._begin()
+        self.bids[i] = book.bids
+        self.asks[i] = book.asks
+        self.best[i] = (book.best_bid, book.best_ask)
+        self._end()
+
+    def write_event(self, event_books):
+        """Copy every row of an `EventBooks`, and the market list if it changed, in one seqlock section."""
+        tickers = list(event_books.tickers)
+        relayout = tickers != self.market_list()
+        if relayout:
+            self._check_capacity(tickers)
+        n = len(event_books)
+        self._begin()
+        if relayout:
+            self._set_markets(tickers)
+        self.bids[:n] = event_books.bids
+        self.asks[:n] = event_books.asks
+        self.best[:n, 0] = event_books.best_bids()
+        self.best[:n, 1] = event_books.best_asks()
+        self._end()
+
+    # ------------- reader -------------
+    def market_list(self) -> List[str]:
+        n = int(self.header[COUNT])
+        return [t.decode() for t in self.tickers[:n]]
+
+    def index(self) -> Dict[str, int]:
+        """ticker -> row, rebuilt when the writer changes the market list."""
+        self.check_writer()
+        if int(self.header[LAYOUT]) != self._layout:
+            layout, tickers = self.read(lambda: (int(self.header[LAYOUT]), self.market_list()))
+            self._index = {t: i for i, t in enumerate(tickers)}
+            self._layout = layout
+        return self._index
+
+    def read_rows(self, fn: Callable[[Dict[str, int]], T], max_retries: int = MAX_LAYOUT_RETRIES) -> T:
+        """
+        `read(fn(index))` that is also consistent with the market list: if the
+        writer re-laid out the rows after `index` was built, re-index and retry.
+        """
+        def _read(index):
+            try:
+                return int(self.header[LAYOUT]), fn(index), None
+            except KeyError as e:
+                return int(self.header[LAYOUT]), None, e   # may only be missing from a stale index
+
+        for _ in range(max_retries):
+            index = self.index()
+            layout = self._layout
+            current, result, missing = self.read(lambda: _read(index))
+            if current == layout:
+                if missing is not None:
+                    raise missing
+                return result
+        raise RuntimeError(f"{self.name}: market list kept changing during the read")
+
+    def book(self, ticker: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Consistent copy of one market's (bids, asks). KeyError if the store doesn't track it."""
+        def _book(index):
+            i = index[ticker]
+            return self.bids[i].copy(), self.asks[i].copy()
+        return self.read_rows(_book)
+
+    def top_of_book(self) -> Dict[str, Tuple[int, int]]:
+        def _top():
+            n = int(self.header[COUNT])
+            return self.market_list(), self.best[:n].copy()
+        tickers, best = self.read(_top)
+        return {t: (int(b), int(a)) for t, (b, a) in zip(tickers, best)}
+
+
+class PriceStore(_Segment):
+    # float slots after the header
+    PRICE, SMA, TS = 0, 1, 2
+
+    def __init__(self, name: str = PRICE_NAME, ring_size: int = 4096, create: bool = False):
+        size = HEADER_LEN * 8
+        if create:
+            size += 3 * 8 + ring_size * 2 * 8
+        super().__init__(_open(name, create, size), writer=create)
+        if create:
+            self.header[CAPACITY] = ring_size
+        self._map()
+        if create:
+            self.latest[:] = np.nan
+
+    def _map(self):
+        ring_size = int(self.header[CAPACITY])
+        offset = HEADER_LEN * 8
+        self.latest = np.ndarray((3,), dtype=np.float64, buffer=self.shm.buf, offset=offset)
+        offset += 3 * 8
+        self.ring = np.ndarray((ring_size, 2), dtype=np.float64, buffer=self.shm.buf, offset=offset)
+
+    @classmethod
+    def create(cls, name: str = PRICE_NAME, ring_size: int = 4096) -> "PriceStore":
+        return cls(name, ring_size, create=True)
+
+    @classmethod
+    def attach(cls, name: str = PRICE_NAME) -> "PriceStore":
+        return cls(name)
+
+    # ------------- writer -------------
+    def write_price(self, price: float, sma: float, ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        n = int(self.header[COUNT])
+        self._begin()
+        self.latest[:] = (price, sma, ts)
+        self.ring[n % len(self.ring)] = (ts, price)
+        self.header[COUNT] = n + 1
+        self._end()
+
+    # ------------- reader -------------
+    def latest_price(self) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+        """(brti, simple_average, unix timestamp), Nones before the first tick."""
+        price, sma, ts = self.read(lambda: tuple(float(x) for x in self.latest))
+        if np.isnan(price):
+            return None, None, None
+        return price, sma, ts
+
+    def history(self, n: Optional[int] = None) -> np.ndarray:
+        """Last n (timestamp, price) rows, oldest first."""
+        def _hist():
+            count = int(self.header[COUNT])
+            size = len(self.ring)
+            k = min(count, size) if n is None else min(n, count, size)
+            idx = np.arange(count - k, count) % size
+            return self.ring[idx].copy()
+        return self.read(_hist)
+
+
+_book_store: Optional[BookStore] = None
+
+def live_book(ticker: str, stale_s: float = STALE_S) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    (bids, asks) copies for `ticker` from the live BookStore, or None if no
+    writer is running, it hasn't written for `stale_s` or doesn't track the market.
+    """
+    global _book_store
+    try:
+        if _book_store is None:
+            _book_store = BookStore.attach()
+        book = _book_store.book(ticker)
+        if time.time_ns() - _book_store.updated_ns() > stale_s * 1e9:
+            return None
+        return book
+    except (FileNotFoundError, KeyError, RuntimeError):
+        return None
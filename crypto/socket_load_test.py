@@ -0,0 +1,161 @@
+# socket_load_test.py
+"""Tick → client latency under load
+================================
+Runs the chain server's socket stack (aio_server + Wire + SubscriptionHub +
+ChainPipeline) in a subprocess with a synthetic build: TICK_HZ price ticks,
+a REST_MS sleep standing in for the Kalshi fan-out, and the 8-contract chain
+payload from wire.py's benchmark with a few fields changing every tick. Then
+it connects 1, 10 and 50 socket.io clients that reassemble the delta stream,
+and measures ingest → reassembled-on-client latency from the `tick_ns` stamp
+the tick source takes as it submits each tick to the pipeline.
+
+    python socket_load_test.py [json|msgpack]
+
+Prints one row per client count with exact percentiles, the mean above the
+simulated REST time (the socket stack's share), and the server's own
+ingest → emitted p99 from its /pipeline route (a log2 bucket bound).
+"""
+
+from __future__ import annotations
+import asyncio
+import copy
+import multiprocessing as mp
+import sys
+import time
+
+import aiohttp
+import numpy as np
+import socketio
+
+from chain_stream import ChainReassembler, STREAM_EVENT
+from wire import decode
+
+CLIENT_COUNTS = (1, 10, 50)
+TICK_HZ = 10
+REST_MS = 30          # simulated Kalshi round trip per build
+WARMUP_S = 3
+DURATION_S = 20
+PORT = 5099
+
+
+# ------------- server (subprocess) -------------
+def _serve(port: int):
+    from aio_server import make_server, serve, query_arg, background
+    from chain_pipeline import ChainPipeline
+    from subscriptions import SubscriptionHub
+    from wire import Wire, _bench_payloads
+
+    base = next(p for name, p in _bench_payloads().items() if 'snapshot' in name)['payload']
+    sio, app = make_server({'/pipeline': lambda: pipeline.stats()})
+    wire = Wire(sio)
+    hub = SubscriptionHub(wire)
+
+    @sio.on('connect')
+    async def handle_connect(sid, environ, auth=None):
+        await wire.connect(sid, query_arg(environ, 'encoding'))
+        await hub.subscribe(sid)
+
+    @sio.on('disconnect')
+    async def handle_disconnect(sid, *args):
+        await hub.unsubscribe(sid)
+        wire.disconnect(sid)
+
+    async def build(price, timestamp):
+        tick_ns = int(timestamp)    # stamped by ticks() at submit
+        await asyncio.sleep(REST_MS / 1000)
+        payload = copy.copy(base)
+        payload['contracts'] = [dict(c) for c in base['contracts']]
+        i = int(price) % len(payload['contracts'])
+        payload['contracts'][i]['best_bid'] = int(price) % 50
+        payload.update(brti=price, timestamp=str(tick_ns / 1e9), tick_ns=tick_ns)
+        return payload
+
+    pipeline = ChainPipeline(build=build, emit=hub.publish, name="load test", stats_s=3600)
+
+    async def ticks():
+        price = 118_000.0
+        while True:
+            price += 1
+            pipeline.submit(price, str(time.time_ns()))
+            await asyncio.sleep(1 / TICK_HZ)
+
+    async def main():
+        pipeline.start()
+        hub.start()
+        background(ticks(), "ticks")
+        await serve(app, port=port)
+
+    asyncio.run(main())
+
+
+# ------------- clients -------------
+async def _run_clients(n: int, encoding: str, port: int) -> np.ndarray:
+    """Latency (ms) of every update every client reassembled during the run."""
+    samples = []
+    measuring = False
+    clients = []
+
+    for _ in range(n):
+        client = socketio.AsyncClient()
+        chain = ChainReassembler()
+
+        async def on_stream(msg, chain=chain):
+            payload = chain.apply(decode(msg))
+            if payload is not None and measuring and 'tick_ns' in payload:
+                samples.append((time.time_ns() - payload['tick_ns']) / 1e6)
+
+        client.on(STREAM_EVENT, on_stream)
+        await client.connect(f"http://127.0.0.1:{port}?encoding={encoding}", transports=["websocket"])
+        clients.append(client)
+
+    await asyncio.sleep(WARMUP_S)
+    measuring = True
+    await asyncio.sleep(DURATION_S)
+    measuring = False
+    for client in clients:
+        await client.disconnect()
+    return np.asarray(samples)
+
+
+async def _pipeline_stats(port: int) -> dict:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"http://127.0.0.1:{port}/pipeline") as response:
+            return await response.json()
+
+
+async def _wait_for_server(port: int, timeout_s: float = 15):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            return await _pipeline_stats(port)
+        except aiohttp.ClientError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"load test server did not come up on port {port}")
+
+
+def main(encoding: str = "json"):
+    print(f"🚦 {TICK_HZ} ticks/s, {REST_MS} ms simulated REST, {DURATION_S}s per run, encoding={encoding}")
+    rows = []
+    for n in CLIENT_COUNTS:
+        server = mp.get_context("spawn").Process(target=_serve, args=(PORT,), daemon=True)
+        server.start()
+        try:
+            asyncio.run(_wait_for_server(PORT))
+            ms = asyncio.run(_run_clients(n, encoding, PORT))
+            server_e2e = asyncio.run(_pipeline_stats(PORT))['stages']['ingest → emitted']
+        finally:
+            server.terminate()
+            server.join()
+        rows.append((n, ms, server_e2e))
+        print(f"   {n} clients: {len(ms)} updates")
+
+    print(f"\n{'clients':>8} {'updates':>8} {'mean ms':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+          f" {'over REST':>10} {'server p99≤':>12}")
+    for n, ms, e2e in rows:
+        p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+        print(f"{n:>8} {len(ms):>8} {ms.mean():>8.1f} {p50:>8.1f} {p90:>8.1f} {p99:>8.1f} {ms.max():>8.1f}"
+              f" {ms.mean() - REST_MS:>10.1f} {e2e['p99_us'] / 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "json")
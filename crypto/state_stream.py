@@ -0,0 +1,251 @@
+# state_stream.py
+"""Coalesced, delta-encoded state publishing
+=========================================
+test_trading.py used to build its whole `dashboard_update` dict (every
+per-ticker map plus `trade_log[-100:]`) and emit it from inside the chain
+stream callback on every upstream tick. `StatePublisher` takes that off the
+trading path:
+
+  * the callback only calls `touch()` – marks the state dirty, O(1), never
+    waits on a socket.
+  * a task wakes `rate_hz` times a second and, if anything was touched,
+    calls `build()` once, diffs the result against what was last sent and
+    emits only the difference. Touches in between are coalesced.
+
+`StateEncoder` numbers the messages like chain_stream.py does:
+
+  * snapshot – {'type': 'snapshot', 'seq', 'state'}: sent every SNAPSHOT_EVERY
+               messages, to each client on connect, and on resync.
+  * delta    – {'type': 'delta', 'seq', ...} with any of
+      set     {key: value}            top-level values replaced whole
+      merge   {key: {sub: value}}     changed entries of dict values (per ticker)
+      drop    {key: [sub, ...]}       entries gone from dict values
+      append  {key: {'trim', 'items'}} list windows such as the trade log: drop
+                                      `trim` from the front, add `items` at the end
+      unset   [key, ...]              top-level keys gone
+
+A state that hasn't changed since the last message isn't sent at all.
+`StateReassembler` (and the mm-dashboard's src/dashboardStream.js) rebuild
+the full dict; on a seq gap they ask for a resync and wait for a snapshot.
+Bytes sent vs the full state, build + diff time and coalesced ticks are
+printed every STATS_S.
+"""
+
+from __future__ import annotations
+import asyncio
+import copy
+import json
+import time
+from typing import Callable, Optional
+
+from aio_server import background
+
+SNAPSHOT_EVERY = 100
+RATE_HZ = 4.0
+STATS_S = 60
+_MISSING = object()
+
+
+def _json_size(obj) -> int:
+    return len(json.dumps(obj, separators=(',', ':'), default=str))
+
+
+def _diff_window(old: list, new: list) -> Optional[dict]:
+    """{'trim', 'items'} if `new` is `old` with `trim` items dropped from the front and `items` added."""
+    if not old or not new:
+        return None
+    for trim, item in enumerate(old):
+        keep = len(old) - trim
+        if item == new[0] and keep <= len(new) and old[trim:] == new[:keep]:
+            return {'trim': trim, 'items': new[keep:]}
+    return None
+
+
+class StateEncoder:
+    """Turns successive state dicts into snapshot / delta messages (see module doc)."""
+
+    def __init__(self, snapshot_every: int = SNAPSHOT_EVERY):
+        self.snapshot_every = snapshot_every
+        self.seq = 0
+        self.state: Optional[dict] = None     # deep copy of what was last sent
+        self.since_snapshot = 0
+
+    def encode(self, state: dict) -> Optional[dict]:
+        """Message for `state`, or None if nothing changed since the last one."""
+        if self.state is None or self.since_snapshot + 1 >= self.snapshot_every:
+            self.seq += 1
+            self.since_snapshot = 0
+            msg = {'type': 'snapshot', 'seq': self.seq, 'state': state}
+        else:
+            delta = self._diff(state)
+            if not delta:
+                return None
+            self.seq += 1
+            self.since_snapshot += 1
+            msg = {'type': 'delta', 'seq': self.seq, **delta}
+        # a copy, so later in-place edits to the caller's dicts still show up as changes
+        self.state = copy.deepcopy(state)
+        return msg
+
+    def snapshot(self) -> Optional[dict]:
+        if self.state is None:
+            return None
+        return {'type': 'snapshot', 'seq': self.seq, 'state': self.state}
+
+    def _diff(self, state: dict) -> dict:
+        delta = {}
+        for key, value in state.items():
+            old = self.state.get(key, _MISSING)
+            if old == value:
+                continue
+            if isinstance(value, dict) and isinstance(old, dict):
+                merge = {k: v for k, v in value.items() if old.get(k, _MISSING) != v}
+                drop = [k for k in old if k not in value]
+                if merge:
+                    delta.setdefault('merge', {})[key] = merge
+                if drop:
+                    delta.setdefault('drop', {})[key] = drop
+                continue
+            if isinstance(value, list) and isinstance(old, list):
+                window = _diff_window(old, value)
+                if window is not None and len(window['items']) < len(value):
+                    delta.setdefault('append', {})[key] = window
+                    continue
+            delta.setdefault('set', {})[key] = value
+        unset = [key for key in self.state if key not in state]
+        if unset:
+            delta['unset'] = unset
+        return delta
+
+
+class StateReassembler:
+    """
+    Rebuilds the state from the stream. `apply(msg)` returns the current state
+    after applying msg, or None if there's nothing new (stale message, or
+    waiting for a snapshot after a gap).
+    """
+
+    def __init__(self, on_gap: Optional[Callable[[], None]] = None):
+        self.on_gap = on_gap
+        self.seq: Optional[int] = None
+        self.state: Optional[dict] = None
+
+    def reset(self):
+        self.seq = None
+        self.state = None
+
+    def apply(self, msg: dict) -> Optional[dict]:
+        if msg['type'] == 'snapshot':
+            if self.state is not None and msg['seq'] <= self.seq:
+                return None
+            self.state = copy.deepcopy(msg['state'])
+            self.seq = msg['seq']
+            return self.state
+
+        if self.state is None or msg['seq'] <= self.seq:
+            return None
+        if msg['seq'] != self.seq + 1:
+            self.state = None
+            if self.on_gap is not None:
+                self.on_gap()
+            return None
+
+        state = self.state
+        state.update(msg.get('set', {}))
+        for key, entries in msg.get('merge', {}).items():
+            state.setdefault(key, {}).update(entries)
+        for key, gone in msg.get('drop', {}).items():
+            for k in gone:
+                state.get(key, {}).pop(k, None)
+        for key, window in msg.get('append', {}).items():
+            state[key] = state.get(key, [])[window['trim']:] + window['items']
+        for key in msg.get('unset', ()):
+            state.pop(key, None)
+        self.seq = msg['seq']
+        return state
+
+
+class StatePublisher:
+    """
+    Emits `build()` as a coalesced snapshot + delta stream on `event`, at most
+    `rate_hz` times a second and only after a `touch()`. `full_event`, if
+    given, also gets the whole state at the same rate for clients that
+    haven't moved to the stream.
+    """
+
+    def __init__(self, wire, build: Callable[[], dict], event: str, rate_hz: float = RATE_HZ,
+                 full_event: Optional[str] = None, name: str = "state", stats_s: float = STATS_S):
+        self.wire = wire
+        self.build = build
+        self.event = event
+        self.rate_hz = rate_hz
+        self.full_event = full_event
+        self.name = name
+        self.stats_s = stats_s
+        self.encoder = StateEncoder()
+        self.dirty = False
+
+        # metrics since the last report
+        self.last_stats = time.time()
+        self.touches = self.published = self.unchanged = 0
+        self.sent_bytes = self.full_bytes = 0
+        self.build_s = 0.0
+
+    def touch(self):
+        """The state changed. Cheap, call it from the hot path."""
+        self.dirty = True
+        self.touches += 1
+
+    def start(self):
+        """Start the publish task; call from inside the running loop."""
+        background(self._loop(), f"{self.name} publisher")
+        return self
+
+    async def send_snapshot(self, sid: str):
+        snapshot = self.encoder.snapshot()
+        if snapshot is not None:
+            await self.wire.emit(self.event, snapshot, to=sid)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(1 / self.rate_hz)
+            if self.dirty:
+                self.dirty = False
+                await self._publish()
+            if time.time() - self.last_stats >= self.stats_s:
+                self._print_stats()
+
+    async def _publish(self):
+        start = time.perf_counter()
+        state = self.build()
+        msg = self.encoder.encode(state)
+        self.build_s += time.perf_counter() - start
+        if msg is None:
+            self.unchanged += 1
+            return
+        self.published += 1
+        self.sent_bytes += _json_size(msg)
+        self.full_bytes += _json_size(state)
+        await self.wire.emit(self.event, msg)
+        if self.full_event is not None:
+            await self.wire.emit(self.full_event, state)
+
+    # ------------- metrics -------------
+    def stats(self) -> dict:
+        return {
+            'touches': self.touches,
+            'published': self.published,
+            'unchanged': self.unchanged,
+            'coalesced': max(self.touches - self.published - self.unchanged, 0),
+            'bytes_per_update': round(self.sent_bytes / self.published) if self.published else None,
+            'full_bytes_per_update': round(self.full_bytes / self.published) if self.published else None,
+            'build_diff_ms': round(self.build_s / (self.published + self.unchanged) * 1000, 3)
+                             if self.published + self.unchanged else None,
+        }
+
+    def _print_stats(self):
+        print(f"[STATS] {self.name} publisher: {self.stats()}")
+        self.last_stats = time.time()
+        self.touches = self.published = self.unchanged = 0
+        self.sent_bytes = self.full_bytes = 0
+        self.build_s = 0.0
@@ -0,0 +1,217 @@
+# subscriptions.py
+"""Per-client chain subscriptions
+==============================
+By default every chain-server client gets every contract and field at the
+full tick rate. A client can narrow that by emitting SUBSCRIBE_EVENT:
+
+    {'tickers': ['B118250', ...],     # exact tickers or their last '-' segment; [] = none, omit = all
+     'strike_min': 117000, 'strike_max': 119000,   # strike (or bottom-top range) overlaps this
+     'fields': ['best_bid', 'best_ask'],           # contract fields besides ticker; omit = all
+     'max_hz': 1}                                  # at most this many updates per second; omit = every tick
+
+Clients with the same subscription share a room. `SubscriptionHub.publish`
+filters each payload once per room and runs it through that room's own
+`ChainEncoder`, so each room gets its own snapshot + delta stream. It then
+emits once per encoding in the room (see wire.py). Throttled rooms coalesce:
+ticks inside the room's interval replace each other, and the newest one is
+sent when the interval is up. Everything runs on the server's asyncio loop.
+"""
+
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from aio_server import background
+from chain_stream import ChainEncoder, STREAM_EVENT
+
+SUBSCRIBE_EVENT = "subscribe"
+FLUSH_S = 0.05          # how often throttled rooms are checked for a due update
+MAX_HZ_CAP = 50.0
+
+
+def _strike_bounds(strike) -> Optional[Tuple[float, float]]:
+    """(low, high) for an int strike (KXBTCD) or a 'bottom-top' range (KXBTC)."""
+    try:
+        if isinstance(strike, str) and '-' in strike:
+            bottom, top = strike.split('-', 1)
+            return float(bottom), float(top)
+        return float(strike), float(strike)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class Subscription:
+    tickers: Optional[Tuple[str, ...]] = None
+    strike_min: Optional[float] = None
+    strike_max: Optional[float] = None
+    fields: Optional[Tuple[str, ...]] = None
+    max_hz: Optional[float] = None
+
+    @classmethod
+    def from_request(cls, spec: Optional[dict]) -> "Subscription":
+        spec = spec or {}
+
+        def opt_tuple(key):
+            v = spec.get(key)
+            return None if v is None else tuple(sorted(str(x) for x in v))
+
+        def opt_float(key):
+            v = spec.get(key)
+            return None if v is None else float(v)
+
+        max_hz = opt_float('max_hz')
+        if max_hz is not None:
+            max_hz = min(max_hz, MAX_HZ_CAP) if max_hz > 0 else None
+        return cls(opt_tuple('tickers'), opt_float('strike_min'), opt_float('strike_max'),
+                   opt_tuple('fields'), max_hz)
+
+    @property
+    def key(self) -> str:
+        blob = json.dumps([self.tickers, self.strike_min, self.strike_max, self.fields, self.max_hz])
+        return "sub:" + hashlib.sha1(blob.encode()).hexdigest()[:12]
+
+    @property
+    def filters(self) -> bool:
+        """Whether anything besides the rate is restricted."""
+        return not (self.tickers is None and self.strike_min is None and self.strike_max is None
+                    and self.fields is None)
+
+    def to_dict(self) -> dict:
+        return {'tickers': self.tickers, 'strike_min': self.strike_min, 'strike_max': self.strike_max,
+                'fields': self.fields, 'max_hz': self.max_hz}
+
+    def _wants(self, contract: dict) -> bool:
+        if self.tickers is not None:
+            ticker = contract.get('ticker', '')
+            if ticker not in self.tickers and ticker.rsplit('-', 1)[-1] not in self.tickers:
+                return False
+        if self.strike_min is not None or self.strike_max is not None:
+            bounds = _strike_bounds(contract.get('strike'))
+            if bounds is None:
+                return False
+            low, high = bounds
+            if self.strike_min is not None and high < self.strike_min:
+                return False
+            if self.strike_max is not None and low > self.strike_max:
+                return False
+        return True
+
+    def filter(self, payload: dict) -> dict:
+        if not self.filters:
+            return payload
+        contracts = [c for c in payload.get('contracts', []) if self._wants(c)]
+        if self.fields is not None:
+            keep = set(self.fields) | {'ticker'}
+            contracts = [{k: v for k, v in c.items() if k in keep} for c in contracts]
+        return {**payload, 'contracts': contracts}
+
+
+@dataclass
+class Room:
+    sub: Subscription
+    encoder: ChainEncoder = field(default_factory=ChainEncoder)
+    members: set = field(default_factory=set)
+    pending: Optional[dict] = None
+    next_due: float = 0.0
+    sent: int = 0
+    coalesced: int = 0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)   # keeps a room's seq order on the wire
+
+
+class SubscriptionHub:
+    """Rooms of clients that share a subscription, each with its own delta stream and rate."""
+
+    def __init__(self, wire, event: str = STREAM_EVENT):
+        self.wire = wire
+        self.event = event
+        self.rooms: Dict[str, Room] = {}
+        self.client_room: Dict[str, str] = {}   # sid -> room key
+        self.latest: Optional[dict] = None
+
+    def start(self):
+        """Start the flush task; call from inside the running loop."""
+        background(self._flush_loop(), "subscription flush")
+        return self
+
+    # ------------- membership -------------
+    async def subscribe(self, sid: str, spec: Optional[dict] = None) -> dict:
+        """
+        Move a client to the room for `spec` and send it that room's snapshot.
+        Returns the subscription as applied, with the room's `stream` id.
+        """
+        sub = Subscription.from_request(spec)
+        old = self.client_room.get(sid)
+        room = self.rooms.get(sub.key)
+        if room is None:
+            room = self.rooms[sub.key] = Room(sub)
+            if self.latest is not None:
+                room.encoder.encode(sub.filter(self.latest))  # start the new room's stream
+        room.members.add(sid)
+        self.client_room[sid] = sub.key
+        if old is not None and old != sub.key:
+            await self._leave(sid, old)
+        await self.wire.join(sid, sub.key)
+        await self.send_snapshot(sid)
+        return {**sub.to_dict(), 'stream': room.encoder.stream}
+
+    async def unsubscribe(self, sid: str):
+        key = self.client_room.pop(sid, None)
+        if key is not None:
+            await self._leave(sid, key)
+
+    async def _leave(self, sid: str, key: str):
+        room = self.rooms.get(key)
+        if room is None:
+            return
+        room.members.discard(sid)
+        if not room.members:
+            del self.rooms[key]
+        await self.wire.leave(sid, key)
+
+    async def send_snapshot(self, sid: str):
+        room = self.rooms.get(self.client_room.get(sid))
+        snapshot = room.encoder.snapshot() if room is not None else None
+        if snapshot is not None:
+            await self.wire.emit(self.event, snapshot, to=sid)
+
+    # ------------- publishing -------------
+    async def publish(self, payload: dict):
+        now = time.time()
+        self.latest = payload
+        for key, room in list(self.rooms.items()):
+            if room.sub.max_hz is None or now >= room.next_due:
+                await self._send(key, room, payload, now)
+            else:
+                if room.pending is not None:
+                    room.coalesced += 1
+                room.pending = payload
+
+    async def _send(self, key: str, room: Room, payload: Optional[dict], now: float):
+        """Send `payload` (None = whatever is pending) to the room."""
+        async with room.lock:
+            payload = payload if payload is not None else room.pending
+            if payload is None:
+                return  # already sent by publish
+            room.pending = None
+            if room.sub.max_hz is not None:
+                room.next_due = now + 1 / room.sub.max_hz
+            await self.wire.emit(self.event, room.encoder.encode(room.sub.filter(payload)), room=key)
+            room.sent += 1
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(FLUSH_S)
+            now = time.time()
+            due = [(k, r) for k, r in self.rooms.items() if r.pending is not None and now >= r.next_due]
+            for key, room in due:
+                await self._send(key, room, None, now)
+
+    def stats(self) -> dict:
+        return {key: {'subscription': r.sub.to_dict(), 'clients': len(r.members), 'sent': r.sent,
+                      'coalesced': r.coalesced, 'stream': r.encoder.stats()}
+                for key, r in self.rooms.items()}
@@ -3,15 +3,23 @@ import asyncio
 import websockets
 import json
 import time
-from utils import sign_pss_text, private_key_obj, KALSHI_API_KEY_ID, get_current_event, get_markets_from_event
+from utils import sign_pss_text, private_key_obj, KALSHI_API_KEY_ID
+from kalshi_book import EventBooks, LargeOrderDetector
+from latency import LatencyHistogram
+from subscription_manager import SubscriptionManager
+from shm_store import BookStore
 
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_socketio import SocketIO
 
 mm = None  # Global market maker instance
+engine = None  # Global quoting engine feeding mm
+manager = None  # Global subscription manager (tracks every open KXBTC/KXBTCD market)
 
 # === Configuration ===
+PUBLISH_SHM = True  # Publish live books to shared memory for local readers (GUI, chain server, ...)
+SHM_CAPACITY = 512  # Max markets in the shared-memory store
 DEBUG = False
 def debug_print(*args, **kwargs):
     if DEBUG:
@@ -21,7 +29,6 @@ def debug_print(*args, **kwargs):
 class MarketMaker:
     def __init__(self, tickers):
         self.tickers = tickers
-        self.orderbooks = {t: {'yes': {}, 'no': {}} for t in tickers}
         self.our_quotes = {t: {'bid': None, 'ask': None} for t in tickers}
         self.positions = {t: 0 for t in tickers}
         self.avg_prices = {t: 0.0 for t in tickers}
@@ -36,112 +43,276 @@ class MarketMaker:
         self.mm_threshold = 1000    # position threshold to trigger market making
         self.mm_min_spread = 5      # minimum spread for improving market 
         self.mm_size = 10           # size of each market making order
+
+        # array-backed books (YES terms), one row per ticker
+        self.orderbooks = EventBooks(tickers, thresholds=(self.mm_size,))
+        # only re-quote when a large resting order appears, moves or disappears
+        self.mm_detector = LargeOrderDetector(thresholds=(self.mm_size,))
+
+    def add_markets(self, tickers):
+        """Start tracking new markets (e.g. next hour's event), keeping existing books."""
+        new = [t for t in tickers if t not in self.orderbooks]
+        self.orderbooks.add(new)
+        for t in new:
+            self.tickers.append(t)
+            self.our_quotes[t] = {'bid': None, 'ask': None}
+            self.positions.setdefault(t, 0)
+            self.avg_prices.setdefault(t, 0.0)
+            self.realized_pnl.setdefault(t, 0.0)
+            self.unrealized_pnl.setdefault(t, 0.0)
+            self.trade_log.setdefault(t, [])
+
+    def remove_markets(self, tickers):
+        """Drop books of finalized markets. Positions and PnL are kept for reporting."""
+        self.orderbooks.remove(tickers)
+        for t in tickers:
+            self.mm_detector.forget(t)
+            self.our_quotes.pop(t, None)
+            if t in self.tickers:
+                self.tickers.remove(t)
     
-    def update_quote(self, ticker):
-        # TODO: Definetly a better way to do this by checking the DELTA of the orderbook, rather than 2 for loops. 
-        # TODO: The speedup gain of implementing such a method is not worth the time right now, but it is a good idea for the future
-    
-        # find market makers in the orderbook
-        mm_bid = 0 
-        for price, qty in sorted(self.orderbooks[ticker]['yes'].items(), reverse=True):
-            if qty >= self.mm_size:
-                mm_bid = price
-                break
-        
-        mm_ask = 100 
-        for price, qty in sorted(self.orderbooks[ticker]['no'].items()):
-            if qty >= self.mm_size:
-                mm_ask = price
-                break
+    def compute_quote(self, ticker):
+        """Returns the (bid, ask) we would like to rest for ticker, None where we should not quote."""
+        # find market makers in the orderbook (pointers are maintained on every delta)
+        book = self.orderbooks[ticker]
+        mm_bid = book.mm_bid(self.mm_size)
+        mm_ask = book.mm_ask(self.mm_size)
 
         debug_print("Updating quotes for ticker:", ticker)
-        debug_print("Orderbook YES side:", self.orderbooks[ticker]['yes'])
-        debug_print("Orderbook NO side:", self.orderbooks[ticker]['no'])
+        if DEBUG:
+            bids, asks = book.levels()
+            debug_print("Orderbook YES side:", bids)
+            debug_print("Orderbook NO side:", asks)
         debug_print("Market Maker Bid:", mm_bid, "Market Maker Ask:", mm_ask)
         
-        # If we have a valid market maker bid and ask, update our quotes
+        # If we have a valid market maker bid and ask, improve them by a cent
         if mm_bid > 0 and mm_ask < 100:
             spread = abs(mm_ask - mm_bid)
             if spread >= self.mm_min_spread:
-                self.our_quotes[ticker]['bid'] = mm_bid + 1
-                self.our_quotes[ticker]['ask'] = mm_ask - 1
                 debug_print(f"💰 Updated quotes for {ticker}: Bid {mm_bid}, Ask {mm_ask}")
-            else:
-                debug_print(f"❌ Spread too narrow for {ticker}: {spread} < {self.mm_min_spread}")
-                # set our_quotes for this ticker to None
-                self.our_quotes[ticker]['bid'] = None
-                self.our_quotes[ticker]['ask'] = None
+                return mm_bid + 1, mm_ask - 1
+            debug_print(f"❌ Spread too narrow for {ticker}: {spread} < {self.mm_min_spread}")
         else:
             debug_print(f"❌ No valid market maker quotes for {ticker}.")
-            # set our_quotes for this ticker to None
-            self.our_quotes[ticker]['bid'] = None
-            self.our_quotes[ticker]['ask'] = None
+        return None, None
+
+    def update_quote(self, ticker):
+        """Recompute and store our quote. Returns True if it changed."""
+        bid, ask = self.compute_quote(ticker)
+        quote = self.our_quotes[ticker]
+        if quote['bid'] == bid and quote['ask'] == ask:
+            return False
+        quote['bid'] = bid
+        quote['ask'] = ask
+        return True
         
     def update_orderbook_delta(self, ticker, msg):
-        side = msg["side"]
-        price = msg["price"]
-        if side == 'NO':
-            price = 100 - price  # Convert NO side price to YES side price
-            
-        change = msg["delta"]
-        qty = self.orderbooks[ticker][side].get(price, 0) + change
-        if qty <= 0:
-            self.orderbooks[ticker][side].pop(price, None)
-        else:
-            self.orderbooks[ticker][side][price] = qty
+        """Returns True if the market maker levels moved and the quote needs a look."""
+        # NO side prices are converted to YES terms inside the book
+        book = self.orderbooks[ticker]
+        book.apply_delta(msg["side"], msg["price"], msg["delta"])
 
         debug_print(f"📈 New Orderbook Delta for {ticker}")
+        self.mark_to_market(ticker)
 
-        # trigger quote updating
-        self.update_quote(ticker)
+        events = self.mm_detector.check(ticker, book)
+        if events:
+            debug_print(f"🐋 Market maker levels changed for {ticker}: {events}")
+        return bool(events)
 
     def update_orderbook_snapshot(self, ticker, msg):
-        self.orderbooks[ticker]['yes'] = {p: q for p, q in msg.get('yes', [])}
-        self.orderbooks[ticker]['no'] = {100-p: q for p, q in msg.get('no', [])}
-
-        # trigger quote updating
-        self.update_quote(ticker)
+        self.orderbooks[ticker].apply_snapshot(msg)
+        self.mm_detector.check(ticker, self.orderbooks[ticker])
+        self.mark_to_market(ticker)
+        return True
+
+    def mark_to_market(self, ticker):
+        pos = self.positions[ticker]
+        if pos == 0:
+            self.unrealized_pnl[ticker] = 0.0
+            return
+        book = self.orderbooks[ticker]
+        if book.best_bid == 0 or book.best_ask == 100:
+            return  # one-sided book, keep the last mark
+        mid = (book.best_bid + book.best_ask) / 2
+        self.unrealized_pnl[ticker] = (mid - self.avg_prices[ticker]) * pos
 
     def process_trade(self, ticker, msg):
+        """Simulate our resting quotes against a public trade."""
         self.trade_log[ticker].append(msg)
         yes_price = msg.get("yes_price", None)
-        count = min(msg.get("count", None), self.mm_size) # Limit to mm_size
-        side = "Sell" if msg["taker_side"] == "yes" else "Buy"
+        count = min(msg.get("count", 0), self.mm_size) # Limit to mm_size
 
         our_bid = self.our_quotes[ticker]['bid']
         our_ask = self.our_quotes[ticker]['ask']
 
-        if our_bid is None or our_ask is None:
+        if our_bid is None or our_ask is None or yes_price is None:
             debug_print(f"❌ No valid quotes for {ticker}, cannot process trade.")
-            return
-        
-        self.total_trades += abs(count)
-        current_avg = self.avg_prices.get(ticker, 0.0)
-        current_pos = self.positions.get(ticker, 0)
-        realized = 0
-        filled = 0
-
-
-        if side == "Buy":
-            # Person bought from market, check if our ask was hit
-            if yes_price > our_bid:
-                if current_pos < 0:
-                    # We are short, close our position
-                    closing_size = min(count, -current_pos)
-                    pnl = (current_avg - our_bid)
-                   
-
-
-
-
-                debug_print(f"💹 {ticker} Buy trade: {count} contracts at {yes_price}, Avg Price: {self.avg_prices[ticker]}, Realized PnL: {self.realized_pnl[ticker]}")
-            else:
-                debug_print(f"❌ {ticker} Buy trade did not hit our ask: {yes_price} < {our_ask}")
+            return None
 
+        if msg["taker_side"] == "yes":
+            # Taker bought YES through our ask -> we sold at our ask
+            if yes_price > our_ask:
+                return self.apply_fill(ticker, "sell", our_ask, count, msg.get("trade_id"))
+            debug_print(f"❌ {ticker} Buy trade did not hit our ask: {yes_price} <= {our_ask}")
+        else:
+            # Taker sold YES through our bid -> we bought at our bid
+            if yes_price < our_bid:
+                return self.apply_fill(ticker, "buy", our_bid, count, msg.get("trade_id"))
+            debug_print(f"❌ {ticker} Sell trade did not hit our bid: {yes_price} >= {our_bid}")
+        return None
+
+    def process_fill(self, ticker, msg):
+        """Apply a real fill from the `fill` channel (our own orders), in YES terms."""
+        buys_yes = (msg["action"] == "buy") == (msg["side"] == "yes")
+        return self.apply_fill(ticker, "buy" if buys_yes else "sell", msg["yes_price"], msg["count"], msg.get("trade_id"))
+
+    def apply_fill(self, ticker, side, price, count, trade_id=None):
+        """Incrementally update position, average entry and realized PnL (cents)."""
+        pos = self.positions[ticker]
+        avg = self.avg_prices[ticker]
+        signed = count if side == "buy" else -count
+        realized = 0.0
+
+        # closing part of the fill realizes PnL against the average entry
+        if pos * signed < 0:
+            closing = min(abs(signed), abs(pos))
+            realized = (price - avg) * closing if pos > 0 else (avg - price) * closing
+            pos += closing if signed > 0 else -closing
+            signed += -closing if signed > 0 else closing
+            if pos == 0:
+                avg = 0.0
+
+        # opening part moves the average entry price
+        if signed != 0:
+            new_pos = pos + signed
+            avg = (avg * pos + price * signed) / new_pos
+            pos = new_pos
+
+        self.positions[ticker] = pos
+        self.avg_prices[ticker] = avg
+        self.realized_pnl[ticker] += realized
+        self.total_trades += count
+        self.mark_to_market(ticker)
+
+        fill = {
+            'trade_id': trade_id,
+            'ticker': ticker,
+            'side': side,
+            'price': price,
+            'size': count,
+            'realized_pnl': realized,
+            'position_after': pos,
+            'avg_entry_price_after': avg,
+        }
+        print(f"{'🟩' if side == 'buy' else '🟥'} {ticker} FILLED {side.upper()} {count} @ {price} | Pos {pos} @ {avg:.2f} | Realized {self.realized_pnl[ticker]:.2f}¢")
+        return fill
+
+
+class QuotingEngine:
+    """
+    Event-driven driver for MarketMaker. The websocket loop only enqueues
+    (type, ticker, msg, recv_ns); `run` dispatches each event to the market's
+    handler, and `quote_loop` re-quotes dirty markets at most every
+    `debounce_s`, emitting only quotes that actually changed.
+    """
+
+    def __init__(self, mm, debounce_s=0.05, stats_interval_s=30, on_quote=None, store=None):
+        self.mm = mm
+        self.store = store  # optional shm_store.BookStore mirrored after every book event
+        self.debounce_s = debounce_s
+        self.stats_interval_s = stats_interval_s
+        self.on_quote = on_quote or self._print_quote
+        self.queue = asyncio.Queue()
+        self.dirty = set()
+        self.latency = {name: LatencyHistogram(name) for name in ("book", "trade", "fill", "quote")}
+        self.handlers = {
+            "orderbook_snapshot": ("book", self._on_snapshot),
+            "orderbook_delta": ("book", self._on_delta),
+            "trade": ("trade", self._on_trade),
+            "fill": ("fill", self._on_fill),
+        }
+
+    def submit(self, msg_type, ticker, msg):
+        self.queue.put_nowait((msg_type, ticker, msg, time.perf_counter_ns()))
+
+    async def run(self):
+        await asyncio.gather(self._dispatch_loop(), self.quote_loop(), self.stats_loop())
+
+    async def _dispatch_loop(self):
+        while True:
+            msg_type, ticker, msg, recv_ns = await self.queue.get()
+            handler = self.handlers.get(msg_type)
+            if handler is None or ticker not in self.mm.orderbooks:
+                continue
+            name, fn = handler
+            try:
+                fn(ticker, msg)
+            except Exception as e:
+                print(f"❌ Error handling {msg_type} for {ticker}: {e}")
+            self.latency[name].record_since(recv_ns)
+
+    def _on_snapshot(self, ticker, msg):
+        if self.mm.update_orderbook_snapshot(ticker, msg):
+            self.dirty.add(ticker)
+        self._publish(ticker)
+
+    def _on_delta(self, ticker, msg):
+        if self.mm.update_orderbook_delta(ticker, msg):
+            self.dirty.add(ticker)
+        self._publish(ticker)
+
+    def _publish(self, ticker):
+        if self.store is not None:
+            self.store.write_book(ticker, self.mm.orderbooks[ticker])
+
+    def markets_changed(self):
+        """Re-layout the shared-memory store after markets were added or removed."""
+        if self.store is not None:
+            self.store.write_event(self.mm.orderbooks)
+
+    def _on_trade(self, ticker, msg):
+        side = "Buy" if msg["taker_side"] == "yes" else "Sell"
+        debug_print(f"💹 Trade on {ticker}: {side} {msg['count']} contracts at {msg['yes_price']} @ {msg['ts']}")
+        self.mm.process_trade(ticker, msg)
+
+    def _on_fill(self, ticker, msg):
+        self.mm.process_fill(ticker, msg)
+
+    async def quote_loop(self):
+        while True:
+            await asyncio.sleep(self.debounce_s)
+            if not self.dirty:
+                continue
+            start_ns = time.perf_counter_ns()
+            dirty, self.dirty = self.dirty, set()
+            for ticker in dirty:
+                if ticker not in self.mm.orderbooks:
+                    continue  # market was removed since it was marked
+                if self.mm.update_quote(ticker):
+                    quote = self.mm.our_quotes[ticker]
+                    self.on_quote(ticker, quote['bid'], quote['ask'])
+            self.latency["quote"].record_since(start_ns)
+
+    async def stats_loop(self):
+        while True:
+            await asyncio.sleep(self.stats_interval_s)
+            realized = sum(self.mm.realized_pnl.values())
+            unrealized = sum(self.mm.unrealized_pnl.values())
+            print(f"📊 Queue: {self.queue.qsize()} | Trades: {self.mm.total_trades} | Realized: ${realized/100:.2f} | Unrealized: ${unrealized/100:.2f}")
+            for hist in self.latency.values():
+                print(f"   ⏱️ {hist}")
+
+    @staticmethod
+    def _print_quote(ticker, bid, ask):
+        if bid is None or ask is None:
+            print(f"⛔ {ticker}: pulled quotes")
+        else:
+            print(f"✏️ {ticker}: quoting {bid} / {ask}")
 
 
-async def kalshi_ws_stream(market_tickers):
-    global mm  # Use the global market maker instance
+async def kalshi_ws_stream():
+    # Events go to the quoting engine, subscriptions are owned by the manager
     ws_url = "wss://api.elections.kalshi.com/trade-api/ws/v2"
 
     # Generate timestamp & signature
@@ -167,17 +338,8 @@ async def kalshi_ws_stream(market_tickers):
         async with websockets.connect(ws_url, extra_headers=headers, ping_interval=10, ping_timeout=5) as ws:
             print("✅ WebSocket connected!")
 
-            # Subscribe to orderbook_delta
-            await ws.send(json.dumps({ "id": 1, "cmd": "subscribe", "params": {"channels": ["orderbook_delta"],"market_tickers": market_tickers}}))
-            print("📡 Subscribed to orderbook_delta.")
-
-            # 5Subscribe to trade ( ALL TRADES )
-            await ws.send(json.dumps({ "id": 2, "cmd": "subscribe", "params": { "channels": ["trade"], "market_tickers": market_tickers}}))
-            print("📡 Subscribed to trade.")
-
-            # 6️Subscribe to fill ( JUST OUR ORDERS )
-            await ws.send(json.dumps({ "id": 3, "cmd": "subscribe", "params": {"channels": ["fill"],"market_tickers": market_tickers}}))
-            print("📡 Subscribed to fill.")
+            # Subscribe every tracked market on all channels; the manager adds / removes markets later
+            await manager.subscribe_all(ws)
 
             async for message in ws:
                 data = json.loads(message)
@@ -188,6 +350,7 @@ async def kalshi_ws_stream(market_tickers):
                 # Determine channel by sid (this works if only one sid per channel)
                 if msg_type == "subscribed":
                     debug_print(f"✅ Subscribed to channel {msg['channel']} (sid: {msg['sid']})")
+                    await manager.on_subscribed(msg)
                     continue
 
                 # Determine channel by message type
@@ -211,17 +374,8 @@ async def kalshi_ws_stream(market_tickers):
                         raise Exception("Sequence gap")
                     last_seq[channel] = seq
 
-                if msg_type == "orderbook_snapshot":
-                    # Update orderbook snapshot
-                    mm.update_orderbook_snapshot(ticker, msg)
-
-                elif msg_type == "orderbook_delta":
-                    # Update orderbook delta
-                    mm.update_orderbook_delta(ticker, msg)
-
-                elif msg_type == "trade":
-                    # Process trade message
-                    mm.process_trade(ticker, msg)
+                # Hand off to the engine, never process inside the read loop
+                engine.submit(msg_type, ticker, msg)
 
     except Exception as e:
         print("❌ WebSocket error or disconnection:", e)
@@ -233,20 +387,43 @@ async def subscription_confirmation_watchdog(ws, confirmed_set, timeout):
         print("⚠️ Subscription not confirmed in time. Triggering reconnect.")
         await ws.close()
 
-async def start_ws_client(market_tickers):
+async def reconnect_loop():
     while True:
         try:
-            await kalshi_ws_stream(market_tickers)
-        except Exception as e:
+            await kalshi_ws_stream()
+        except Exception:
             print("🔄 Attempting to reconnect in 3 seconds...")
             await asyncio.sleep(3)
 
+async def start_ws_client():
+    # if the engine or the manager dies, stop instead of streaming into nothing
+    await asyncio.gather(engine.run(), manager.run(), reconnect_loop())
+
 if __name__ == "__main__":
-    event = get_current_event()
-    markets = get_markets_from_event(event)
+    manager = SubscriptionManager()
+    wanted, markets, _ = manager.discover({})
+    manager.markets = {t: wanted[t] for t in markets}
     print(f"Found {len(markets)} markets.")
     for market in markets:
         print(f"Market: {market}")
-    market_ticker = markets # ["KXBTC-25JUN0610-B103875"]  # example ticker
-    mm = MarketMaker(market_ticker)  # Initialize market maker with tickers
-    asyncio.run(start_ws_client(market_ticker))
\ No newline at end of file
+    mm = MarketMaker(markets)  # Initialize market maker with tickers
+    store = BookStore.create(capacity=SHM_CAPACITY) if PUBLISH_SHM else None
+    engine = QuotingEngine(mm, store=store)
+    engine.markets_changed()
+
+    # books persist across hourly rolls, the manager just adds / drops markets
+    def on_add(tickers):
+        mm.add_markets(tickers)
+        engine.markets_changed()
+
+    def on_remove(tickers):
+        mm.remove_markets(tickers)
+        engine.markets_changed()
+
+    manager.on_add = on_add
+    manager.on_remove = on_remove
+    try:
+        asyncio.run(start_ws_client())
+    finally:
+        if store is not None:
+            store.close()
@@ -0,0 +1,157 @@
+"""
+Keeps one Kalshi websocket subscribed to every live KXBTC / KXBTCD market.
+
+Every REFRESH_S the manager lists the open events of each series, adds the
+markets of any event striking within HORIZON_S (so the next hour is subscribed
+well before the current one closes), and drops markets once they are
+finalized or have been closed for longer than CLOSE_GRACE_S. Changes go out as
+`update_subscription` commands on the existing sids, so the connection (and
+every book kept by the caller) survives the hourly roll. Changes made before
+a channel's `subscribed` ack (no sid yet) are queued and sent when it arrives.
+
+`discover` does the REST calls in a worker thread and only reads the copy of
+`markets` it is given. `markets` itself is only changed on the event loop.
+"""
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from utils import get_open_events, get_event_markets
+
+SERIES = ("KXBTC", "KXBTCD")
+CHANNELS = ("orderbook_delta", "trade", "fill")
+HORIZON_S = 2 * 3600      # subscribe events striking within this window
+CLOSE_GRACE_S = 120       # keep closed markets this long for final trades
+REFRESH_S = 30
+DONE_STATUSES = {"finalized", "settled"}
+
+DEBUG = False
+
+def debug_print(*args, **kwargs):
+    if DEBUG:
+        print(*args, **kwargs)
+
+def _parse_ts(ts):
+    return datetime.fromisoformat(ts.replace('Z', '+00:00'))
+
+
+class SubscriptionManager:
+    def __init__(self, series=SERIES, horizon_s=HORIZON_S, refresh_s=REFRESH_S,
+                 on_add=None, on_remove=None):
+        self.series = series
+        self.horizon_s = horizon_s
+        self.refresh_s = refresh_s
+        self.on_add = on_add          # callback(list_of_tickers) before subscribing
+        self.on_remove = on_remove    # callback(list_of_tickers) after unsubscribing
+        self.markets = {}             # ticker -> {'event', 'close_time', 'status'}
+        self.sids = {}                # channel -> sid of the live subscription
+        self.pending = {}             # channel -> {ticker: action} waiting for that channel's sid
+        self.ws = None
+        self._next_id = 100
+
+    @property
+    def tickers(self):
+        return sorted(self.markets)
+
+    # ------------- REST discovery -------------
+    def discover(self, tracked, now=None):
+        """
+        Returns (wanted, to_add, to_remove) against `tracked` (a copy of `markets`).
+        `wanted` has the current info of every open market and of every tracked
+        market whose event has since closed. Doesn't change any state.
+        """
+        now = now or datetime.now(timezone.utc)
+        wanted = {}
+        for series in self.series:
+            for event in get_open_events(series) or []:
+                strike = _parse_ts(event['strike_date'])
+                if (strike - now).total_seconds() > self.horizon_s:
+                    continue
+                for m in get_event_markets(event['event_ticker']) or []:
+                    wanted[m['ticker']] = {
+                        'event': event['event_ticker'],
+                        'close_time': _parse_ts(m['close_time']),
+                        'status': m.get('status'),
+                    }
+
+        # refresh the status of tracked markets whose event is no longer open
+        stale_events = {info['event'] for t, info in tracked.items() if t not in wanted}
+        for event in stale_events:
+            for m in get_event_markets(event) or []:
+                if m['ticker'] in tracked:
+                    wanted[m['ticker']] = {**tracked[m['ticker']], 'status': m.get('status')}
+
+        to_remove = []
+        for ticker, info in {**tracked, **wanted}.items():
+            closed_for = (now - info['close_time']).total_seconds()
+            if info['status'] in DONE_STATUSES or closed_for > CLOSE_GRACE_S:
+                to_remove.append(ticker)
+
+        to_add = [t for t in wanted if t not in tracked and t not in to_remove]
+        to_remove = [t for t in to_remove if t in tracked]
+        return wanted, to_add, to_remove
+
+    # ------------- websocket commands -------------
+    def _cmd_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    async def subscribe_all(self, ws):
+        """Initial subscription on a fresh connection (also used after reconnects)."""
+        self.ws = ws
+        self.sids = {}
+        self.pending = {}             # the subscribe below already uses the current market list
+        for channel in CHANNELS:
+            await ws.send(json.dumps({"id": self._cmd_id(), "cmd": "subscribe", "params": {
+                "channels": [channel], "market_tickers": self.tickers}}))
+            print(f"📡 Subscribed to {channel} for {len(self.markets)} markets.")
+
+    async def on_subscribed(self, msg):
+        """Record the channel's sid and send the changes that waited for it."""
+        channel = msg['channel']
+        self.sids[channel] = msg['sid']
+        pending = self.pending.pop(channel, {})
+        for action in ("add_markets", "delete_markets"):
+            tickers = [t for t, a in pending.items() if a == action]
+            if tickers:
+                await self._send_update(channel, tickers, action)
+
+    async def _update(self, tickers, action):
+        for channel in CHANNELS:
+            if channel in self.sids:
+                await self._send_update(channel, tickers, action)
+            else:
+                # subscribe sent, ack not back yet: on_subscribed sends these (the latest action wins)
+                self.pending.setdefault(channel, {}).update(dict.fromkeys(tickers, action))
+
+    async def _send_update(self, channel, tickers, action):
+        await self.ws.send(json.dumps({"id": self._cmd_id(), "cmd": "update_subscription", "params": {
+            "sids": [self.sids[channel]], "market_tickers": tickers, "action": action}}))
+
+    async def run(self):
+        while True:
+            try:
+                wanted, to_add, to_remove = await asyncio.to_thread(self.discover, dict(self.markets))
+                for t, info in wanted.items():
+                    if t in self.markets:
+                        self.markets[t]['status'] = info['status']
+                if to_add:
+                    if self.on_add:
+                        self.on_add(to_add)
+                    for t in to_add:
+                        self.markets[t] = wanted[t]
+                    if self.ws is not None:
+                        await self._update(to_add, "add_markets")
+                    print(f"➕ Added {len(to_add)} markets: {sorted({wanted[t]['event'] for t in to_add})}")
+                if to_remove:
+                    if self.ws is not None:
+                        await self._update(to_remove, "delete_markets")
+                    for t in to_remove:
+                        self.markets.pop(t, None)
+                    if self.on_remove:
+                        self.on_remove(to_remove)
+                    print(f"➖ Removed {len(to_remove)} finalized markets.")
+                debug_print(f"🔁 Tracking {len(self.markets)} markets.")
+            except Exception as e:
+                print("❌ Subscription refresh error:", e)
+            await asyncio.sleep(self.refresh_s)
@@ -82,6 +82,32 @@ def get_markets_from_event(event):
         print("❌ Error fetching markets:", e)
         return None
 
+def get_open_events(series="KXBTC"):
+    """All open events of a series, soonest strike first."""
+    try:
+        url = f"https://api.elections.kalshi.com/trade-api/v2/events?status=open&series_ticker={series}"
+        headers = {"accept": "application/json"}
+        response = requests.get(url, headers=headers, timeout=5)
+        events = response.json().get('events', [])
+        events.sort(key=lambda x: x['strike_date'])
+        return events
+
+    except Exception as e:
+        print("❌ Error fetching events:", e)
+        return None
+
+def get_event_markets(event):
+    """Full market dicts (ticker, status, close_time, ...) for an event."""
+    try:
+        url = f"https://api.elections.kalshi.com/trade-api/v2/events/{event}"
+        headers = {"accept": "application/json"}
+        response = requests.get(url, headers=headers, timeout=5)
+        return response.json().get('markets', [])
+
+    except Exception as e:
+        print("❌ Error fetching markets:", e)
+        return None
+
 def get_orderbook(ticker):    
     try: 
         url = f"https://api.elections.kalshi.com/trade-api/v2/markets/{ticker}/orderbook"
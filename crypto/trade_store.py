@@ -0,0 +1,201 @@
+# trade_store.py
+"""Append-only fill / PnL / settlement store
+=========================================
+test_trading.py kept every fill in `trade_log` and every settled fill again in
+`finalized_trades`, so memory grew for as long as it ran and nothing survived
+a restart. `TradeStore` writes them to SQLite instead (stdlib, WAL mode) and
+the process only keeps the last few fills it shows live:
+
+  * fills        – one row per fill, in trade_log's fields. `expired` and
+                   `outcome` are set when its event settles.
+  * pnl          – realized / unrealized / expected spread PnL per tick.
+  * settlements  – per-ticker closing PnL when an event finalizes.
+
+Writes never touch the database on the caller's thread. `record_*` put the
+row on a queue. A writer thread commits whatever has queued, in one
+transaction per BATCH rows or FLUSH_S seconds, whichever comes first. Fill
+ids are handed out at record time, so the dashboard can page backwards from
+the oldest fill it has (`fills(before=id)`) before the row is even written.
+Reads open their own connection. Under WAL they don't wait on the writer.
+Every row carries the `run` it came from (the store's start time), so
+restarts append to the same file.
+"""
+
+from __future__ import annotations
+import itertools
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "trades.db")
+BATCH = 500
+FLUSH_S = 1.0
+PAGE = 100
+STATS_S = 60
+
+FILL_FIELDS = ('trade_id', 'ticker', 'side', 'price', 'size', 'realized_pnl',
+               'position_after', 'avg_entry_price_after')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fills (
+    id INTEGER PRIMARY KEY, run TEXT, ts REAL, trade_id TEXT, ticker TEXT, side TEXT,
+    price REAL, size INTEGER, realized_pnl REAL, position_after INTEGER,
+    avg_entry_price_after REAL, expired INTEGER NOT NULL DEFAULT 0, outcome INTEGER
+);
+CREATE INDEX IF NOT EXISTS fills_ticker ON fills (ticker, id);
+CREATE INDEX IF NOT EXISTS fills_open ON fills (expired) WHERE expired = 0;
+CREATE TABLE IF NOT EXISTS pnl (
+    run TEXT, ts REAL, timestamp TEXT, realized REAL, unrealized REAL,
+    total_trades INTEGER, expected_spread_pnl REAL
+);
+CREATE INDEX IF NOT EXISTS pnl_ts ON pnl (ts);
+CREATE TABLE IF NOT EXISTS settlements (
+    run TEXT, ts REAL, yes_market TEXT, ticker TEXT, position INTEGER,
+    avg_entry REAL, outcome INTEGER, final_pnl REAL
+);
+"""
+
+_INSERT_FILL = (f"INSERT INTO fills (id, run, ts, {', '.join(FILL_FIELDS)}) "
+                f"VALUES (?, ?, ?, {', '.join('?' * len(FILL_FIELDS))})")
+_INSERT_PNL = "INSERT INTO pnl VALUES (?, ?, ?, ?, ?, ?, ?)"
+_INSERT_SETTLEMENT = "INSERT INTO settlements VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+_SETTLE_FILLS = ("UPDATE fills SET expired = 1, outcome = (ticker = ?) "
+                 "WHERE expired = 0 AND ticker LIKE ? || '%'")
+_STOP = object()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class TradeStore:
+    def __init__(self, path: str = DB_PATH, batch: int = BATCH, flush_s: float = FLUSH_S):
+        self.path = path
+        self.batch = batch
+        self.flush_s = flush_s
+        self.run = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.queue: queue.Queue = queue.Queue()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = _connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        last_id = conn.execute("SELECT MAX(id) FROM fills").fetchone()[0] or 0
+        conn.close()
+        self.ids = itertools.count(last_id + 1)
+
+        self.written = self.commits = self.errors = 0
+        self.last_stats = time.time()
+        self.writer = threading.Thread(target=self._write_loop, name="trade store writer", daemon=True)
+        self.writer.start()
+        print(f"🗄️ Trade store at {path} (run {self.run}, {last_id} fills so far)")
+
+    # ------------- writes (any thread, never block) -------------
+    def record_fill(self, trade: dict) -> int:
+        """Queue a trade_log entry; returns its id, for paging with `fills(before=...)`."""
+        fill_id = next(self.ids)
+        self.queue.put((_INSERT_FILL, (fill_id, self.run, time.time(), *(trade.get(f) for f in FILL_FIELDS))))
+        return fill_id
+
+    def record_pnl(self, timestamp: str, realized: float, unrealized: float,
+                   total_trades: int, expected_spread_pnl: float):
+        self.queue.put((_INSERT_PNL, (self.run, time.time(), timestamp, realized, unrealized,
+                                      total_trades, expected_spread_pnl)))
+
+    def record_settlement(self, yes_market: Optional[str], closed: list):
+        """
+        `closed` holds {'ticker', 'position', 'avg_entry', 'outcome', 'final_pnl'} per
+        ticker that had a position. Every open fill in yes_market's event is marked
+        expired, with outcome 1 for yes_market and 0 for the rest.
+        """
+        now = time.time()
+        for c in closed:
+            self.queue.put((_INSERT_SETTLEMENT, (self.run, now, yes_market, c['ticker'], c['position'],
+                                                 c['avg_entry'], c['outcome'], c['final_pnl'])))
+        if yes_market:
+            event = yes_market.rsplit("-", 1)[0] + "-"
+            self.queue.put((_SETTLE_FILLS, (yes_market, event)))
+
+    def close(self, timeout_s: float = 10):
+        """Write everything queued so far and stop the writer."""
+        self.queue.put(_STOP)
+        self.writer.join(timeout_s)
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        conn.execute("PRAGMA synchronous=NORMAL")   # WAL: a crash can lose the last commits, never corrupt
+        stop = False
+        while not stop:
+            pending = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_s
+            while len(pending) < self.batch and pending[-1] is not _STOP:
+                try:
+                    pending.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            if pending[-1] is _STOP:
+                stop = True
+                pending.pop()
+            if pending:
+                self._commit(conn, pending)
+            if time.time() - self.last_stats >= STATS_S:
+                self._print_stats()
+        conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, pending: list):
+        try:
+            with conn:
+                # one executemany per run of the same statement, in queue order
+                for sql, group in itertools.groupby(pending, key=lambda op: op[0]):
+                    conn.executemany(sql, [params for _, params in group])
+            self.written += len(pending)
+            self.commits += 1
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"⛔ Trade store dropped {len(pending)} rows: {e}")
+
+    # ------------- reads (own connection, any thread) -------------
+    def _query(self, sql: str, params: tuple) -> list:
+        conn = _connect(self.path)
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def fills(self, before: Optional[int] = None, limit: int = PAGE, ticker: Optional[str] = None) -> dict:
+        """Newest-first page of fills with id < before. `next` is the `before` for the following page."""
+        where, params = [], []
+        if before is not None:
+            where.append("id < ?")
+            params.append(before)
+        if ticker:
+            where.append("ticker = ?")
+            params.append(ticker)
+        sql = ("SELECT * FROM fills" + (" WHERE " + " AND ".join(where) if where else "")
+               + " ORDER BY id DESC LIMIT ?")
+        rows = self._query(sql, (*params, limit))
+        return {'fills': rows, 'next': rows[-1]['id'] if len(rows) == limit else None}
+
+    def pnl_history(self, since: Optional[float] = None, limit: int = 10_000) -> list:
+        """PnL rows after `since` (unix seconds), oldest first. Without it, the current run's latest `limit`."""
+        if since is None:
+            return self._query("SELECT * FROM (SELECT * FROM pnl WHERE run = ? ORDER BY ts DESC LIMIT ?) ORDER BY ts",
+                               (self.run, limit))
+        return self._query("SELECT * FROM pnl WHERE ts > ? ORDER BY ts LIMIT ?", (since, limit))
+
+    def settlements(self, limit: int = PAGE) -> list:
+        return self._query("SELECT * FROM settlements ORDER BY ts DESC LIMIT ?", (limit,))
+
+    # ------------- metrics -------------
+    def stats(self) -> dict:
+        return {'queued': self.queue.qsize(), 'written': self.written,
+                'commits': self.commits, 'errors': self.errors}
+
+    def _print_stats(self):
+        self.last_stats = time.time()
+        print(f"[STATS] trade store: {self.stats()}")
@@ -9,16 +9,22 @@ the calculation instead of raising an AttributeError.
 The rest of the methodology is unchanged: 1‑BTC grid, μ + 5σ cap, 0.5 % depth
 cut‑off, exponential weighting.  WebSockets (ccxt.pro) if available, otherwise
 concurrent REST polling.
+
+`--event` switches from the fixed 1 s tick to event-triggered publication:
+every book update marks its venue dirty and a coalescing scheduler publishes
+at most every MIN_INTERVAL_MS, recording update → publish latency per venue.
 """
 
 from __future__ import annotations
-import asyncio, bisect, time
+import asyncio, bisect, sys, time
 from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Dict, List, Tuple
 import numpy as np
 
+from latency import LatencyHistogram
+
 # optional faster loop
 try:
     import uvloop  # type: ignore
@@ -44,6 +50,13 @@ MAX_SAMPLE = 50        # dynamic‑cap sample size
 STALE_S = 30           # book freshness window
 TICK = 1.0             # seconds between REST ticks
 
+# publication mode: "tick" recomputes every TICK (CF methodology fidelity),
+# "event" recomputes when a venue book updates, coalesced to at most one
+# publish per MIN_INTERVAL_MS
+MODE = "tick"
+MIN_INTERVAL_MS = 50
+STATS_S = 30           # event mode: seconds between latency summaries
+
 # candidate exchanges – may not all exist in the local ccxt build
 CANDIDATES = [
     "coinbase", "kraken", "gemini", "bitstamp",
@@ -56,18 +69,155 @@ DEF_SYM = "BTC/USD"
 
 @dataclass(slots=True)
 class Book:
-    bids: List[Tuple[float, float]]
-    asks: List[Tuple[float, float]]
+    bids: np.ndarray   # (n, 2) [price, size], best first
+    asks: np.ndarray
     ts: int
 
 def now_ms() -> int: return int(time.time()*1000)
 
+def _levels(raw) -> np.ndarray:
+    """ccxt [[price, size, ...], ...] -> (n, 2) float array without empty levels."""
+    arr=np.array([lvl[:2] for lvl in raw],dtype=float).reshape(-1,2)
+    return arr[arr[:,1]>0]
+
+def _merge(sides: List[np.ndarray], descending: bool):
+    """
+    Consolidate one side of several books: (prices, summed sizes), best first.
+    Stable argsort keeps venues in order within a price, so sizes are summed
+    in the same order as the old dict accumulation.
+    """
+    lv=np.concatenate(sides) if sides else np.empty((0,2))
+    if lv.size==0: return np.empty(0),np.empty(0)
+    order=np.argsort(-lv[:,0] if descending else lv[:,0],kind='stable')
+    px=lv[order,0]; sz=lv[order,1]
+    starts=np.flatnonzero(np.r_[True,px[1:]!=px[:-1]])
+    return px[starts],np.add.reduceat(sz,starts)
+
 def mid(b: Book) -> float: return (b.bids[0][0]+b.asks[0][0])/2
 
 def crossing(b: Book) -> bool: return b.bids[0][0] >= b.asks[0][0]
 
-class BRTI:
+def _sorted_side(levels: np.ndarray, descending: bool):
+    """(n, 2) levels, best first -> (prices, sizes) ascending by price."""
+    lv=levels[::-1] if descending else levels
+    px=lv[:,0]
+    if np.all(px[1:]>px[:-1]): return px,lv[:,1]   # ccxt books are already sorted
+    order=np.argsort(px,kind='stable')
+    return px[order],lv[order,1]
+
+def _lookup(side, px: np.ndarray) -> np.ndarray:
+    """Sizes of an ascending (prices, sizes) side at px, 0 where absent."""
+    prices,sizes=side
+    if prices.size==0: return np.zeros(px.size)
+    i=np.minimum(np.searchsorted(prices,px),prices.size-1)
+    return np.where(prices[i]==px,sizes[i],0.)
+
+class ConsolidatedBook:
+    """
+    Consolidated book across venues, maintained from per-venue diffs.
+
+    `update(venue, book)` diffs the venue's new levels against the ones it
+    contributed last time and only touches the changed prices: each of those
+    is re-summed across venues (so no float drift builds up) and patched into
+    the sorted arrays in place / via np.insert / np.delete. Capped cumulative
+    depth curves are rebuilt lazily, only when asked for with a new version or
+    cap, and only over the levels near the touch that can fall inside the
+    utilised depth (see `cum`). Both sides are stored ascending; `sides()`
+    returns bids best-first.
+
+    The consolidated work per update is O(changed levels + levels in that
+    band). Two O(depth) passes remain. ccxt hands over whole venue books, so
+    finding what changed compares the venue's new levels with its old ones.
+    A level insert / delete also moves the sorted arrays (a memmove). `--bench`
+    prints the per-update cost as depth grows.
+    """
+    _EMPTY=(np.empty(0),np.empty(0))
+
     def __init__(self):
+        self.venues: Dict[str, Book] = {}
+        self.sorted: Dict[str, Tuple[Tuple[np.ndarray,np.ndarray],Tuple[np.ndarray,np.ndarray]]] = {}
+        self.px=[np.empty(0),np.empty(0)]   # [bids, asks], ascending
+        self.sz=[np.empty(0),np.empty(0)]
+        self.version=0
+        self.levels_touched=0               # changed levels applied so far (for stats)
+        self._cum_key=None; self._cum_val=None
+
+    def update(self, venue: str, book: Book):
+        if self.venues.get(venue) is book: return
+        new=(_sorted_side(book.bids,True),_sorted_side(book.asks,False))
+        old=self.sorted.get(venue,(self._EMPTY,self._EMPTY))
+        self.venues[venue]=book; self.sorted[venue]=new
+        for side in (0,1): self._apply(side,old[side],new[side])
+
+    def remove(self, venue: str):
+        if venue not in self.venues: return
+        old=self.sorted.pop(venue); del self.venues[venue]
+        for side in (0,1): self._apply(side,old[side],self._EMPTY)
+
+    def _apply(self, side: int, old, new):
+        if old[0].size==new[0].size and np.array_equal(old[0],new[0]):
+            changed=new[0][old[1]!=new[1]]      # common case: only sizes moved
+        else:
+            px=np.union1d(old[0],new[0])
+            changed=px[_lookup(old,px)!=_lookup(new,px)]
+        if changed.size==0: return
+        total=np.zeros(changed.size)
+        for sides in self.sorted.values(): total+=_lookup(sides[side],changed)
+
+        prices,sizes=self.px[side],self.sz[side]
+        i=np.searchsorted(prices,changed)
+        present=(i<prices.size)&(prices[np.minimum(i,max(prices.size-1,0))]==changed) if prices.size else np.zeros(changed.size,bool)
+        keep=total>0
+        sizes[i[present&keep]]=total[present&keep]   # in place: only sides() views see it
+        drop=i[present&~keep]
+        if drop.size: prices=np.delete(prices,drop); sizes=np.delete(sizes,drop)
+        add=~present&keep
+        if add.any():
+            j=np.searchsorted(prices,changed[add])
+            prices=np.insert(prices,j,changed[add]); sizes=np.insert(sizes,j,total[add])
+        self.px[side],self.sz[side]=prices,sizes
+        self.version+=1; self.levels_touched+=changed.size
+
+    def sides(self):
+        """Views onto the consolidated sides, valid until the next update."""
+        return (self.px[0][::-1],self.sz[0][::-1]),(self.px[1],self.sz[1])
+
+    def cum(self, cap: float):
+        """
+        Capped cumulative depth curves ((bid vols, prices), (ask vols, prices)), cached.
+
+        The curves stop where the index can no longer use them. Along the grid
+        the bid curve is ≤ best bid and the ask curve ≥ best ask, so once the
+        ask curve passes best bid·r (or the bid curve drops below best ask/r),
+        with r=(1+DEV_MID)/(1-DEV_MID), the mid-spread is above DEV_MID there
+        and at every larger volume. r is widened by 1e-9 so rounding can't cut
+        a level that counts. A side whose band holds less
+        than SPACING_VOL is summed whole, since the first grid point is always used.
+        """
+        key=(self.version,cap)
+        if key!=self._cum_key:
+            (bp,bs),(ap,as_)=(self.px[0],self.sz[0]),(self.px[1],self.sz[1])
+            lo,hi=0,ap.size
+            if bp.size and ap.size:
+                r=(1+DEV_MID)/(1-DEV_MID)*(1+1e-9)
+                lo=int(np.searchsorted(bp,ap[0]/r,side='left'))
+                hi=int(np.searchsorted(ap,bp[-1]*r,side='right'))
+            bv=np.cumsum(np.minimum(bs[lo:][::-1],cap))
+            if lo and (bv.size==0 or bv[-1]<SPACING_VOL): lo=0; bv=np.cumsum(np.minimum(bs[::-1],cap))
+            av=np.cumsum(np.minimum(as_[:hi],cap))
+            if hi<ap.size and (av.size==0 or av[-1]<SPACING_VOL): hi=ap.size; av=np.cumsum(np.minimum(as_,cap))
+            self._cum_val=((bv,bp[lo:][::-1]),(av,ap[:hi]))
+            self._cum_key=key
+        return self._cum_val
+
+class BRTI:
+    def __init__(self, mode: str = MODE, min_interval_ms: float = MIN_INTERVAL_MS, on_publish=None):
+        self.mode = mode if USE_WS else "tick"   # event mode needs pushed (WS) updates
+        self.min_interval_s = min_interval_ms/1000
+        self.on_publish = on_publish or self._print_index
+        self._dirty: Dict[str, int] = {}         # venue -> perf_counter_ns of its oldest unpublished update
+        self._wake: "asyncio.Event | None" = None
+        self.latency: Dict[str, LatencyHistogram] = {}
         self.ex: Dict[str, "ccxt.Exchange"] = {}
         for eid in CANDIDATES:
             try:
@@ -76,6 +226,8 @@ class BRTI:
             except AttributeError:
                 print(f"[WARN] ccxt has no exchange id '{eid}' – skipping …")
         self.books: Dict[str, Book] = {}
+        self.cons = ConsolidatedBook()   # kept in sync with the venues that pass the checks
+        self._last = (None, None, (None, []))  # (version, venues, result) of the last calc
         if not self.ex:
             raise RuntimeError("No supported exchanges available in this ccxt build.")
 
@@ -86,10 +238,7 @@ class BRTI:
         lim = DEPTH.get(eid)
         try:
             ob = await ex.fetch_order_book(sym, limit=lim)
-            self.books[eid] = Book(
-                [(float(p), float(s)) for p,s,*_ in ob['bids'] if s>0],
-                [(float(p), float(s)) for p,s,*_ in ob['asks'] if s>0],
-                ob.get('timestamp') or now_ms())
+            self.books[eid] = Book(_levels(ob['bids']), _levels(ob['asks']), ob.get('timestamp') or now_ms())
         except Exception as e:
             print(f"[{eid}] REST {e}")
 
@@ -100,28 +249,22 @@ class BRTI:
         while True:
             try:
                 ob = await ex.watch_order_book(sym, limit=lim)
-                self.books[eid] = Book(
-                    [(float(p), float(s)) for p,s,*_ in ob['bids'] if s>0],
-                    [(float(p), float(s)) for p,s,*_ in ob['asks'] if s>0],
-                    ob.get('timestamp') or now_ms())
+                self.books[eid] = Book(_levels(ob['bids']), _levels(ob['asks']), ob.get('timestamp') or now_ms())
+                self._mark(eid)
             except Exception as e:
                 print(f"[{eid}] WS {e}")
                 await asyncio.sleep(1)
 
     # ------------- math helpers -------------
+    # Books hold (n, 2) float arrays of [price, size]; everything below is
+    # vectorised over all venues / the whole 1-BTC grid at once.
     @staticmethod
     def _consol(bks: Dict[str, Book]):
-        bmap, amap = defaultdict(float), defaultdict(float)
-        for bk in bks.values():
-            for p,s in bk.bids: bmap[p]+=s
-            for p,s in bk.asks: amap[p]+=s
-        bids = sorted(bmap.items(), key=lambda x:-x[0])
-        asks = sorted(amap.items(), key=lambda x:x[0])
-        return bids, asks
+        return _merge([b.bids for b in bks.values()], True), _merge([b.asks for b in bks.values()], False)
 
     @staticmethod
     def _cap(bids, asks):
-        samp=np.array([s for _,s in bids[:MAX_SAMPLE]]+[s for _,s in asks[:MAX_SAMPLE]])
+        samp=np.concatenate((bids[1][:MAX_SAMPLE], asks[1][:MAX_SAMPLE]))
         if samp.size==0: return 0.
         samp.sort(); k=max(1,int(.01*len(samp)))
         wins=samp.copy(); wins[:k]=wins[k]; wins[-k:]=wins[-k-1]
@@ -129,49 +272,212 @@ class BRTI:
 
     @staticmethod
     def _cum(levels):
-        v,p,tot=[],[],0.
-        for pr,sz in levels: tot+=sz; v.append(tot); p.append(pr)
-        return np.asarray(v),np.asarray(p)
+        prices,sizes=levels
+        return np.cumsum(sizes),prices
 
-    def _curve(self, vols, prices, grid):
-        return np.fromiter((prices[min(bisect.bisect_left(vols,v), len(prices)-1)] for v in grid),float)
+    @staticmethod
+    def _curve(vols, prices, grid):
+        idx=np.searchsorted(vols,grid,side='left')
+        return prices[np.minimum(idx,len(prices)-1)]
 
-    def calc(self):
-        fresh={e:b for e,b in self.books.items() if now_ms()-b.ts<=STALE_S*1000 and not crossing(b)}
-        if not fresh: return None,[]
-        mids=np.array([mid(b) for b in fresh.values()]); med=np.median(mids)
-        ok={e:b for e,b in fresh.items() if abs(mid(b)/med-1)<=ERR_BAND}
-        if not ok: return None,[]
-        bids,asks=self._consol(ok); cap=self._cap(bids,asks)
-        if cap==0: return None,[]
-        bids=[(p,min(s,cap)) for p,s in bids]; asks=[(p,min(s,cap)) for p,s in asks]
-        bv,bp=self._cum(bids); av,ap=self._cum(asks)
+    @classmethod
+    def _index(cls, ok: Dict[str, Book]):
+        """BRTI from a set of already-validated venue books, consolidated from scratch."""
+        return cls._index_sides(*cls._consol(ok))
+
+    @classmethod
+    def _index_sides(cls, bids, asks, cons: "ConsolidatedBook | None" = None):
+        """BRTI from consolidated sides (None if too thin); cons supplies cached curves."""
+        cap=cls._cap(bids,asks)
+        if cap==0: return None
+        if cons is None:
+            bids=(bids[0],np.minimum(bids[1],cap)); asks=(asks[0],np.minimum(asks[1],cap))
+            (bv,bp),(av,ap)=cls._cum(bids),cls._cum(asks)
+        else:
+            (bv,bp),(av,ap)=cons.cum(cap)
+        if bv.size==0 or av.size==0: return None
         tot=min(bv[-1],av[-1]);
-        if tot<SPACING_VOL: return None,[]
+        if tot<SPACING_VOL: return None
         grid=np.arange(SPACING_VOL,tot+SPACING_VOL,SPACING_VOL)
-        mc=(self._curve(bv,bp,grid)+self._curve(av,ap,grid))/2
-        sc=self._curve(av,ap,grid)/mc-1
+        ac=cls._curve(av,ap,grid)
+        mc=(cls._curve(bv,bp,grid)+ac)/2
+        sc=ac/mc-1
         mask=sc<=DEV_MID; depth=grid[mask].max() if mask.any() else SPACING_VOL
         gu=grid[grid<=depth]; mu=mc[grid<=depth]
         lam=1/(0.3*depth); w=lam*np.exp(-lam*gu); w/=w.sum()
-        return float((mu*w).sum()),sorted(ok.keys())
+        return float((mu*w).sum())
 
-    async def run(self):
-        if USE_WS:
-            for e in self.ex: asyncio.create_task(self._ws(e))
+    def calc(self):
+        fresh={e:b for e,b in self.books.items() if now_ms()-b.ts<=STALE_S*1000 and len(b.bids) and len(b.asks) and not crossing(b)}
+        if not fresh: return None,[]
+        mids=np.array([mid(b) for b in fresh.values()]); med=np.median(mids)
+        ok={e:b for e,b in fresh.items() if abs(mid(b)/med-1)<=ERR_BAND}
+        if not ok: return None,[]
+
+        # apply only what changed since the last calc
+        for e in [e for e in self.cons.venues if e not in ok]: self.cons.remove(e)
+        for e,b in ok.items(): self.cons.update(e,b)
+        venues=sorted(ok.keys())
+        version,last_venues,last=self._last
+        if version==self.cons.version and last_venues==venues: return last
+
+        idx=self._index_sides(*self.cons.sides(),cons=self.cons)
+        result=(None,[]) if idx is None else (idx,venues)
+        self._last=(self.cons.version,venues,result)
+        return result
+
+    # ------------- publication -------------
+    def _mark(self, eid: str):
+        """Event mode: remember when this venue first changed since the last publish."""
+        if self._wake is None: return
+        self._dirty.setdefault(eid, time.perf_counter_ns())
+        self._wake.set()
+
+    @staticmethod
+    def _print_index(idx, ven, ts):
+        ts=ts.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        if idx is None:
+            print(f"[{ts} UTC] BRTI withheld – data")
+        else:
+            print(f"[{ts} UTC] BRTI {idx:,.2f} USD (from {', '.join(ven)})")
+
+    async def _run_tick(self):
         while True:
             if not USE_WS:
                 await asyncio.gather(*[self._pull_rest(e) for e in self.ex])
             idx,ven=self.calc()
-            ts=datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
-            if idx is None:
-                print(f"[{ts} UTC] BRTI withheld – data")
-            else:
-                print(f"[{ts} UTC] BRTI {idx:,.2f} USD (from {', '.join(ven)})")
+            self.on_publish(idx,ven,datetime.now(timezone.utc))
             await asyncio.sleep(TICK)
 
+    async def _run_event(self):
+        last_pub=0.
+        while True:
+            await self._wake.wait()
+            # coalesce: everything that arrives before the next allowed publish goes in one calc
+            wait=last_pub+self.min_interval_s-time.perf_counter()
+            if wait>0: await asyncio.sleep(wait)
+            self._wake.clear()
+            dirty,self._dirty=self._dirty,{}
+            idx,ven=self.calc()
+            last_pub=time.perf_counter()
+            self.on_publish(idx,ven,datetime.now(timezone.utc))
+            pub_ns=time.perf_counter_ns()
+            for e,t in dirty.items():
+                self.latency.setdefault(e,LatencyHistogram(e)).record((pub_ns-t)/1e9)
+
+    async def _stats(self):
+        while True:
+            await asyncio.sleep(STATS_S)
+            print("[STATS] update → publish latency per venue:")
+            for hist in self.latency.values(): print(f"   {hist}")
+
+    async def run(self):
+        if self.mode=="event":
+            self._wake=asyncio.Event()
+            asyncio.create_task(self._stats())
+        if USE_WS:
+            for e in self.ex: asyncio.create_task(self._ws(e))
+        if self.mode=="event":
+            await self._run_event()
+        else:
+            await self._run_tick()
+
+# ------------- golden check / benchmark -------------
+def _legacy_index(ok: Dict[str, Book]):
+    """The original dict / sorted() / bisect implementation, kept as the reference."""
+    bmap, amap = defaultdict(float), defaultdict(float)
+    for bk in ok.values():
+        for p,s in bk.bids.tolist(): bmap[p]+=s
+        for p,s in bk.asks.tolist(): amap[p]+=s
+    bids = sorted(bmap.items(), key=lambda x:-x[0])
+    asks = sorted(amap.items(), key=lambda x:x[0])
+    samp=np.array([s for _,s in bids[:MAX_SAMPLE]]+[s for _,s in asks[:MAX_SAMPLE]])
+    if samp.size==0: return None
+    samp.sort(); k=max(1,int(.01*len(samp)))
+    wins=samp.copy(); wins[:k]=wins[k]; wins[-k:]=wins[-k-1]
+    cap=float(wins.mean()+5*wins.std(ddof=1))
+    bids=[(p,min(s,cap)) for p,s in bids]; asks=[(p,min(s,cap)) for p,s in asks]
+    def cum(levels):
+        v,p,tot=[],[],0.
+        for pr,sz in levels: tot+=sz; v.append(tot); p.append(pr)
+        return np.asarray(v),np.asarray(p)
+    def curve(vols, prices, grid):
+        return np.fromiter((prices[min(bisect.bisect_left(vols,v), len(prices)-1)] for v in grid),float)
+    bv,bp=cum(bids); av,ap=cum(asks)
+    tot=min(bv[-1],av[-1])
+    if tot<SPACING_VOL: return None
+    grid=np.arange(SPACING_VOL,tot+SPACING_VOL,SPACING_VOL)
+    mc=(curve(bv,bp,grid)+curve(av,ap,grid))/2
+    sc=curve(av,ap,grid)/mc-1
+    mask=sc<=DEV_MID; depth=grid[mask].max() if mask.any() else SPACING_VOL
+    gu=grid[grid<=depth]; mu=mc[grid<=depth]
+    lam=1/(0.3*depth); w=lam*np.exp(-lam*gu); w/=w.sum()
+    return float((mu*w).sum())
+
+def _synthetic_books(rng, n_venues=5, levels=500, mid_px=100_000.0):
+    """Kraken-sized books (500 levels a side by default) on a shared 0.1 USD tick."""
+    books={}
+    for i in range(n_venues):
+        m=mid_px+rng.normal(0,5)
+        bp=np.round(m-0.5-np.cumsum(rng.integers(1,20,levels))*0.1,1)
+        ap=np.round(m+0.5+np.cumsum(rng.integers(1,20,levels))*0.1,1)
+        bs=rng.lognormal(-1,1.5,levels); as_=rng.lognormal(-1,1.5,levels)
+        books[f"venue{i}"]=Book(np.column_stack((bp,bs)),np.column_stack((ap,as_)),now_ms())
+    return books
+
+def bench(runs=50, seed=0):
+    rng=np.random.default_rng(seed)
+    cases=[_synthetic_books(rng) for _ in range(20)]
+    for ok in cases:
+        new,old=BRTI._index(ok),_legacy_index(ok)
+        assert new==old, f"golden mismatch: {new!r} != {old!r}"
+    print(f"[BENCH] golden check OK on {len(cases)} random 5-venue x 500-level books")
+    for name,fn in (("legacy",_legacy_index),("numpy",BRTI._index)):
+        t0=time.perf_counter()
+        for _ in range(runs):
+            for ok in cases[:5]: fn(ok)
+        dt=(time.perf_counter()-t0)/(runs*5)*1000
+        print(f"[BENCH] {name:>6}: {dt:.3f} ms / calc")
+
+    # incremental: one venue changes a few levels per update
+    books=dict(cases[0]); cons=ConsolidatedBook(); full_t=inc_t=0.
+    for e,b in books.items(): cons.update(e,b)
+    for step in range(200):
+        e=f"venue{step%len(books)}"; b=books[e]
+        bids=b.bids.copy(); k=rng.integers(0,20,3); bids[k,1]=rng.lognormal(-1,1.5,3)
+        books[e]=Book(bids,b.asks,now_ms())
+        t0=time.perf_counter(); full=BRTI._index(books); full_t+=time.perf_counter()-t0
+        t0=time.perf_counter(); cons.update(e,books[e]); inc=BRTI._index_sides(*cons.sides(),cons=cons); inc_t+=time.perf_counter()-t0
+        assert abs(full-inc)<=1e-9*full, f"incremental mismatch: {inc!r} != {full!r}"
+    print("[BENCH] incremental check OK on 200 single-venue updates")
+    print(f"[BENCH] full recompute: {full_t/200*1000:.3f} ms | incremental: {inc_t/200*1000:.3f} ms / update")
+
+    # per-update cost as the books get deeper. Full recompute grows with depth.
+    # Incremental = diffing the venue's new snapshot (O(its depth), ccxt sends
+    # whole books) + the consolidated update and index (flat once the books
+    # are deeper than the band cum() sums over).
+    for levels in (500,2000,8000,32000):
+        books=_synthetic_books(rng,levels=levels); cons=ConsolidatedBook(); full_t=diff_t=idx_t=0.
+        for e,b in books.items(): cons.update(e,b)
+        for step in range(100):
+            e=f"venue{step%len(books)}"; b=books[e]
+            bids=b.bids.copy(); k=rng.integers(0,20,3); bids[k,1]=rng.lognormal(-1,1.5,3)
+            books[e]=Book(bids,b.asks,now_ms())
+            t0=time.perf_counter(); full=BRTI._index(books); full_t+=time.perf_counter()-t0
+            t0=time.perf_counter(); cons.update(e,books[e]); t1=time.perf_counter()
+            inc=BRTI._index_sides(*cons.sides(),cons=cons); t2=time.perf_counter()
+            diff_t+=t1-t0; idx_t+=t2-t1
+            assert abs(full-inc)<=1e-9*full, f"incremental mismatch at {levels} levels: {inc!r} != {full!r}"
+        print(f"[BENCH] {levels:>6} levels/side x 5 venues: full {full_t/100*1000:7.3f} ms | incremental "
+              f"{(diff_t+idx_t)/100*1000:.3f} ms (diff {diff_t/100*1000:.3f} + index {idx_t/100*1000:.3f}) / update")
+
 if __name__=='__main__':
+    if '--bench' in sys.argv:
+        bench()
+        sys.exit(0)
+    # --event publishes on venue updates (rate-capped) instead of every TICK
+    mode="event" if '--event' in sys.argv else MODE
     try:
-        asyncio.run(BRTI().run())
+        asyncio.run(BRTI(mode=mode).run())
     except KeyboardInterrupt:
         print("Stopped.")
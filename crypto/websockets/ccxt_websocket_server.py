@@ -1,17 +1,9 @@
-import eventlet
-eventlet.monkey_patch()
+import asyncio
+import numpy as np
+import ccxt.async_support as ccxt
 
-import ccxt
-import time
-import threading
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from flask_socketio import SocketIO
-
-# === Flask Setup ===
-app = Flask(__name__)
-CORS(app, supports_credentials=True)
-socketio = SocketIO(app, async_mode='eventlet', cors_allowed_origins='*')
+from aio_server import make_server, serve, query_arg, background
+from wire import Wire
 
 # === Globals ===
 order_book = {'bids': [], 'asks': []}
@@ -20,44 +12,57 @@ exchange = ccxt.coinbase()
 symbol = 'BTC/USD'
 active_clients = set()
 
+# === Socket.IO Setup (asyncio, see aio_server.py) ===
+sio, app = make_server({
+    "/status": lambda: {"status": "running", "symbol": symbol},
+})
+# per-client encoding: JSON by default, ?encoding=msgpack packs the book levels as float64 arrays
+wire = Wire(sio)
+
 # === WebSocket Events ===
-@socketio.on('connect')
-def handle_connect():
-    sid = request.sid
+@sio.on('connect')
+async def handle_connect(sid, environ, auth=None):
     active_clients.add(sid)
-    print(f"🔗 Market client connected: {sid}")
+    encoding = await wire.connect(sid, query_arg(environ, 'encoding'))
+    print(f"🔗 Market client connected: {sid} ({encoding})")
 
-@socketio.on('disconnect')
-def handle_disconnect():
-    sid = request.sid
+@sio.on('disconnect')
+async def handle_disconnect(sid, *args):
     active_clients.discard(sid)
+    wire.disconnect(sid)
     print(f"❌ Market client disconnected: {sid}")
 
-@app.route("/status", methods=["GET"])
-def status():
-    return jsonify({"status": "running", "symbol": symbol})
-
-# === Background Data Thread ===
-def update_data():
+# === Background Data Task ===
+async def update_data():
     global order_book, recent_trades
     while True:
         try:
-            ob = exchange.fetch_order_book(symbol, limit=200)
+            # both REST calls in flight at once, on the exchange's own aiohttp session
+            ob, trades = await asyncio.gather(exchange.fetch_order_book(symbol, limit=200),
+                                              exchange.fetch_trades(symbol, limit=20))
             order_book = ob
-            recent_trades[:] = exchange.fetch_trades(symbol, limit=20)
+            recent_trades[:] = trades
 
             payload = {
-                "order_book": order_book,
+                "order_book": {**order_book,
+                               "bids": np.asarray(order_book['bids'], dtype=np.float64),
+                               "asks": np.asarray(order_book['asks'], dtype=np.float64)},
                 "recent_trades": recent_trades
             }
-            socketio.emit("market_data_update", payload)
+            await wire.emit("market_data_update", payload)
             print("📈 Market data updated")
         except Exception as e:
             print("❌ Market data update error:", e)
-        time.sleep(1)
+        await asyncio.sleep(1)
 
 # === Main Entry ===
-if __name__ == "__main__":
+async def main():
     print("🚀 Starting Coinbase market WebSocket server on http://localhost:5051 ...")
-    threading.Thread(target=update_data, daemon=True).start()
-    socketio.run(app,  host="127.0.0.1", port=5051)
+    background(update_data(), "market data")
+    try:
+        await serve(app, host="127.0.0.1", port=5051)
+    finally:
+        await exchange.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,13 +2,18 @@
 BRTI-like Index via WebSocket order book subscriptions (ccxt.pro):
 1. Use ccxt.pro to subscribe to top-of-book updates from each venue.
 2. Maintain in-memory best bid/ask for each exchange.
-3. Every POLL_INTERVAL, compute mid and weight from stored book.
+3. Recompute mid and weight every POLL_INTERVAL (the default), or with
+   EVENT_DRIVEN on whenever a book changes, at most once every MIN_INTERVAL
+   so bursts coalesce.
 4. Compute volume-weighted index without HTTP fetch overhead.
+5. Record update -> publish latency per venue and print it every STATS_S.
 """
 import asyncio
 import ccxt.pro as ccxt
 import time
 
+from latency import LatencyHistogram
+
 # Exchanges used in BRTI
 EXCHANGES = [
     'gemini',
@@ -17,10 +22,16 @@ EXCHANGES = [
     'cryptocom'
 ]
 SYMBOL = 'BTC/USD'
-POLL_INTERVAL = 0.5   # seconds between index updates
+POLL_INTERVAL = 0.5   # seconds between index updates (polling mode)
+EVENT_DRIVEN = False  # recompute on book updates instead of polling
+MIN_INTERVAL = 0.05   # event mode: minimum seconds between index updates
+STATS_S = 30          # seconds between latency summaries
 
 # Shared state for top-of-book
 order_books: dict[str, dict[str, float]] = {}
+books_changed = asyncio.Event()
+dirty: dict[str, int] = {}                  # venue -> perf_counter_ns of its oldest unpublished update
+latency: dict[str, LatencyHistogram] = {}   # venue -> update -> publish latency
 
 async def subscribe_order_book(exchange_id: str, symbol: str):
     exchange = getattr(ccxt, exchange_id)({
@@ -38,14 +49,26 @@ async def subscribe_order_book(exchange_id: str, symbol: str):
                     'ask_price': asks[0][0],
                     'ask_qty': asks[0][1],
                 }
+                dirty.setdefault(exchange_id, time.perf_counter_ns())
+                books_changed.set()
     except Exception as e:
         print(f"{exchange_id} WebSocket error: {e}")
     finally:
         await exchange.close()
 
 async def compute_index():
+    global dirty
+    last = 0.0
     while True:
+        if EVENT_DRIVEN:
+            await books_changed.wait()
+            wait = last + MIN_INTERVAL - time.perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            books_changed.clear()
+            last = time.perf_counter()
         start = time.perf_counter()
+        published, dirty = dirty, {}
         weighted = []
         for ex_id, data in order_books.items():
             mid = (data['bid_price'] + data['ask_price']) / 2
@@ -55,15 +78,27 @@ async def compute_index():
             total_w = sum(w for _, w in weighted)
             index = sum(mid * w for mid, w in weighted) / total_w
             print(f"BRTI-like Index: {index:.2f}")
+            pub_ns = time.perf_counter_ns()
+            for ex_id, t in published.items():
+                latency.setdefault(ex_id, LatencyHistogram(ex_id)).record((pub_ns - t) / 1e9)
         elapsed = (time.perf_counter() - start) * 1000
         print(f"Loop duration: {elapsed:.1f}ms\n")
-        await asyncio.sleep(max(0, POLL_INTERVAL - elapsed/1000))
+        if not EVENT_DRIVEN:
+            await asyncio.sleep(max(0, POLL_INTERVAL - elapsed/1000))
+
+async def print_stats():
+    while True:
+        await asyncio.sleep(STATS_S)
+        print("[STATS] update → publish latency per venue:")
+        for hist in latency.values():
+            print(f"   {hist}")
 
 async def main():
     # Launch all subscriptions
     tasks = [asyncio.create_task(subscribe_order_book(ex, SYMBOL)) for ex in EXCHANGES]
     # Launch index computation
     tasks.append(asyncio.create_task(compute_index()))
+    tasks.append(asyncio.create_task(print_stats()))
     await asyncio.gather(*tasks)
 
 if __name__ == '__main__':
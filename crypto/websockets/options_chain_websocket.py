@@ -1,67 +1,108 @@
-import eventlet
-eventlet.monkey_patch()
-
 import sys
-import time
-import threading
+import asyncio
 import numpy as np
 from datetime import datetime, timezone
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-from flask_socketio import SocketIO
-from playwright.sync_api import sync_playwright
-from concurrent.futures import ThreadPoolExecutor
+
+from aio_server import make_server, serve, query_arg, background
+from kalshi_client import KalshiClient
+from price_source import make_price_source
+from settlement import SettlementTracker
+from chain_stream import STREAM_EVENT, RESYNC_EVENT
+from subscriptions import SubscriptionHub, SUBSCRIBE_EVENT
+from wire import Wire
+from chain_pipeline import ChainPipeline
+from kalshi_book import KalshiBook
+from shm_store import live_book
 
 from utils import (
-    get_current_contract_ticker, get_options_chain_for_event, get_moneyness,
-    implied_vol_binary_call, implied_vol_one_touch, get_top_orderbook,
-    binary_call_delta
+    filter_chain, get_moneyness, implied_vol_binary_call, implied_vol_one_touch,
+    top_orderbook_values, top_book_values, binary_call_delta
 )
 
 # CONTROLS HOW NEAR THE MONEY WE SEE CONTRACTS
 THRESHOLD = 750
+SERIES = "KXBTCD"
 
 
 EVENT = sys.argv[1] if len(sys.argv) > 1 else None
 RUNTIME_SECONDS = int(sys.argv[2]) if len(sys.argv) > 2 else 600
 USE_ONE_TOUCH = False
 IV_FN = implied_vol_one_touch if USE_ONE_TOUCH else implied_vol_binary_call
-
-# === Flask App Setup ===
-app = Flask(__name__)
-CORS(app, supports_credentials=True)
-socketio = SocketIO(app, async_mode='eventlet', cors_allowed_origins='*')
-
-latest_price = {'value': None, 'timestamp': None, 'simple_average': []}
+# Chain updates go out as a snapshot + delta stream on STREAM_EVENT (see chain_stream.py).
+# Set to also emit the old full brti_and_options_update payload every tick.
+EMIT_FULL_UPDATES = False
+
+latest_price = {'value': None, 'timestamp': None}
+# simple_average = mean of the last 60 one-second prints, the way Kalshi settles
+settlement = SettlementTracker()
+# pooled async session for the per-contract REST calls (was a thread pool of requests.get)
+kalshi = KalshiClient()
 active_clients = set()
 
-@socketio.on('connect')
-def handle_connect():
-    sid = request.sid
-    active_clients.add(sid)
-    print(f"🔗 Client connected: {sid}")
-
-@socketio.on('disconnect')
-def handle_disconnect():
-    sid = request.sid
-    active_clients.discard(sid)
-    print(f"❌ Client disconnected: {sid}")
-
-@app.route('/price', methods=['GET'])
 def get_price():
     if latest_price['value'] is None:
-        return jsonify({'status': 'waiting for data'}), 503
-    return jsonify({
+        return {'status': 'waiting for data'}, 503
+    return {
         'brti': latest_price['value'],
-        'simple_average': np.mean(latest_price['simple_average']),
+        'simple_average': settlement.average(),
+        'settlement': settlement.project().to_dict(),
         'timestamp': latest_price['timestamp']
-    })
+    }
 
-@app.route("/status", methods=["GET"])
 def status():
-    return jsonify({"status": "running", "event": EVENT})
+    return {"status": "running", "event": EVENT}
+
+# === Socket.IO App Setup (asyncio, see aio_server.py) ===
+sio, app = make_server({
+    '/price': get_price,
+    '/status': status,
+    '/pipeline': lambda: pipeline.stats(),
+    '/subscriptions': lambda: subscriptions.stats(),
+    '/kalshi': lambda: kalshi.stats(),
+})
+# per-client encoding: JSON by default, ?encoding=msgpack for binary (see wire.py)
+wire = Wire(sio)
+# one snapshot + delta stream per subscription room (see subscriptions.py)
+subscriptions = SubscriptionHub(wire)
+
+@sio.on('connect')
+async def handle_connect(sid, environ, auth=None):
+    active_clients.add(sid)
+    encoding = await wire.connect(sid, query_arg(environ, 'encoding'))
+    print(f"🔗 Client connected: {sid} ({encoding})")
+    await subscriptions.subscribe(sid)  # everything at full rate until it subscribes
+
+@sio.on('disconnect')
+async def handle_disconnect(sid, *args):
+    active_clients.discard(sid)
+    await subscriptions.unsubscribe(sid)
+    wire.disconnect(sid)
+    print(f"❌ Client disconnected: {sid}")
+
+@sio.on(SUBSCRIBE_EVENT)
+async def handle_subscribe(sid, spec):
+    # tickers / strike range / fields / max_hz; the ack is the subscription as applied
+    sub = await subscriptions.subscribe(sid, spec)
+    print(f"📝 Client {sid} subscribed: {sub}")
+    return sub
 
-def process_contract(contract, brti_price, now_utc):
+@sio.on(RESYNC_EVENT)
+async def handle_resync(sid, *args):
+    # client saw a gap in the delta stream
+    await subscriptions.send_snapshot(sid)
+
+async def fetch_top_orderbook(ticker):
+    try:
+        # live book from direct_market_sockets_test.py's shared memory, REST when it isn't running
+        book = live_book(ticker)
+        if book is not None:
+            return top_book_values(KalshiBook(bids=book[0], asks=book[1]))
+        return top_orderbook_values(await kalshi.orderbook(ticker))
+    except Exception as e:
+        print("❌ Error fetching orderbook:", e)
+        return None, None
+
+async def process_contract(contract, brti_price, now_utc):
     try:
         ticker = contract['ticker']
         strike = int(round(contract['floor_strike'], 0))
@@ -83,7 +124,10 @@ def process_contract(contract, brti_price, now_utc):
         else:
             mid_iv = IV_FN(brti_price, strike, hours_left, (best_bid + best_ask) / 200)
      
-        bid_value, ask_value = get_top_orderbook(ticker)
+        bid_value, ask_value = await fetch_top_orderbook(ticker)
+        # P(YES) from the projected 60 s settlement average for this expiry
+        projection = settlement.project(expiration_time.timestamp())
+        settlement_prob = projection.prob_above(strike) if projection else None
         bid_delta = binary_call_delta(brti_price, strike, hours_left, bid_iv) if np.isfinite(bid_iv) else None
         ask_delta = binary_call_delta(brti_price, strike, hours_left, ask_iv) if np.isfinite(ask_iv) else None
 
@@ -102,73 +146,59 @@ def process_contract(contract, brti_price, now_utc):
             'bid_value': bid_value,
             'ask_value': ask_value,
             'bid_delta': round(bid_delta, 5) if bid_delta is not None else None,
-            'ask_delta': round(ask_delta, 5) if ask_delta is not None else None
+            'ask_delta': round(ask_delta, 5) if ask_delta is not None else None,
+            'settlement_prob': round(settlement_prob, 4) if settlement_prob is not None else None
         }
 
     except Exception as e:
         print(f"⛔ Skipped contract {contract.get('ticker', '')}: {e}")
         return None
 
-def poll_brti():
-    print("🌀 Starting Playwright polling loop...")
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        page.goto("https://www.cfbenchmarks.com/data/indices/BRTI", timeout=20000)
-        page.wait_for_selector('div.leading-6 span')
-        print("📡 Connected to BRTI page.")
-
-        last_logged_price = None
-        time.sleep(2)
-
-        while True:
-            try:
-                price_text = page.locator('div.leading-6 span').first.text_content()
-                price = float(price_text.replace('$', '').replace(',', ''))
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-
-                if price != last_logged_price:
-                    last_logged_price = price
-                    latest_price['simple_average'].append(price)
-                    if len(latest_price['simple_average']) > 60:
-                        latest_price['simple_average'].pop(0)
-
-                    average = np.mean(latest_price['simple_average'])
-                    latest_price['value'] = price
-                    latest_price['timestamp'] = timestamp
-
-                    # Build combined payload
-                    combined_payload = build_options_payload(price, average, timestamp)
-
-                    brti_data = {
-                        'brti': price,
-                        'simple_average': average,
-                        'timestamp': timestamp
-                    }
-                    combined_payload.update(brti_data)
-                    
-                    socketio.emit("brti_and_options_update", combined_payload)
-                    print(f"📢 Emitting price_update {brti_data['timestamp']} @ {brti_data['brti']} with {len(combined_payload['contracts'])} contracts")
+def on_price(price):
+    # ingest stage: runs on the loop between awaits, so nothing here waits on Kalshi
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    settlement.update(price)
+    latest_price['value'] = price
+    latest_price['timestamp'] = timestamp
+    pipeline.submit(price, timestamp)
+
+async def build_tick(price, timestamp):
+    average = settlement.average()
+
+    # Build combined payload
+    combined_payload = await build_options_payload(price, average, timestamp)
+
+    brti_data = {
+        'brti': price,
+        'simple_average': average,
+        'settlement': settlement.project().to_dict(),
+        'timestamp': timestamp
+    }
+    combined_payload.update(brti_data)
+    return combined_payload
 
-            except Exception as e:
-                print(f"[{datetime.now()}] ⚠️ Error during BRTI polling or options processing: {e}")
+async def emit_tick(combined_payload):
+    await subscriptions.publish(combined_payload)
+    if EMIT_FULL_UPDATES:
+        await wire.emit("brti_and_options_update", combined_payload)
+    print(f"📢 Emitting price_update {combined_payload['timestamp']} @ {combined_payload['brti']} with {len(combined_payload['contracts'])} contracts")
 
-            time.sleep(0.1)
+# newest tick wins: ticks that arrive while a payload is being built are dropped, not queued
+pipeline = ChainPipeline(build=build_tick, emit=emit_tick, name="chain")
 
 
-def build_options_payload(brti_price, average, timestamp):
+async def build_options_payload(brti_price, average, timestamp):
 
     if EVENT is None:
-        event_ticker = get_current_contract_ticker()
+        event_ticker = await kalshi.current_event(SERIES)
     else:
         event_ticker = EVENT
 
-    chain_data = get_options_chain_for_event(event_ticker, average, threshold=THRESHOLD)
-    output = []
+    chain_data = filter_chain(await kalshi.event_markets(event_ticker), average, threshold=THRESHOLD)
     now_utc = datetime.now().astimezone().astimezone(timezone.utc)
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        results = executor.map(lambda c: process_contract(c, brti_price, now_utc), chain_data)
+    # every contract's orderbook in flight at once, over the client's pooled connections
+    results = await asyncio.gather(*(process_contract(c, brti_price, now_utc) for c in chain_data))
 
     output = [r for r in results if r is not None]
 
@@ -176,14 +206,17 @@ def build_options_payload(brti_price, average, timestamp):
         'contracts': output
     }
 
-def shutdown_after(seconds):
-    time.sleep(seconds)
-    print(f"\n🕒 Runtime limit of {seconds} seconds reached. Shutting down...")
-    socketio.stop()
-    sys.exit(0)
+async def main():
+    # BRTI_SOURCE: scraper (default), engine (local index) or feed (ticks pushed by brti_listener)
+    pipeline.start()
+    subscriptions.start()
+    source = background(make_price_source(poll_s=0.1, warmup_s=2).stream(on_price), "price source")
+    print(f"🌐 Serving {STREAM_EVENT} on http://localhost:5050 for {EVENT}...")
+    try:
+        await serve(app, host="127.0.0.1", port=5050, runtime_s=RUNTIME_SECONDS)
+    finally:
+        source.cancel()
+        await kalshi.close()
 
 if __name__ == "__main__":
-    threading.Thread(target=poll_brti, daemon=True).start()
-    threading.Thread(target=shutdown_after, args=(RUNTIME_SECONDS,), daemon=True).start()
-    print(f"🌐 Serving brti_and_options_update on http://localhost:5050 for {EVENT}...")
-    socketio.run(app, host="127.0.0.1", port=5050)
+    asyncio.run(main())
@@ -9,6 +9,9 @@ from scipy.stats import norm
 from scipy.optimize import brentq
 import numpy as np
 
+from kalshi_book import KalshiBook, NO_BID, NO_ASK
+from brti_feed import latest_price
+
 session = requests.Session()
 
 USE_YEARS = True  # Set to True if you want to use years for TTE, False for hours
@@ -29,6 +32,11 @@ def get_current_contract_ticker():
     return first_event['event_ticker']
 
 def get_brti_price():
+    # brti_listener's shared memory first, /price only if the feed daemon isn't local
+    price, average, timestamp = latest_price()
+    if price is not None:
+        return price, average, timestamp
+
     try:
         response = session.get("http://localhost:5000/price", timeout=0.2)
         if response.status_code == 200:
@@ -113,37 +121,30 @@ def get_top_orderbook(ticker):
         headers = {"accept": "application/json"}
         response = requests.get(url, headers=headers)
         order_book = json.loads(response.text)['orderbook']
+        return top_orderbook_values(order_book)
 
-        ask_value = 0
-        bid_value = 0
+    except Exception as e:
+        print("❌ Error fetching orderbook:", e)
+        return None, None
 
-        asks = []
-        bids = []
+# only count levels strictly larger than this
+TOP_VALUE_THRESHOLD = 1000
 
-        # print(order_book)
-        THRESHOLD = 1000
+def top_orderbook_values(order_book):
+    return top_book_values(KalshiBook.from_rest(order_book, thresholds=(TOP_VALUE_THRESHOLD + 1,)))
 
-        if order_book['yes']:
-            for price, size in order_book['yes']:
-                if size > THRESHOLD:
-                    bids.append({'price': price / 100, 'quantity': size})
+def top_book_values(book):
+    """(bid_value, ask_value) notional strings of the best levels above TOP_VALUE_THRESHOLD."""
+    bid_price = book.mm_bid(TOP_VALUE_THRESHOLD + 1)
+    ask_price = book.mm_ask(TOP_VALUE_THRESHOLD + 1)
 
-        if order_book['no']:
-            for price, size in order_book['no']:
-                if size > THRESHOLD:
-                    asks.append({'price': (100-price)/100, 'quantity': size})
-                
-        sorted_bids = sorted(bids, key=lambda x: -x["price"])  # High to low
-        sorted_asks = sorted(asks, key=lambda x: x["price"])   # Low to high
-
-        bid_value = f"${sorted_bids[0]["price"] * sorted_bids[0]["quantity"] if sorted_bids else 0:.2f}"
-        ask_value = f"${sorted_asks[0]["price"] * sorted_asks[0]["quantity"] if sorted_asks else 0:.2f}"
-        
-        return bid_value, ask_value   
+    bid_notional = bid_price / 100 * book.bids[bid_price] if bid_price != NO_BID else 0
+    ask_notional = ask_price / 100 * book.asks[ask_price] if ask_price != NO_ASK else 0
 
-    except Exception as e:
-        print("❌ Error fetching orderbook:", e)
-        return None, None
+    bid_value = f"${bid_notional:.2f}"
+    ask_value = f"${ask_notional:.2f}"
+    
+    return bid_value, ask_value   
 
 def binary_call_price(S, K, T_hours, sigma, r=0.0):
     T = T_hours / (365 * 24)  # Convert hours to years
@@ -236,15 +237,17 @@ def get_options_chain_for_event(event, brti_price=0, threshold=1000):
         url = f"https://api.elections.kalshi.com/trade-api/v2/events/{event}"
         headers = {"accept": "application/json"}
         response = requests.get(url, headers=headers)
+        return filter_chain(json.loads(response.text)['markets'], brti_price, threshold)
+    except Exception as e:
+        print("❌ Error fetching chain:", e)
+        return None, None
 
-        chain = []
-        for m in json.loads(response.text)['markets']:
-            strike = (round(m['floor_strike'], 0))
+def filter_chain(markets, brti_price=0, threshold=1000):
+    chain = []
+    for m in markets:
+        strike = (round(m['floor_strike'], 0))
 
-            if abs(strike - brti_price) < threshold:
-                chain.append(m)
+        if abs(strike - brti_price) < threshold:
+            chain.append(m)
 
-        return chain    
-    except Exception as e:
-        print("❌ Error fetching chain:", e)
-        return None, None
\ No newline at end of file
+    return chain
\ No newline at end of file
@@ -0,0 +1,206 @@
+# wire.py
+"""Per-client wire encoding for socket.io payloads
+===============================================
+Every socket.io emit used to JSON-encode nested dicts of floats, including
+the 200-level Coinbase book in `market_data_update`. Clients can now opt in
+to a compact binary encoding when they connect:
+
+    io('http://localhost:5051', { query: { encoding: 'msgpack' } })      // JS
+    sio.connect('http://localhost:5050?encoding=msgpack')                 # Python
+
+  * json    – the default; what every existing client gets, unchanged.
+  * msgpack – the payload as one MessagePack binary message. NumPy arrays
+              (e.g. book levels as an (n, 2) float64 array) are packed as
+              raw little-endian bytes under ext type ND_EXT instead of a list
+              of lists.
+
+`Wire.emit` encodes each payload once per encoding that has clients and sends
+it to that encoding's room. If the server has no msgpack installed, everyone
+gets JSON. Clients call `decode()` (or dashboard/src/wire.js) on whatever
+arrives: bytes are MessagePack, anything else is already a dict.
+
+`python wire.py` benchmarks encode / decode CPU and wire size against JSON.
+"""
+
+from __future__ import annotations
+import json
+import struct
+from typing import Optional
+
+import numpy as np
+
+try:
+    import msgpack  # type: ignore
+except ImportError:
+    msgpack = None
+
+ENCODINGS = ("json", "msgpack") if msgpack is not None else ("json",)
+DEFAULT_ENCODING = "json"
+ND_EXT = 1                          # ext type: uint8 ndim, uint32 shape..., float64 LE data
+NAMESPACE = "/"
+
+
+# ------------- codecs -------------
+def _jsonable(obj):
+    """Arrays → lists so the stock socket.io JSON encoder can take the payload."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, dict):
+        return {k: _jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(v) for v in obj]
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def _pack_default(obj):
+    if isinstance(obj, np.ndarray):
+        arr = np.ascontiguousarray(obj, dtype='<f8')
+        header = struct.pack(f"<B{arr.ndim}I", arr.ndim, *arr.shape)
+        return msgpack.ExtType(ND_EXT, header + arr.tobytes())
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"can't pack {type(obj).__name__}")
+
+
+def _unpack_ext(code, data):
+    if code != ND_EXT:
+        return msgpack.ExtType(code, data)
+    ndim = data[0]
+    shape = struct.unpack_from(f"<{ndim}I", data, 1)
+    return np.frombuffer(data, dtype='<f8', offset=1 + 4 * ndim).reshape(shape)
+
+
+def encode(payload, encoding: str = DEFAULT_ENCODING):
+    if encoding == "msgpack":
+        return msgpack.packb(payload, default=_pack_default, use_bin_type=True)
+    return _jsonable(payload)
+
+
+def decode(data):
+    """Payload from either encoding. Packed arrays come back as read-only float64 ndarrays."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return msgpack.unpackb(data, ext_hook=_unpack_ext, raw=False, strict_map_key=False)
+    return data
+
+
+# ------------- server side -------------
+class Wire:
+    """
+    Tracks each client's encoding and emits every payload once per encoding in
+    use. Await `connect(sid, requested)` in the socket.io connect handler and
+    call `disconnect(sid)` in the disconnect one. Named rooms (`join` / `leave`)
+    are split per encoding the same way, so `emit(..., room=name)` also encodes
+    once per encoding among that room's members. `sio` is a socketio.AsyncServer
+    (aio_server.py), so everything here runs on its loop.
+    """
+
+    def __init__(self, sio):
+        self.sio = sio
+        self.clients = {}     # sid -> encoding
+        self.rooms = {}       # room name -> set of sids
+
+    @staticmethod
+    def room(encoding: str, name: str = "all") -> str:
+        return f"{name}:{encoding}"
+
+    async def connect(self, sid: str, requested: Optional[str] = None) -> str:
+        encoding = requested if requested in ENCODINGS else DEFAULT_ENCODING
+        self.clients[sid] = encoding
+        await self.sio.enter_room(sid, self.room(encoding), namespace=NAMESPACE)
+        return encoding
+
+    def disconnect(self, sid: str):
+        # socket.io drops a disconnected sid from its rooms itself
+        self.clients.pop(sid, None)
+        for members in self.rooms.values():
+            members.discard(sid)
+
+    def encoding_of(self, sid: str) -> str:
+        return self.clients.get(sid, DEFAULT_ENCODING)
+
+    async def join(self, sid: str, name: str):
+        self.rooms.setdefault(name, set()).add(sid)
+        await self.sio.enter_room(sid, self.room(self.encoding_of(sid), name), namespace=NAMESPACE)
+
+    async def leave(self, sid: str, name: str):
+        self.rooms.get(name, set()).discard(sid)
+        await self.sio.leave_room(sid, self.room(self.encoding_of(sid), name), namespace=NAMESPACE)
+
+    async def emit(self, event: str, payload, to: Optional[str] = None, room: Optional[str] = None):
+        """
+        Send to one client (`to` = sid), one named room, or everyone, encoding
+        once per encoding in use.
+        """
+        if to is not None:
+            await self.sio.emit(event, encode(payload, self.encoding_of(to)), to=to)
+            return
+        members = self.clients if room is None else self.rooms.get(room, ())
+        in_use = {self.clients.get(sid, DEFAULT_ENCODING) for sid in members}
+        for encoding in in_use:
+            await self.sio.emit(event, encode(payload, encoding), to=self.room(encoding, room or "all"))
+
+
+# ------------- benchmark -------------
+def _bench_payloads():
+    rng = np.random.default_rng(0)
+    mid = 118_000.0
+    bids = np.column_stack([mid - np.cumsum(rng.uniform(0.01, 2, 200)), rng.uniform(0.001, 3, 200)])
+    asks = np.column_stack([mid + np.cumsum(rng.uniform(0.01, 2, 200)), rng.uniform(0.001, 3, 200)])
+    trades = [{'id': str(i), 'timestamp': 1_752_000_000_000 + i, 'side': 'buy', 'price': mid + i * 0.01,
+               'amount': 0.0123, 'cost': mid * 0.0123} for i in range(20)]
+    market = {'order_book': {'symbol': 'BTC/USD', 'bids': bids, 'asks': asks, 'timestamp': None}, 'recent_trades': trades}
+
+    def book():
+        return ([{'price': int(p), 'quantity': int(rng.integers(1, 500))} for p in range(40, 1, -3)],
+                [{'price': int(p), 'quantity': int(rng.integers(1, 500))} for p in range(60, 99, 3)])
+    contracts = [{'ticker': f'KXBTC-25JUL1117-B{118_000 + 250 * i}', 'strike': f'{118_000 + 250 * i}.0-{118_249.99 + 250 * i}',
+                  'time_left_sec': 1800, 'moneyness': 0.42, 'interest': 12_345, 'orderbook': book(),
+                  'best_bid': 41, 'best_ask': 44, 'mm_bid': 40, 'mm_ask': 45, 'spread': 5, 'mid_price': 42.5,
+                  'trades': {'trades': [{'trade_id': f'{i}-{j}', 'count': 5, 'yes_price': 42, 'taker_side': 'yes',
+                                         'created_time': '2025-07-11T16:59:59Z'} for j in range(10)], 'cursor': 'abc'},
+                  'trade_market': True, 'settlement_prob': 0.3171} for i in range(8)]
+    chain = {'contracts': contracts, 'brti': mid, 'simple_average': mid - 3.2,
+             'settlement': {'mean': mid - 1.5, 'std': 21.7, 'observed': 0, 'remaining': 60},
+             'timestamp': '2025-07-11 16:30:00.000'}
+    dashboard = {'timestamp': chain['timestamp'],
+                 'market_quotes': {c['ticker']: {'mm_bid': 40, 'mm_ask': 45, 'best_bid': 41, 'best_ask': 44, 'spread': 5,
+                                                 'time_left': 0.5, 'all_bids': c['orderbook'][0], 'all_asks': c['orderbook'][1]}
+                                   for c in contracts},
+                 'estimated_mid_prices': {c['ticker']: 42.123456 for c in contracts},
+                 'positions': {c['ticker']: 3 for c in contracts},
+                 'trade_log': [{'trade_id': str(i), 'ticker': contracts[0]['ticker'], 'side': 'buy', 'price': 41,
+                                'size': 3, 'realized_pnl': 0.0, 'position_after': 3, 'avg_entry_price_after': 41.0}
+                               for i in range(100)]}
+    return {'market_data_update (200-level book)': market,
+            'brti_and_options_stream snapshot (8 contracts)': {'type': 'snapshot', 'seq': 1, 'payload': chain},
+            'dashboard_update (8 contracts, 100 trades)': dashboard}
+
+
+def benchmark(repeat: int = 500):
+    import time
+    if msgpack is None:
+        print("msgpack is not installed, nothing to compare (pip install msgpack).")
+        return
+    for name, payload in _bench_payloads().items():
+        print(f"\n{name}")
+        # json: the list conversion the server does plus the encoding socket.io does
+        results = {}
+        for encoding in ENCODINGS:
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                out = encode(payload, encoding)
+                wire_bytes = json.dumps(out, separators=(',', ':')).encode() if encoding == "json" else out
+            enc_us = (time.perf_counter() - t0) / repeat * 1e6
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                decode(json.loads(wire_bytes)) if encoding == "json" else decode(wire_bytes)
+            dec_us = (time.perf_counter() - t0) / repeat * 1e6
+            results[encoding] = len(wire_bytes)
+            print(f"  {encoding:8s} {len(wire_bytes):8,d} B   encode {enc_us:8.1f} µs   decode {dec_us:8.1f} µs")
+        print(f"  msgpack is {results['msgpack'] / results['json']:.0%} of the JSON size")
+
+
+if __name__ == "__main__":
+    benchmark()